@@ -8,13 +8,14 @@ import logging
 import os
 import sys
 import time as timemod
-from glob import iglob
 from threading import Event, enumerate as enumerate_threads
 from traceback import print_exc
 
 from Tribler.Core.CacheDB.sqlitecachedb import forceDBThread
 from Tribler.Core.DecentralizedTracking.dht_provider import MainlineDHTProvider
 from Tribler.Core.DownloadConfig import DownloadStartupConfig, DefaultDownloadStartupConfig
+from Tribler.Core.Modules.checkpoint_store import CheckpointStore, CHECKPOINT_DB_FILENAME
+from Tribler.Core.Modules.download_states import DownloadStates
 from Tribler.Core.Modules.payout_manager import PayoutManager
 from Tribler.Core.Modules.resource_monitor import ResourceMonitor
 from Tribler.Core.Modules.search_manager import SearchManager
@@ -24,8 +25,8 @@ from Tribler.Core.Modules.wallet.tc_wallet import TrustchainWallet
 from Tribler.Core.Modules.watch_folder import WatchFolder
 from Tribler.Core.TorrentChecker.torrent_checker import TorrentChecker
 from Tribler.Core.TorrentDef import TorrentDef, TorrentDefNoMetainfo
-from Tribler.Core.Utilities.configparser import CallbackConfigParser
 from Tribler.Core.Utilities.install_dir import get_lib_path
+from Tribler.Core.Utilities.instrumentation import ReactorLagMonitor
 from Tribler.Core.Video.VideoServer import VideoServer
 from Tribler.Core.simpledefs import (NTFY_DISPERSY, NTFY_STARTED, NTFY_TORRENTS, NTFY_UPDATE, NTFY_TRIBLER,
                                      NTFY_FINISHED, DLSTATUS_DOWNLOADING, DLSTATUS_STOPPED_ON_ERROR, NTFY_ERROR,
@@ -48,6 +49,18 @@ from twisted.internet.task import LoopingCall
 from twisted.internet.threads import deferToThread
 from twisted.python.threadable import isInIOThread
 
+# The number of checkpoints parsed by a single job in the thread pool
+RESUME_PARSE_CHUNK_SIZE = 100
+# The number of checkpointed downloads that are added to libtorrent at once
+RESUME_BATCH_SIZE = 50
+# The maximum number of seconds to wait for libtorrent to add a batch before starting the next one
+RESUME_BATCH_TIMEOUT = 10
+
+# Checkpointed downloads are resumed in this order
+RESUME_PRIORITY_DOWNLOADING = 0
+RESUME_PRIORITY_SEEDING = 1
+RESUME_PRIORITY_STOPPED = 2
+
 
 class TriblerLaunchMany(TaskManager):
 
@@ -60,7 +73,10 @@ class TriblerLaunchMany(TaskManager):
         self.dispersy = None
         self.ipv8 = None
         self.state_cb_count = 0
-        self.previous_active_downloads = []
+        self.active_downloads = set()
+        self.payout_downloads = {}
+        self.download_states = DownloadStates()
+        self.download_states_listeners = []
         self.download_states_lc = None
         self.get_peer_list = []
 
@@ -74,8 +90,10 @@ class TriblerLaunchMany(TaskManager):
         self.sessdoneflag = Event()
 
         self.shutdownstarttime = None
+        self.resume_statistics = {}
 
         # modules
+        self.checkpoint_store = None
         self.torrent_store = None
         self.metadata_store = None
         self.rtorrent_handler = None
@@ -84,6 +102,7 @@ class TriblerLaunchMany(TaskManager):
         self.watch_folder = None
         self.version_check_manager = None
         self.resource_monitor = None
+        self.reactor_lag_monitor = None
 
         self.category = None
         self.peer_db = None
@@ -93,6 +112,7 @@ class TriblerLaunchMany(TaskManager):
         self.channelcast_db = None
 
         self.search_manager = None
+        self.search_cache = None
         self.channel_manager = None
 
         self.video_server = None
@@ -126,6 +146,11 @@ class TriblerLaunchMany(TaskManager):
             if sys.platform == 'darwin':
                 os.environ['SSL_CERT_FILE'] = os.path.join(get_lib_path(), 'root_certs_mac.pem')
 
+            pstate_dir = self.session.get_downloads_pstate_dir()
+            self.checkpoint_store = CheckpointStore(os.path.join(pstate_dir, CHECKPOINT_DB_FILENAME))
+            self.checkpoint_store.migrate(pstate_dir)
+            self.checkpoint_store.start()
+
             if self.session.config.get_torrent_store_enabled():
                 from Tribler.Core.leveldbstore import LevelDbStore
                 self.torrent_store = LevelDbStore(self.session.config.get_torrent_store_dir())
@@ -168,6 +193,10 @@ class TriblerLaunchMany(TaskManager):
                 self.votecast_db.initialize()
                 self.channelcast_db.initialize()
 
+                from Tribler.Core.Modules.search_cache import LocalSearchCache
+                self.search_cache = LocalSearchCache(self.session)
+                self.search_cache.initialize()
+
                 from Tribler.Core.Modules.tracker_manager import TrackerManager
                 self.tracker_manager = TrackerManager(self.session)
 
@@ -470,12 +499,15 @@ class TriblerLaunchMany(TaskManager):
         if self.session.config.get_resource_monitor_enabled():
             self.resource_monitor = ResourceMonitor(self.session)
             self.resource_monitor.start()
+            self.reactor_lag_monitor = ReactorLagMonitor()
+            self.reactor_lag_monitor.start()
 
         if self.session.config.get_version_checker_enabled():
             self.version_check_manager = VersionCheckManager(self.session)
             self.version_check_manager.start()
 
-        self.session.set_download_states_callback(self.sesscb_states_callback)
+        self.add_download_states_listener(self.sesscb_states_callback)
+        self.set_download_states_callback(None)
 
         if self.session.config.get_ipv8_enabled() and self.session.config.get_trustchain_enabled():
             self.payout_manager = PayoutManager(self.trustchain_community, self.dht_community)
@@ -517,10 +549,15 @@ class TriblerLaunchMany(TaskManager):
 
             # Store in list of Downloads, always.
             self.downloads[infohash] = d
+            d.state_changed_callback = self.download_states.mark_changed
+            self.download_states.mark_changed(d)
             setup_deferred = d.setup(dscfg, pstate, wrapperDelay=setupDelay,
                                      share_mode=share_mode, checkpoint_disabled=checkpoint_disabled)
             setup_deferred.addCallback(self.on_download_handle_created)
 
+            if self.tunnel_community:
+                self.tunnel_community.on_download_added(d)
+
         if d and not hidden and self.session.config.get_megacache_enabled():
             @forceDBThread
             def write_my_pref():
@@ -555,6 +592,7 @@ class TriblerLaunchMany(TaskManager):
             infohash = d.get_def().get_infohash()
             if infohash in self.downloads:
                 del self.downloads[infohash]
+            self.download_states.remove(infohash)
 
         if not hidden:
             self.remove_id(infohash)
@@ -667,7 +705,9 @@ class TriblerLaunchMany(TaskManager):
 
     def set_download_states_callback(self, user_callback, interval=1.0):
         """
-        Set the download state callback. Remove any old callback if it's present.
+        Set the download state callback, which is called with the states of all downloads. Remove any old callback
+        if it's present. The states of the downloads are updated and passed to the download states listeners at the
+        same interval, also when the callback is None.
         """
         self.stop_download_states_callback()
         self._logger.debug("Starting the download state callback with interval %f", interval)
@@ -675,32 +715,59 @@ class TriblerLaunchMany(TaskManager):
                                                      LoopingCall(self._invoke_states_cb, user_callback))
         self.download_states_lc.start(interval)
 
+    def add_download_states_listener(self, listener):
+        """
+        Add a listener that is periodically called with the states of the downloads that have changed since the
+        previous call and the infohashes of the downloads that have been removed since.
+        """
+        self.download_states_listeners.append(listener)
+
+    def remove_download_states_listener(self, listener):
+        if listener in self.download_states_listeners:
+            self.download_states_listeners.remove(listener)
+
+    def get_download_states(self):
+        """
+        Returns the last known states of all downloads, without building new ones.
+        """
+        return self.download_states.get_states()
+
+    def get_download_states_summary(self):
+        return self.download_states.get_summary()
+
     def _invoke_states_cb(self, callback):
         """
-        Invoke the download states callback with a list of the download states.
+        Update the states of the downloads that have changed, and invoke the download states listeners with the
+        changed states and the download states callback with the states of all downloads.
         """
-        dslist = []
-        for d in self.downloads.values():
-            d.set_moreinfo_stats(True in self.get_peer_list or d.get_def().get_infohash() in
-                                 self.get_peer_list)
-            ds = d.network_get_state(None)
-            dslist.append(ds)
+        if self.get_peer_list:
+            for d in self.downloads.values():
+                d.set_moreinfo_stats(True in self.get_peer_list or d.get_def().get_infohash() in self.get_peer_list)
+
+        changed_states, removed_infohashes = self.download_states.update(self.downloads)
+
+        deferreds = [deferToThread(listener, changed_states, removed_infohashes)
+                     for listener in self.download_states_listeners]
 
-        def on_cb_done(new_get_peer_list):
-            self.get_peer_list = new_get_peer_list
+        if callback:
+            def on_cb_done(new_get_peer_list):
+                self.get_peer_list = new_get_peer_list
 
-        return deferToThread(callback, dslist).addCallback(on_cb_done)
+            deferreds.append(deferToThread(callback, self.download_states.get_states()).addCallback(on_cb_done))
 
-    def sesscb_states_callback(self, states_list):
+        return DeferredList(deferreds)
+
+    def sesscb_states_callback(self, states_list, removed_infohashes=()):
         """
-        This method is periodically (every second) called with a list of the download states of the active downloads.
+        This method is periodically (every second) called with the download states that have changed since the
+        previous call, and the infohashes of the downloads that have been removed.
         """
         self.state_cb_count += 1
 
-        # Check to see if a download has finished
-        new_active_downloads = []
         do_checkpoint = False
-        seeding_download_list = []
+        for infohash in removed_infohashes:
+            self.active_downloads.discard(infohash)
+            self.payout_downloads.pop(infohash, None)
 
         for ds in states_list:
             state = ds.get_status()
@@ -709,18 +776,20 @@ class TriblerLaunchMany(TaskManager):
             safename = tdef.get_name_as_unicode()
             infohash = tdef.get_infohash()
 
+            # Check to see if a download has finished
+            was_active = infohash in self.active_downloads
             if state == DLSTATUS_DOWNLOADING:
-                new_active_downloads.append(infohash)
-            elif state == DLSTATUS_STOPPED_ON_ERROR:
+                self.active_downloads.add(infohash)
+            else:
+                self.active_downloads.discard(infohash)
+
+            if state == DLSTATUS_STOPPED_ON_ERROR:
                 self._logger.error("Error during download: %s", repr(ds.get_error()))
                 if self.download_exists(infohash):
                     self.get_download(infohash).stop()
                     self.session.notifier.notify(NTFY_TORRENT, NTFY_ERROR, infohash, repr(ds.get_error()))
             elif state == DLSTATUS_SEEDING:
-                seeding_download_list.append({u'infohash': infohash,
-                                              u'download': download})
-
-                if infohash in self.previous_active_downloads:
+                if was_active:
                     self.session.notifier.notify(NTFY_TORRENT, NTFY_FINISHED, infohash, safename)
                     do_checkpoint = True
                 elif download.get_hops() == 0 and download.get_safe_seeding():
@@ -728,22 +797,29 @@ class TriblerLaunchMany(TaskManager):
                     hops = self.session.config.get_default_number_hops()
                     self.update_download_hops(download, hops)
 
-            # Check the peers of this download every five seconds and add them to the payout manager when
-            # this peer runs a Tribler instance
-            if self.state_cb_count % 5 == 0 and download.get_hops() == 0 and self.payout_manager:
-                for peer in download.get_peerlist():
-                    if peer["extended_version"].startswith('Tribler'):
-                        self.payout_manager.update_peer(peer["id"].decode('hex'), infohash, peer["dtotal"])
+            # The peers of a download only change while its state changes
+            if download.get_hops() == 0:
+                self.payout_downloads[infohash] = download
 
-        self.previous_active_downloads = new_active_downloads
         if do_checkpoint:
             self.session.checkpoint_downloads()
 
+        # Check the peers of the downloads that have changed every five seconds and add them to the payout manager
+        # when this peer runs a Tribler instance
+        if self.state_cb_count % 5 == 0:
+            if self.payout_manager:
+                for infohash, download in self.payout_downloads.iteritems():
+                    for peer in download.get_peerlist():
+                        if peer["extended_version"].startswith('Tribler'):
+                            self.payout_manager.update_peer(peer["id"].decode('hex'), infohash, peer["dtotal"])
+            self.payout_downloads = {}
+
         if self.state_cb_count % 4 == 0:
+            all_states = self.download_states.get_states()
             if self.tunnel_community:
-                self.tunnel_community.monitor_downloads(states_list)
+                self.tunnel_community.monitor_downloads(all_states)
             if self.credit_mining_manager:
-                self.credit_mining_manager.monitor_downloads(states_list)
+                self.credit_mining_manager.monitor_downloads(all_states)
 
         return []
 
@@ -754,33 +830,83 @@ class TriblerLaunchMany(TaskManager):
         """ Called by any thread """
 
         def do_load_checkpoint():
-            with self.session_lock:
-                for i, filename in enumerate(iglob(os.path.join(self.session.get_downloads_pstate_dir(), '*.state'))):
-                    self.resume_download(filename, setupDelay=i * 0.1)
+            return self.register_task("resume_downloads", self.resume_downloads())
 
         if self.initComplete:
-            do_load_checkpoint()
+            return do_load_checkpoint()
         else:
             self.register_task("load_checkpoint", reactor.callLater(1, do_load_checkpoint))
 
-    def load_download_pstate_noexc(self, infohash):
-        """ Called by any thread, assume session_lock already held """
-        try:
-            basename = binascii.hexlify(infohash) + '.state'
-            filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
-            if os.path.exists(filename):
-                return self.load_download_pstate(filename)
-            else:
-                self._logger.info("%s not found", basename)
+    @inlineCallbacks
+    def resume_downloads(self):
+        """
+        Resume all checkpointed downloads. The checkpoints are read from the checkpoint store and parsed in the thread
+        pool. The downloads are then added in batches, those that were downloading when Tribler was shut down first.
+        The next batch is added as soon as libtorrent has added the previous one.
+        """
+        start_time = timemod.time()
+        stored = self.checkpoint_store.get_all()
+        read_time = timemod.time()
+
+        chunks = yield DeferredList([deferToThread(self.parse_checkpoints, stored[i:i + RESUME_PARSE_CHUNK_SIZE])
+                                     for i in xrange(0, len(stored), RESUME_PARSE_CHUNK_SIZE)],
+                                    fireOnOneErrback=True, consumeErrors=True)
+        checkpoints = [checkpoint for _, chunk in chunks for checkpoint in chunk]
+        checkpoints.sort(key=lambda checkpoint: self.get_resume_priority(checkpoint[3]))
+        parse_time = timemod.time()
+
+        resumed = 0
+        for i in xrange(0, len(checkpoints), RESUME_BATCH_SIZE):
+            if self.shutdownstarttime:
+                break
+
+            downloads = []
+            with self.session_lock:
+                for infohash, tdef, dscfg, pstate in checkpoints[i:i + RESUME_BATCH_SIZE]:
+                    download = self.resume_download(infohash, checkpoint=(tdef, dscfg, pstate))
+                    if download:
+                        downloads.append(download)
+            resumed += len(downloads)
+            yield self.wait_for_handles(downloads, RESUME_BATCH_TIMEOUT)
+        end_time = timemod.time()
+
+        self.resume_statistics = {"checkpoints": len(stored), "resumed": resumed,
+                                  "read_time": read_time - start_time, "parse_time": parse_time - read_time,
+                                  "add_time": end_time - parse_time, "total_time": end_time - start_time}
+        self._logger.info("tlm: resumed %d of %d checkpointed downloads in %.2f seconds (read %.2f, parse %.2f, "
+                          "add %.2f)", resumed, len(stored), self.resume_statistics["total_time"],
+                          self.resume_statistics["read_time"], self.resume_statistics["parse_time"],
+                          self.resume_statistics["add_time"])
+
+    def wait_for_handles(self, downloads, timeout):
+        """
+        Returns a Deferred that fires when all downloads have a libtorrent handle, or after timeout seconds.
+        """
+        deferred = Deferred()
 
-        except Exception:
-            self._logger.exception("Exception while loading pstate: %s", infohash)
+        def on_done(_):
+            if not deferred.called:
+                deferred.callback(None)
+            if timeout_call.active():
+                timeout_call.cancel()
 
-    def resume_download(self, filename, setupDelay=0):
-        tdef = dscfg = pstate = None
+        timeout_call = reactor.callLater(timeout, on_done, None)
+        DeferredList([download.get_handle() for download in downloads]).addCallback(on_done)
+        return deferred
+
+    def parse_checkpoints(self, checkpoints):
+        """
+        Called by a thread from the thread pool. Returns an (infohash, tdef, dscfg, pstate) tuple for every
+        (infohash, serialized checkpoint), where tdef, dscfg and pstate are None if the checkpoint is invalid.
+        """
+        return [(infohash,) + (self.parse_checkpoint(data) or (None, None, None)) for infohash, data in checkpoints]
 
+    def parse_checkpoint(self, data):
+        """
+        Called by any thread. Returns the tdef, dscfg and pstate of a serialized checkpoint, or None if it is invalid.
+        """
         try:
-            pstate = self.load_download_pstate(filename)
+            pstate = CheckpointStore.deserialize(data)
 
             # SWIFTPROC
             metainfo = pstate.get('state', 'metainfo')
@@ -793,14 +919,48 @@ class TriblerLaunchMany(TaskManager):
                     isinstance(pstate.get('download_defaults', 'saveas'), tuple):
                 pstate.set('download_defaults', 'saveas', pstate.get('download_defaults', 'saveas')[-1])
 
-            dscfg = DownloadStartupConfig(pstate)
-
+            return tdef, DownloadStartupConfig(pstate), pstate
         except:
-            # pstate is invalid or non-existing
-            _, file = os.path.split(filename)
+            return None
+
+    @staticmethod
+    def get_resume_priority(pstate):
+        """
+        Returns whether a checkpointed download was downloading, seeding or stopped when it was checkpointed.
+        """
+        if pstate is None:
+            return RESUME_PRIORITY_SEEDING
+        if pstate.get('download_defaults', 'user_stopped'):
+            return RESUME_PRIORITY_STOPPED
 
-            infohash = binascii.unhexlify(file[:-6])
+        # Libtorrent records the time at which a torrent has finished downloading in its resume data
+        resume_data = pstate.get('state', 'engineresumedata')
+        if isinstance(resume_data, dict) and resume_data.get('finished_time'):
+            return RESUME_PRIORITY_SEEDING
+        return RESUME_PRIORITY_DOWNLOADING
+
+    def load_download_pstate_noexc(self, infohash):
+        """ Called by any thread, assume session_lock already held """
+        try:
+            pstate = self.checkpoint_store.get(infohash)
+            if pstate is None:
+                self._logger.info("checkpoint of %s not found", binascii.hexlify(infohash))
+            return pstate
 
+        except Exception:
+            self._logger.exception("Exception while loading pstate: %s", infohash)
+
+    def resume_download(self, infohash, setupDelay=0, checkpoint=None):
+        """
+        Resume a checkpointed download. The checkpoint is read from the checkpoint store and parsed, unless its
+        (tdef, dscfg, pstate) are given.
+        :return: the resumed download, or None if the download could not be resumed.
+        """
+        tdef, dscfg, pstate = checkpoint or self.parse_checkpoint(self.checkpoint_store.get_serialized(infohash)) \
+            or (None, None, None)
+
+        if pstate is None:
+            # pstate is invalid or non-existing
             torrent_data = self.torrent_store.get(infohash)
             if torrent_data:
                 try:
@@ -824,21 +984,22 @@ class TriblerLaunchMany(TaskManager):
             if dscfg.get_dest_dir() != '':  # removed torrent ignoring
                 try:
                     if not self.download_exists(tdef.get_infohash()):
-                        self.add(tdef, dscfg, pstate, setupDelay=setupDelay)
+                        return self.add(tdef, dscfg, pstate, setupDelay=setupDelay)
                     else:
                         self._logger.info("tlm: not resuming checkpoint because download has already been added")
 
                 except Exception as e:
                     self._logger.exception("tlm: load check_point: exception while adding download %s", tdef)
             else:
-                self._logger.info("tlm: removing checkpoint %s destdir is %s", filename, dscfg.get_dest_dir())
-                os.remove(filename)
+                self._logger.info("tlm: removing checkpoint %s destdir is %s", binascii.hexlify(infohash),
+                                  dscfg.get_dest_dir())
+                self.checkpoint_store.remove(infohash)
         else:
-            self._logger.info("tlm: could not resume checkpoint %s %s %s", filename, tdef, dscfg)
+            self._logger.info("tlm: could not resume checkpoint %s %s %s", binascii.hexlify(infohash), tdef, dscfg)
 
     def checkpoint_downloads(self):
         """
-        Checkpoints all running downloads in Tribler.
+        Checkpoints all running downloads in Tribler that have changed since their last checkpoint.
         Even if the list of Downloads changes in the mean time this is no problem.
         For removals, dllist will still hold a pointer to the download, and additions are no problem
         (just won't be included in list of states returned via callback).
@@ -847,9 +1008,14 @@ class TriblerLaunchMany(TaskManager):
         deferred_list = []
         self._logger.debug("tlm: checkpointing %s downloads", len(downloads))
         for download in downloads:
-            deferred_list.append(download.checkpoint())
+            deferred_list.append(download.checkpoint(only_if_modified=True))
+
+        def flush_checkpoints(_):
+            # Write all new checkpoints at once
+            if self.checkpoint_store:
+                self.checkpoint_store.flush()
 
-        return DeferredList(deferred_list)
+        return DeferredList(deferred_list).addCallback(flush_checkpoints)
 
     def shutdown_downloads(self):
         """
@@ -861,19 +1027,8 @@ class TriblerLaunchMany(TaskManager):
     def remove_pstate(self, infohash):
         def do_remove():
             if not self.download_exists(infohash):
-                dlpstatedir = self.session.get_downloads_pstate_dir()
-
-                # Remove checkpoint
-                hexinfohash = binascii.hexlify(infohash)
-                try:
-                    basename = hexinfohash + '.state'
-                    filename = os.path.join(dlpstatedir, basename)
-                    self._logger.debug("remove pstate: removing dlcheckpoint entry %s", filename)
-                    if os.access(filename, os.F_OK):
-                        os.remove(filename)
-                except:
-                    # Show must go on
-                    self._logger.exception("Could not remove state")
+                self._logger.debug("remove pstate: removing dlcheckpoint entry %s", binascii.hexlify(infohash))
+                self.checkpoint_store.remove(infohash)
             else:
                 self._logger.warning("remove pstate: download is back, restarted? Canceling removal! %s",
                                       repr(infohash))
@@ -924,6 +1079,10 @@ class TriblerLaunchMany(TaskManager):
             self.resource_monitor.stop()
         self.resource_monitor = None
 
+        if self.reactor_lag_monitor:
+            self.reactor_lag_monitor.stop()
+        self.reactor_lag_monitor = None
+
         self.tracker_manager = None
 
         if self.tunnel_community and self.trustchain_community:
@@ -957,6 +1116,10 @@ class TriblerLaunchMany(TaskManager):
             yield self.tftp_handler.shutdown()
         self.tftp_handler = None
 
+        if self.search_cache is not None:
+            self.search_cache.shutdown()
+        self.search_cache = None
+
         if self.channelcast_db is not None:
             yield self.channelcast_db.close()
         self.channelcast_db = None
@@ -1014,15 +1177,13 @@ class TriblerLaunchMany(TaskManager):
             self.ltmgr.shutdown()
             self.ltmgr = None
 
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.close()
+            self.checkpoint_store = None
+
     def save_download_pstate(self, infohash, pstate):
         """ Called by network thread """
 
         self.downloads[infohash].pstate_for_restart = pstate
 
         self.register_anonymous_task("save_pstate", self.downloads[infohash].save_resume_data())
-
-    def load_download_pstate(self, filename):
-        """ Called by any thread """
-        pstate = CallbackConfigParser()
-        pstate.read_file(filename)
-        return pstate
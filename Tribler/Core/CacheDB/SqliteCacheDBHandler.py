@@ -21,6 +21,7 @@ from Tribler.Core.CacheDB.sqlitecachedb import bin2str, str2bin
 from Tribler.Core.TorrentDef import TorrentDef
 import Tribler.Core.Utilities.json_util as json
 from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords
+from Tribler.Core.Utilities.term_index import TermIndex, rank_by_distance
 from Tribler.Core.Utilities.tracker_utils import get_uniformed_tracker_url
 from Tribler.Core.Utilities.unicode import dunno2unicode
 from Tribler.Core.simpledefs import (INFOHASH_LENGTH, NTFY_UPDATE, NTFY_INSERT, NTFY_DELETE, NTFY_CREATE,
@@ -32,6 +33,18 @@ from Tribler.pyipv8.ipv8.taskmanager import TaskManager
 
 VOTECAST_FLUSH_DB_INTERVAL = 15
 
+# Torrents received from the network are written to the database in groups, once one of these limits is reached
+INGEST_FLUSH_DB_INTERVAL = 2
+INGEST_FLUSH_DB_SIZE = 500
+
+# At startup, the in-memory term index is filled from the FullTextIndex in batches, to keep the reactor responsive
+TERM_INDEX_REBUILD_INTERVAL = 0.1
+TERM_INDEX_REBUILD_BATCH_SIZE = 2000
+
+# A search suggestion is picked from the torrent names containing one of the terms closest to the keywords
+SUGGESTION_TERMS_PER_KEYWORD = 5
+SUGGESTION_CANDIDATE_LIMIT = 200
+
 DEFAULT_ID_CACHE_SIZE = 1024 * 5
 
 
@@ -227,6 +240,16 @@ class TorrentDBHandler(BasicDBHandler):
         # to incoming remote torrents without doing a full text search.
         self.latest_matchinfo_torrent = None
 
+        # Write-behind queues for torrents received from the network, keyed by infohash to drop duplicates
+        self._pending_collected = OrderedDict()
+        self._pending_search_results = OrderedDict()
+        self._pending_external = OrderedDict()
+
+        # Terms of the torrent names in the FullTextIndex, up to and including rowid _term_index_rowid
+        self.term_index = TermIndex()
+        self._term_index_rowid = 0
+        self._term_index_complete = False
+
     def initialize(self, *args, **kwargs):
         super(TorrentDBHandler, self).initialize(*args, **kwargs)
         self.category = self.session.lm.category
@@ -234,8 +257,13 @@ class TorrentDBHandler(BasicDBHandler):
         self.votecast_db = self.session.open_dbhandler(NTFY_VOTECAST)
         self.channelcast_db = self.session.open_dbhandler(NTFY_CHANNELCAST)
         self._rtorrent_handler = self.session.lm.rtorrent_handler
+        self.register_task(u"flush_ingest_queue",
+                           LoopingCall(self.flush_ingest_queue)).start(INGEST_FLUSH_DB_INTERVAL, now=False)
+        self.register_task(u"rebuild_term_index",
+                           LoopingCall(self._rebuild_term_index_step)).start(TERM_INDEX_REBUILD_INTERVAL, now=True)
 
     def close(self):
+        self.flush_ingest_queue()
         super(TorrentDBHandler, self).close()
         self.category = None
         self.mypref_db = None
@@ -314,7 +342,18 @@ class TorrentDBHandler(BasicDBHandler):
             self.notifier.notify(NTFY_TORRENTS, NTFY_INSERT, infohash)
 
     def addExternalTorrentNoDef(self, infohash, name, files, trackers, timestamp, extra_info={}):
-        if not self.hasTorrent(infohash):
+        self._add_external_torrents_no_def([(infohash, name, files, trackers, timestamp, extra_info)])
+
+    def _add_external_torrents_no_def(self, torrents):
+        """
+        Add torrents for which we only know the name, files and trackers. The files of all torrents are inserted
+        using a single statement.
+        """
+        insert_files = []
+        for infohash, name, files, trackers, timestamp, extra_info in torrents:
+            if self.hasTorrent(infohash):
+                continue
+
             metainfo = {'info': {}, 'encoding': 'utf_8'}
             metainfo['info']['name'] = name.encode('utf_8')
             metainfo['info']['piece length'] = -1
@@ -330,7 +369,7 @@ class TorrentDBHandler(BasicDBHandler):
             elif len(files) == 1:
                 metainfo['info']['length'] = files[0][1]
             else:
-                return
+                continue
 
             if len(trackers) > 0:
                 metainfo['announce'] = trackers[0]
@@ -348,13 +387,15 @@ class TorrentDBHandler(BasicDBHandler):
                 if self._rtorrent_handler:
                     self._rtorrent_handler.notify_possible_torrent_infohash(infohash)
 
-                insert_files = [(torrent_id, unicode(path), length) for path, length in files]
-                sql_insert_files = "INSERT OR IGNORE INTO TorrentFiles (torrent_id, path, length) VALUES (?,?,?)"
-                self._db.executemany(sql_insert_files, insert_files)
+                insert_files.extend((torrent_id, unicode(path), length) for path, length in files)
             except:
                 self._logger.exception("Could not create a TorrentDef instance %r %r %r %r %r %r",
                                        infohash, timestamp, name, files, trackers, extra_info)
 
+        if insert_files:
+            sql_insert_files = "INSERT OR IGNORE INTO TorrentFiles (torrent_id, path, length) VALUES (?,?,?)"
+            self._db.executemany(sql_insert_files, insert_files)
+
     def addOrGetTorrentID(self, infohash):
         assert isinstance(infohash, str), "INFOHASH has invalid type: %s" % type(infohash)
         assert len(infohash) == INFOHASH_LENGTH, "INFOHASH has invalid length: %d" % len(infohash)
@@ -455,7 +496,15 @@ class TorrentDBHandler(BasicDBHandler):
             filenames = filenames[:1000]
 
         values = (torrent_id, swarm_keywords, " ".join(filenames), " ".join(fileextensions))
+
+        # Rows beyond _term_index_rowid are picked up by the term index rebuild
+        update_term_index = self._term_index_complete or torrent_id <= self._term_index_rowid
         try:
+            old_swarmname = None
+            if update_term_index:
+                old_swarmname = self._db.fetchone(u"SELECT swarmname FROM FullTextIndex WHERE rowid = ?",
+                                                  (torrent_id,))
+
             # INSERT OR REPLACE not working for fts3 table
             self._db.execute_write(u"DELETE FROM FullTextIndex WHERE rowid = ?", (torrent_id,))
             self._db.execute_write(
@@ -463,6 +512,42 @@ class TorrentDBHandler(BasicDBHandler):
         except:
             # this will fail if the fts3 module cannot be found
             print_exc()
+        else:
+            if update_term_index:
+                if old_swarmname:
+                    self._remove_from_term_index(old_swarmname)
+                self._add_to_term_index(swarm_keywords)
+
+    def _add_to_term_index(self, swarmname):
+        self.term_index.add(set(swarmname.split()))
+
+    def _remove_from_term_index(self, swarmname):
+        self.term_index.remove(set(swarmname.split()))
+
+    def _rebuild_term_index_step(self):
+        """
+        Add the next batch of torrent names in the FullTextIndex to the in-memory term index.
+        """
+        rows = self._db.fetchall(u"SELECT rowid, swarmname FROM FullTextIndex WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                 (self._term_index_rowid, TERM_INDEX_REBUILD_BATCH_SIZE))
+        for _, swarmname in rows:
+            if swarmname:
+                self._add_to_term_index(swarmname)
+        # Sort the new terms in now, rather than all at once when the index is first used
+        self.term_index.get_sorted_terms()
+
+        if rows:
+            self._term_index_rowid = rows[-1][0]
+        if len(rows) < TERM_INDEX_REBUILD_BATCH_SIZE:
+            self._term_index_complete = True
+            self.cancel_pending_task(u"rebuild_term_index")
+
+    def _complete_term_index(self):
+        """
+        Finish the rebuild of the term index right away.
+        """
+        while not self._term_index_complete:
+            self._rebuild_term_index_step()
 
     # ------------------------------------------------------------
     # Adds the trackers of a given torrent into the database.
@@ -621,6 +706,63 @@ class TorrentDBHandler(BasicDBHandler):
         for torrent_id, swarmname in to_be_indexed:
             self._indexTorrent(torrent_id, swarmname, [])
 
+    @property
+    def ingest_queue_size(self):
+        return len(self._pending_collected) + len(self._pending_search_results) + len(self._pending_external)
+
+    def queue_torrent_collect_response(self, infohashes):
+        """
+        Write-behind variant of on_torrent_collect_response.
+        """
+        for infohash in infohashes:
+            self._pending_collected[infohash] = None
+        self._check_ingest_queue()
+
+    def queue_search_response(self, torrents):
+        """
+        Write-behind variant of on_search_response. A later result for the same infohash replaces an earlier one.
+        """
+        for torrent in torrents:
+            self._pending_search_results[torrent[0]] = torrent
+        self._check_ingest_queue()
+
+    def queue_external_torrent_no_def(self, infohash, name, files, trackers, timestamp, extra_info={}):
+        """
+        Write-behind variant of addExternalTorrentNoDef.
+        """
+        self._pending_external[infohash] = (infohash, name, files, trackers, timestamp, extra_info)
+        self._check_ingest_queue()
+
+    def _check_ingest_queue(self):
+        if self.ingest_queue_size >= INGEST_FLUSH_DB_SIZE:
+            self.flush_ingest_queue()
+
+    def flush_ingest_queue(self):
+        """
+        Write all queued torrents to the database. Torrents for which we received the most information win:
+        full torrent messages over search results, and search results over bare collected infohashes.
+        """
+        if not self.ingest_queue_size:
+            return
+
+        external = self._pending_external
+        search_results = [torrent for infohash, torrent in self._pending_search_results.iteritems()
+                          if infohash not in external]
+        collected = [infohash for infohash in self._pending_collected
+                     if infohash not in external and infohash not in self._pending_search_results]
+
+        self._pending_collected = OrderedDict()
+        self._pending_search_results = OrderedDict()
+        self._pending_external = OrderedDict()
+
+        # keep the number of SQL variables of a single query within the limits of SQLite
+        for index in xrange(0, len(collected), INGEST_FLUSH_DB_SIZE):
+            self.on_torrent_collect_response(collected[index:index + INGEST_FLUSH_DB_SIZE])
+        if search_results:
+            self.on_search_response(search_results)
+        if external:
+            self._add_external_torrents_no_def(external.values())
+
     def getTorrentCheckRetries(self, torrent_id):
         sql = u"SELECT tracker_check_retries FROM Torrent WHERE torrent_id = ?"
         result = self._db.fetchone(sql, (torrent_id,))
@@ -699,16 +841,22 @@ class TorrentDBHandler(BasicDBHandler):
                 self.session.save_collected_torrent(infohash, bencode(tdef.metainfo))
 
     def getTorrentsOnTracker(self, tracker, current_time, limit=30):
+        """
+        Returns the infohashes of the torrents on a tracker that are due for a check. The torrents that have not been
+        checked for the longest time come first, weighted by their popularity and halved for every failed check.
+        """
         sql = """
             SELECT T.infohash
               FROM Torrent T, TrackerInfo TI, TorrentTrackerMapping TTM
               WHERE TI.tracker = ?
               AND TI.tracker_id = TTM.tracker_id AND T.torrent_id = TTM.torrent_id
               AND next_tracker_check < ?
-              ORDER BY next_tracker_check DESC
+              ORDER BY ((? - last_tracker_check)
+                        * (1 + MIN(IFNULL(num_seeders, 0) + IFNULL(num_leechers, 0), 1000)))
+                       >> tracker_check_retries DESC
               LIMIT ?
             """
-        return [str2bin(tinfo[0]) for tinfo in self._db.fetchall(sql, (tracker, current_time, limit))]
+        return [str2bin(tinfo[0]) for tinfo in self._db.fetchall(sql, (tracker, current_time, current_time, limit))]
 
     def getTrackerListByTorrentID(self, torrent_id):
         sql = 'SELECT TR.tracker FROM TrackerInfo TR, TorrentTrackerMapping MP'\
@@ -826,6 +974,28 @@ class TorrentDBHandler(BasicDBHandler):
         results = self._db.fetchall(sql, (limit,))
         return [[str2bin(result[0]), result[1], result[2], result[3] or 0] for result in results]
 
+    def get_last_tracker_checks(self, infohashes):
+        """
+        Returns a dictionary with the time of the last tracker check of every given torrent that is in the database.
+        """
+        if not infohashes:
+            return {}
+        parameters = u",".join(u"?" * len(infohashes))
+        sql = u"SELECT infohash, last_tracker_check FROM Torrent WHERE infohash IN (%s)" % parameters
+        results = self._db.fetchall(sql, [bin2str(infohash) for infohash in infohashes])
+        return {str2bin(infohash): last_tracker_check or 0 for infohash, last_tracker_check in results}
+
+    def update_torrents_health(self, torrents_health):
+        """
+        Update the health of several torrents in a single statement, without notifying the observers.
+        :param torrents_health: a list of (infohash, num_seeders, num_leechers, last_tracker_check, status) tuples.
+        """
+        sql = u"UPDATE Torrent SET num_seeders = ?, num_leechers = ?, last_tracker_check = ?, status = ? " \
+              u"WHERE infohash = ?"
+        self._db.executemany(sql, [(num_seeders, num_leechers, last_tracker_check, status, bin2str(infohash))
+                                   for infohash, num_seeders, num_leechers, last_tracker_check, status
+                                   in torrents_health])
+
     def getRandomlyCollectedTorrents(self, insert_time, limit):
         sql = u"""
             SELECT CT.infohash, CT.num_seeders, CT.num_leechers, T.last_tracker_check
@@ -922,69 +1092,55 @@ class TorrentDBHandler(BasicDBHandler):
             score += inv_doc_freq * right_side
         return score
 
-    def search_in_local_torrents_db(self, query, keys=None):
+    def search_in_local_torrents_db(self, query, keys=None, limit=None):
         """
         Search in the local database for torrents matching a specific query. This method also assigns a relevance
-        score to each torrent, based on the name, files and file extensions.
-        The algorithm is based on BM25. The document length factor is regarded since our "documents" are very small
-        (often a few keywords).
-        See https://en.wikipedia.org/wiki/Okapi_BM25 for more information about BM25.
+        score to each torrent, based on the name, files and file extensions (see bm25_score in search_utils.py).
+        Torrents with seeders are made more relevant. The ranking is done by SQLite, which only returns the best
+        limit results when a limit is given.
         """
-        search_results = []
         keys_str = ", ".join(keys)
         keywords = split_into_keywords(query, to_filter_stopwords=True)
         infohash_index = keys.index('infohash')
 
-        # This query gets torrents matching speciifc keywords. The matchinfo object is also returned. For more
+        relevance = "bm25_score(Matchinfo(FullTextIndex, 'pcnalx'))"
+        if 'num_seeders' in keys:
+            # If this torrent has a non-zero amount of seeders, we make it more relevant
+            relevance += " + MAX(IFNULL(num_seeders, 0), 0)"
+
+        # This query gets torrents matching specific keywords. The matchinfo object is also returned. For more
         # information about the returned matchinfo parameters, see https://www.sqlite.org/fts3.html#matchinfo.
-        results = self._db.fetchall("SELECT DISTINCT %s, Matchinfo(FullTextIndex, 'pcnalx') "
-                                    "FROM Torrent T, FullTextIndex "
-                                    "LEFT OUTER JOIN _ChannelTorrents C ON T.torrent_id = C.torrent_id "
-                                    "WHERE t.name IS NOT NULL AND t.torrent_id = FullTextIndex.rowid "
-                                    "AND C.deleted_at IS NULL AND FullTextIndex MATCH ?"
-                                    % keys_str, (" OR ".join(keywords),))
+        sql = "SELECT DISTINCT %s, Matchinfo(FullTextIndex, 'pcnalx'), %s AS relevance " \
+              "FROM Torrent T, FullTextIndex " \
+              "LEFT OUTER JOIN _ChannelTorrents C ON T.torrent_id = C.torrent_id " \
+              "WHERE t.name IS NOT NULL AND t.torrent_id = FullTextIndex.rowid " \
+              "AND C.deleted_at IS NULL AND FullTextIndex MATCH ? " \
+              "ORDER BY relevance DESC" % (keys_str, relevance)
+        args = [" OR ".join(keywords)]
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
 
-        for result in results:
+        search_results = []
+        for result in self._db.fetchall(sql, args):
             result = list(result)  # We convert the result to a mutable list since we have to decode the infohash
             result[infohash_index] = str2bin(result[infohash_index])
-            matchinfo = result[len(keys)]  # The matchinfo is the last element in the results tuple
-            self.latest_matchinfo_torrent = matchinfo, keywords
-            num_phrases, num_cols, num_rows = unpack_from('III', matchinfo)
-
-            unpack_str = 'I' * (3 * num_cols * num_phrases)
-            matchinfo = unpack_from('I' * 9 + unpack_str, matchinfo)[9:]
-
-            scores = []
-
-            for col_ind in xrange(num_cols):
-                score = 0
-                for phrase_ind in xrange(num_phrases):
-                    # Fetch info about the current matching term. This number is fetched from the matchinfo object.
-                    # See https://www.sqlite.org/fts3.html#matchinfo for info about the offset calculation.
-                    base_term_offset = 3 * (col_ind + phrase_ind * num_cols)
-                    rows_with_term = matchinfo[base_term_offset + 2]
-                    term_freq = matchinfo[base_term_offset]
+            search_results.append(result)
 
-                    inv_doc_freq = math.log((num_rows - rows_with_term + 0.5) / (rows_with_term + 0.5), 2)
-                    right_side = ((term_freq * (1.2 + 1)) / (term_freq + 1.2))
-
-                    score += inv_doc_freq * right_side
-
-                scores.append(score)
-
-            # Our score is 80% dependent on matching in the name of the torrent, 10% on the names of the files in the
-            # torrent and 10% on the extensions of files in the torrent.
-            rel_score = 0.8 * scores[0] + 0.1 * scores[1] + 0.1 * scores[2]
-            if 'num_seeders' in keys and result[keys.index('num_seeders')] > 0:
-                # If this torrent has a non-zero amount of seeders, we make it more relevant
-                rel_score += result[keys.index('num_seeders')]
-
-            extended_result = result + [rel_score]
-            search_results.append(extended_result)
+        if search_results:
+            # The matchinfo is the second to last element in the results. We only use the statistics in this object
+            # that are shared by all results.
+            self.latest_matchinfo_torrent = search_results[-1][len(keys)], keywords
 
         return search_results
 
-    def searchNames(self, kws, local=True, keys=None, doSort=True):
+    def searchNames(self, kws, local=True, keys=None, doSort=True, limit=None):
+        """
+        Search for torrents matching the given keywords and merge the results with the channels they are in.
+        SQLite ranks the torrents, by number of seeders if doSort is set and by their bm25_score otherwise, and only
+        returns the best limit torrents when a limit is given. The relevance score takes the place of the matchinfo
+        column in the returned rows.
+        """
         assert 'infohash' in keys
         assert not doSort or ('num_seeders' in keys or 'T.num_seeders' in keys)
 
@@ -995,7 +1151,8 @@ class TorrentDBHandler(BasicDBHandler):
             doSort = False
 
         values = ", ".join(keys)
-        mainsql = "SELECT " + values + ", C.channel_id, Matchinfo(FullTextIndex) FROM"
+        mainsql = "SELECT " + values + ", C.channel_id, " \
+                  "bm25_score(Matchinfo(FullTextIndex, 'pcnalx')) AS relevance FROM"
         if local:
             mainsql += " Torrent T"
         else:
@@ -1007,12 +1164,22 @@ class TorrentDBHandler(BasicDBHandler):
                     """
 
         if not local:
-            mainsql += "AND T.secret is not 1 LIMIT 250"
+            mainsql += "AND T.secret is not 1 "
+            limit = 250 if limit is None else limit
+
+        if doSort:
+            # Torrents without seeders come last, ordered by their relevance
+            mainsql += "ORDER BY MAX(IFNULL(%s, 0), 0) DESC, relevance DESC" % keys[num_seeders_index]
+        else:
+            mainsql += "ORDER BY relevance DESC"
 
         query = " ".join(filter_keywords(kws))
-        not_negated = [kw for kw in filter_keywords(kws) if kw[0] != '-']
+        args = [query]
+        if limit is not None:
+            mainsql += " LIMIT ?"
+            args.append(limit)
 
-        results = self._db.fetchall(mainsql, (query,))
+        results = self._db.fetchall(mainsql, args)
 
         channels = set()
         channel_dict = {}
@@ -1030,7 +1197,8 @@ class TorrentDBHandler(BasicDBHandler):
 
         myChannelId = self.channelcast_db._channel_id or 0
 
-        result_dict = {}
+        # The results are already ranked, so we keep the rank of the first row of every torrent
+        result_dict = OrderedDict()
 
         # step 1, merge torrents keep one with best channel
         for result in results:
@@ -1066,122 +1234,51 @@ class TorrentDBHandler(BasicDBHandler):
             elif infohash not in result_dict:
                 result_dict[infohash] = result
 
-
         # step 2, fix all dict fields
-        dont_sort_list = []
-        results = [list(result) for result in result_dict.values()]
-        for index in xrange(len(results) - 1, -1, -1):
-            result = results[index]
-
+        results = [list(result) for result in result_dict.itervalues()]
+        for result in results:
             result[infohash_index] = str2bin(result[infohash_index])
 
-            matches = {'swarmname': set(), 'filenames': set(), 'fileextensions': set()}
-
-            # Matchinfo is documented at: http://www.sqlite.org/fts3.html#matchinfo
-            matchinfo = str(result[-1])
-            num_phrases, num_cols = unpack_from('II', matchinfo)
-            unpack_str = 'I' * (3 * num_cols * num_phrases)
-            matchinfo = unpack_from('II' + unpack_str, matchinfo)
-
-            swarmnames, filenames, fileextensions = [
-                [matchinfo[3 * (i + p * num_cols) + 2] for p in range(num_phrases)]
-                for i in range(num_cols)
-            ]
-
-            for i, keyword in enumerate(not_negated):
-                if swarmnames[i]:
-                    matches['swarmname'].add(keyword)
-                if filenames[i]:
-                    matches['filenames'].add(keyword)
-                if fileextensions[i]:
-                    matches['fileextensions'].add(keyword)
-            result[-1] = matches
-
             channel = channel_dict.get(result[-2], (result[-2], None, '', '', 0, 0, 0, 0, 0, False))
             result.extend(channel)
 
-            if doSort and result[num_seeders_index] <= 0:
-                dont_sort_list.append((index, result))
-
-        if doSort:
-            # Remove the items with 0 seeders from the results list so the sort is faster, append them to the
-            # results list afterwards.
-            for index, result in dont_sort_list:
-                results.pop(index)
-
-            def compare(a, b):
-                return cmp(a[num_seeders_index], b[num_seeders_index])
-            results.sort(compare, reverse=True)
-
-            for index, result in dont_sort_list:
-                results.append(result)
-
         if not local:
             results = results[:25]
 
         return results
 
-    def getAutoCompleteTerms(self, keyword, max_terms, limit=100):
-        sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
-        result = self._db.fetchall(sql, ('"%s*"' % keyword, limit))
-
-        all_terms = set()
-        for line, in result:
-            if len(all_terms) >= max_terms:
-                break
-            i1 = line.find(keyword)
-            i2 = line.find(' ', i1 + len(keyword))
-            all_terms.add(line[i1:i2] if i2 >= 0 else line[i1:])
-
-        if keyword in all_terms:
-            all_terms.remove(keyword)
-        if '' in all_terms:
-            all_terms.remove('')
+    def getAutoCompleteTerms(self, keyword, max_terms):
+        """
+        Returns up to max_terms completions of the last word of keyword, the most common terms first.
+        This does not wait for the term index to be rebuilt at startup, so completions may be missing until then.
+        """
+        keywords = split_into_keywords(keyword)
+        if not keywords or not keyword[-1].isalnum():
+            return []
 
-        return list(all_terms)
+        prefix = keywords[-1]
+        head = keyword[:-len(prefix)]
+        return [head + term for term in self.term_index.complete(prefix, max_terms + 1) if term != prefix][:max_terms]
 
     def getSearchSuggestion(self, keywords, limit=1):
+        """
+        Returns the names of the torrents that are closest to the given (possibly misspelled) keywords.
+        The names are ranked by the summed edit distance between the keywords and their closest terms in the name.
+        This does not wait for the term index to be rebuilt at startup, so suggestions may be missing until then.
+        """
         match = [keyword.lower() for keyword in keywords if len(keyword) > 3]
+        if not match:
+            return []
 
-        def lev(a, b):
-            "Calculates the Levenshtein distance between a and b."
-            n, m = len(a), len(b)
-            if n > m:
-                # Make sure n <= m, to use O(min(n,m)) space
-                a, b = b, a
-                n, m = m, n
-
-            current = range(n + 1)
-            for i in range(1, m + 1):
-                previous, current = current, [i] + [0] * n
-                for j in range(1, n + 1):
-                    add, delete = previous[j] + 1, current[j - 1] + 1
-                    change = previous[j - 1]
-                    if a[j - 1] != b[i - 1]:
-                        change = change + 1
-                    current[j] = min(add, delete, change)
-
-            return current[n]
-
-        def levcollate(s1, s2):
-            l1 = sum(sorted([lev(a, b) for a in s1.split() for b in match])[:len(match)])
-            l2 = sum(sorted([lev(a, b) for a in s2.split() for b in match])[:len(match)])
-
-            # return -1 if s1<s2, +1 if s1>s2 else 0
-            if l1 < l2:
-                return -1
-            if l1 > l2:
-                return 1
-            return 0
-
-        cursor = self._db.get_cursor()
-        connection = cursor.getconnection()
-        connection.createcollation("leven", levcollate)
+        terms = set()
+        for keyword in match:
+            terms.update(self.term_index.lookup(keyword, limit=SUGGESTION_TERMS_PER_KEYWORD))
+        if not terms:
+            return []
 
-        sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? ORDER By swarmname collate leven ASC LIMIT ?"
-        results = self._db.fetchall(sql, (' OR '.join(['*%s*' % m for m in match]), limit))
-        connection.createcollation("leven", None)
-        return [result[0] for result in results]
+        sql = u"SELECT rowid, swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
+        results = self._db.fetchall(sql, (u' OR '.join(u'"%s"' % term for term in terms), SUGGESTION_CANDIDATE_LIMIT))
+        return rank_by_distance(results, match, limit)
 
 
 class MyPreferenceDBHandler(BasicDBHandler):
@@ -1405,6 +1502,9 @@ class ChannelCastDBHandler(BasicDBHandler):
         self.votecast_db = None
         self.torrent_db = None
 
+        # Write-behind queue for channel torrents, keyed by (channel_id, infohash) to drop duplicates
+        self._pending_torrents = OrderedDict()
+
     def initialize(self, *args, **kwargs):
         self._channel_id = self.getMyChannelId()
         self._logger.debug(u"Channels: my channel is %s", self._channel_id)
@@ -1422,8 +1522,11 @@ class ChannelCastDBHandler(BasicDBHandler):
             self._db.executemany(update, rows)
 
         self.register_task(u"update_nr_torrents", LoopingCall(update_nr_torrents)).start(300, now=False)
+        self.register_task(u"flush_ingest_queue",
+                           LoopingCall(self.flush_ingest_queue)).start(INGEST_FLUSH_DB_INTERVAL, now=False)
 
     def close(self):
+        self.flush_ingest_queue()
         super(ChannelCastDBHandler, self).close()
         self._channel_id = None
         self.my_dispersy_cid = None
@@ -1576,7 +1679,26 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
             # inform the channel_manager about new channel torrents
             self.notifier.notify(SIGNAL_CHANNEL_COMMUNITY, SIGNAL_ON_TORRENT_UPDATED, channel_id, item)
 
+    def queue_torrents_from_dispersy(self, torrentlist):
+        """
+        Write-behind variant of on_torrents_from_dispersy.
+        """
+        for torrent in torrentlist:
+            self._pending_torrents[(torrent[0], torrent[3])] = torrent
+        if len(self._pending_torrents) >= INGEST_FLUSH_DB_SIZE:
+            self.flush_ingest_queue()
+
+    def flush_ingest_queue(self):
+        """
+        Write all queued channel torrents to the database.
+        """
+        if self._pending_torrents:
+            torrentlist = self._pending_torrents.values()
+            self._pending_torrents = OrderedDict()
+            self.on_torrents_from_dispersy(torrentlist)
+
     def on_remove_torrent_from_dispersy(self, channel_id, dispersy_id, redo):
+        self.flush_ingest_queue()
         sql = "UPDATE _ChannelTorrents SET deleted_at = ? WHERE channel_id = ? and dispersy_id = ?"
 
         if redo:
@@ -1611,6 +1733,7 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
                 self.notifier.notify(NTFY_TORRENTS, NTFY_UPDATE, infohash)
 
     def addOrGetChannelTorrentID(self, channel_id, infohash):
+        self.flush_ingest_queue()
         torrent_id = self.torrent_db.addOrGetTorrentID(infohash)
 
         sql = "SELECT id FROM _ChannelTorrents WHERE torrent_id = ? AND channel_id = ?"
@@ -1623,6 +1746,7 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
         return channeltorrent_id
 
     def get_channel_torrent_id(self, channel_id, info_hash):
+        self.flush_ingest_queue()
         torrent_id = self.torrent_db.getTorrentID(info_hash)
         if torrent_id:
             sql = "SELECT id FROM ChannelTorrents WHERE torrent_id = ? and channel_id = ?"
@@ -1633,6 +1757,7 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
         return True if self.get_channel_torrent_id(channel_id, infohash) else False
 
     def hasTorrents(self, channel_id, infohashes):
+        self.flush_ingest_queue()
         returnAr = []
         torrent_id_results = self.torrent_db.getTorrentIDS(infohashes)
 
@@ -0,0 +1,259 @@
+"""
+Off-reactor execution engine for the SQLite database.
+
+Writes are serialized onto a single writer thread that groups queued statements into one transaction, while reads
+are served by a small pool of read-only connections. Since the database runs in WAL mode, readers never block the
+writer (or the connection of SQLiteCacheDB) and only observe committed data.
+"""
+import logging
+import threading
+import time
+from Queue import Queue, Empty
+
+import apsw
+from apsw import BusyError
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+from Tribler.Core.Utilities.search_utils import bm25_score
+
+DEFAULT_READ_CONNECTIONS = 2
+DEFAULT_WRITE_BATCH_SIZE = 500
+WRITE_RETRY_INTERVAL = 0.1
+# The number of seconds after which a batch of writes fails when the write lock cannot be acquired
+WRITE_LOCK_TIMEOUT = 30
+# The number of seconds that stop waits for the writer thread to flush the pending writes
+WRITER_STOP_TIMEOUT = 60
+
+_STOP = object()
+
+
+class SQLiteExecutor(object):
+    """
+    Executes SQL statements on dedicated threads, returning Deferreds that fire on the reactor thread.
+    """
+
+    def __init__(self, db_path, busytimeout, num_readers=DEFAULT_READ_CONNECTIONS,
+                 write_batch_size=DEFAULT_WRITE_BATCH_SIZE):
+        super(SQLiteExecutor, self).__init__()
+        assert db_path != u":memory:", u"An in-memory database cannot be shared between connections"
+        assert num_readers > 0, u"At least one read connection is required"
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.db_path = db_path
+        self.busytimeout = busytimeout
+        self.write_batch_size = write_batch_size
+        self.write_lock_timeout = WRITE_LOCK_TIMEOUT
+
+        self._write_queue = Queue()
+        self._writer_thread = None
+        self._running = False
+
+        self._read_pool = ThreadPool(minthreads=num_readers, maxthreads=num_readers, name="SQLiteReader")
+        self._read_local = threading.local()
+        self._read_connections = []
+        self._read_connections_lock = threading.Lock()
+
+        self.statistics = {'reads': 0, 'writes': 0, 'transactions': 0, 'busy_retries': 0}
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """
+        Start the writer thread and the read connection pool.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        self._writer_thread = threading.Thread(target=self._write_loop, name="SQLiteWriter")
+        self._writer_thread.setDaemon(True)
+        self._writer_thread.start()
+        self._read_pool.start()
+
+    def stop(self):
+        """
+        Flush all pending writes, then stop the writer thread and close all connections.
+        """
+        if not self._running:
+            return
+
+        self._running = False
+        self._write_queue.put(_STOP)
+        # This is called on the reactor thread, which should never wait indefinitely
+        self._writer_thread.join(WRITER_STOP_TIMEOUT)
+        if self._writer_thread.isAlive():
+            self._logger.error(u"The writer thread did not stop within %d seconds", WRITER_STOP_TIMEOUT)
+        self._writer_thread = None
+
+        self._read_pool.stop()
+        with self._read_connections_lock:
+            for connection in self._read_connections:
+                connection.close()
+            self._read_connections = []
+
+    def _open_connection(self, flags):
+        connection = apsw.Connection(self.db_path, flags=flags)
+        connection.setbusytimeout(self.busytimeout)
+        connection.createscalarfunction(u"bm25_score", bm25_score, 1)
+        return connection
+
+    # --------- reads -------------
+
+    def _get_read_connection(self):
+        connection = getattr(self._read_local, 'connection', None)
+        if connection is None:
+            connection = self._open_connection(apsw.SQLITE_OPEN_READONLY)
+            self._read_local.connection = connection
+            with self._read_connections_lock:
+                self._read_connections.append(connection)
+        return connection
+
+    def _read(self, sql, args):
+        cursor = self._get_read_connection().cursor()
+        try:
+            return list(cursor.execute(sql, args) if args is not None else cursor.execute(sql))
+        finally:
+            cursor.close()
+
+    def read(self, sql, args=None):
+        """
+        Run a query on one of the read connections.
+        :return: a Deferred that fires with the list of resulting rows.
+        """
+        if not self._running:
+            raise RuntimeError(u"The SQLite executor is not running")
+
+        self.statistics['reads'] += 1
+        return deferToThreadPool(reactor, self._read_pool, self._read, sql, args)
+
+    # --------- writes -------------
+
+    def write(self, sql, args=None):
+        """
+        Queue a single statement for the writer thread.
+        :return: a Deferred that fires with the number of changed rows once the transaction has been committed.
+        """
+        return self._queue_write(sql, args, False)
+
+    def write_many(self, sql, args_list):
+        """
+        Queue a statement that is executed for every item in args_list.
+        :return: a Deferred that fires with the number of changed rows once the transaction has been committed.
+        """
+        return self._queue_write(sql, args_list, True)
+
+    def _queue_write(self, sql, args, many):
+        if not self._running:
+            raise RuntimeError(u"The SQLite executor is not running")
+
+        deferred = Deferred()
+        self._write_queue.put((sql, args, many, deferred))
+        return deferred
+
+    def _next_batch(self):
+        """
+        Block until at least one write is queued and collect whatever else is pending, up to the batch size.
+        :return: a tuple with the batch and whether the writer should stop afterwards.
+        """
+        item = self._write_queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        while len(batch) < self.write_batch_size:
+            try:
+                item = self._write_queue.get_nowait()
+            except Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write_loop(self):
+        connection = self._open_connection(apsw.SQLITE_OPEN_READWRITE)
+        try:
+            stop = False
+            while not stop:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._write_batch(connection, batch)
+        finally:
+            connection.close()
+
+    def _begin(self, cursor):
+        """
+        Acquire the write lock. The main connection of SQLiteCacheDB keeps a transaction open between commits,
+        so we keep retrying when the busy timeout expires, up to write_lock_timeout seconds.
+        :return: True if the write lock has been acquired, False otherwise.
+        """
+        deadline = time.time() + self.write_lock_timeout
+        while True:
+            try:
+                cursor.execute(u"BEGIN IMMEDIATE;")
+                return True
+            except BusyError:
+                if time.time() >= deadline:
+                    return False
+                self.statistics['busy_retries'] += 1
+                self._logger.debug(u"Database is locked, retrying write transaction")
+                time.sleep(WRITE_RETRY_INTERVAL)
+
+    def _write_batch(self, connection, batch):
+        cursor = connection.cursor()
+        if not self._begin(cursor):
+            cursor.close()
+            self._logger.error(u"Failed to acquire the write lock for a batch of %d writes", len(batch))
+            failure = Failure(BusyError(u"The database is locked"))
+            reactor.callFromThread(self._fire_results, [(deferred, failure) for _, _, _, deferred in batch])
+            return
+
+        results = []
+        for sql, args, many, deferred in batch:
+            # Every statement gets its own savepoint so that a failing statement does not roll back the others
+            cursor.execute(u"SAVEPOINT write_item;")
+            changes_before = connection.totalchanges()
+            try:
+                if many:
+                    cursor.executemany(sql, args)
+                elif args is None:
+                    cursor.execute(sql)
+                else:
+                    cursor.execute(sql, args)
+            except Exception:
+                self._logger.exception(u"Failed to execute %s with %s", sql, args)
+                cursor.execute(u"ROLLBACK TO SAVEPOINT write_item;")
+                results.append((deferred, Failure()))
+            else:
+                results.append((deferred, connection.totalchanges() - changes_before))
+            cursor.execute(u"RELEASE SAVEPOINT write_item;")
+
+        try:
+            cursor.execute(u"COMMIT;")
+        except Exception:
+            self._logger.exception(u"Failed to commit a batch of %d writes", len(batch))
+            failure = Failure()
+            results = [(deferred, failure) for deferred, _ in results]
+            if not connection.getautocommit():
+                cursor.execute(u"ROLLBACK;")
+        finally:
+            cursor.close()
+
+        self.statistics['writes'] += len(batch)
+        self.statistics['transactions'] += 1
+        reactor.callFromThread(self._fire_results, results)
+
+    @staticmethod
+    def _fire_results(results):
+        for deferred, result in results:
+            if isinstance(result, Failure):
+                deferred.errback(result)
+            else:
+                deferred.callback(result)
@@ -10,10 +10,13 @@ import apsw
 from apsw import CantOpenError, SQLError
 from base64 import encodestring, decodestring
 from threading import currentThread, RLock
+from twisted.internet.defer import succeed, fail
 from twisted.python.threadable import isInIOThread
 
 from Tribler.Core.CacheDB.db_versions import LATEST_DB_VERSION
+from Tribler.Core.CacheDB.sqlite_executor import SQLiteExecutor, DEFAULT_READ_CONNECTIONS
 from Tribler.Core.Utilities.install_dir import get_lib_path
+from Tribler.Core.Utilities.search_utils import bm25_score
 from Tribler.pyipv8.ipv8.taskmanager import TaskManager
 from Tribler.pyipv8.ipv8.util import blocking_call_on_reactor_thread
 
@@ -62,6 +65,8 @@ class SQLiteCacheDB(TaskManager):
         self._should_commit = False
         self._show_execute = False
 
+        self._executor = None
+
     @property
     def version(self):
         """The version of this database."""
@@ -75,6 +80,13 @@ class SQLiteCacheDB(TaskManager):
         """
         return self._connection
 
+    @property
+    def executor(self):
+        """
+        Returns the off-reactor execution engine, which is None if it has not been started.
+        """
+        return self._executor
+
     @blocking_call_on_reactor_thread
     def initialize(self):
         """ Initializes the database. If the database doesn't exist, we create a new one. Otherwise, we check the
@@ -90,6 +102,9 @@ class SQLiteCacheDB(TaskManager):
         Cancels all pending tasks and closes all cursors. Then, it closes the connection.
         """
         self.shutdown_task_manager()
+        # Commit first, so the writer thread can acquire the write lock to flush the pending asynchronous writes
+        self.commit_now(exiting=True)
+        self.stop_executor()
         with self._cursor_lock:
             for cursor in self._cursor_table.itervalues():
                 cursor.close()
@@ -119,6 +134,7 @@ class SQLiteCacheDB(TaskManager):
         try:
             self._connection = apsw.Connection(self.sqlite_db_path)
             self._connection.setbusytimeout(self._busytimeout)
+            self._connection.createscalarfunction(u"bm25_score", bm25_score, 1)
         except CantOpenError as e:
             msg = u"Failed to open connection to %s: %s" % (self.sqlite_db_path, e)
             raise CantOpenError(msg)
@@ -199,6 +215,28 @@ class SQLiteCacheDB(TaskManager):
             self._logger.error(msg)
             raise CorruptedDatabaseError(msg)
 
+    @blocking_call_on_reactor_thread
+    def start_executor(self, num_readers=DEFAULT_READ_CONNECTIONS):
+        """
+        Start executing the *_async calls on a dedicated writer thread and a pool of read connections.
+        An in-memory database cannot be shared between connections, so these calls keep running on the reactor.
+        """
+        if self._executor or self.sqlite_db_path == u":memory:":
+            return
+        self._executor = SQLiteExecutor(self.sqlite_db_path, self._busytimeout, num_readers=num_readers)
+        self._executor.start()
+
+    @blocking_call_on_reactor_thread
+    def stop_executor(self):
+        """
+        Flush all pending asynchronous writes and stop the execution engine.
+        """
+        if self._executor:
+            # Release the write lock held by our own open transaction, otherwise the writer thread cannot flush
+            self.commit_now()
+            self._executor.stop()
+            self._executor = None
+
     def get_cursor(self):
         thread_name = currentThread().getName()
 
@@ -393,15 +431,16 @@ class SQLiteCacheDB(TaskManager):
         find = self.execute_read(sql, args)
         if not find:
             return
+        return self._first_row(sql, list(find))
+
+    def _first_row(self, sql, find):
+        if len(find) > 0:
+            if len(find) > 1:
+                self._logger.debug(
+                    u"FetchONE resulted in many more rows than one, consider putting a LIMIT 1 in the sql statement %s, %s", sql, len(find))
+            find = find[0]
         else:
-            find = list(find)
-            if len(find) > 0:
-                if len(find) > 1:
-                    self._logger.debug(
-                        u"FetchONE resulted in many more rows than one, consider putting a LIMIT 1 in the sql statement %s, %s", sql, len(find))
-                find = find[0]
-            else:
-                return
+            return
         if len(find) > 1:
             return find
         else:
@@ -520,3 +559,45 @@ class SQLiteCacheDB(TaskManager):
         except Exception as msg:
             self._logger.exception(u"Wrong getAll sql statement: %s", sql)
             raise Exception(msg)
+
+    # -------- Asynchronous Operations --------
+    # These calls return Deferreds. Once the executor has been started, writes are committed in batches by the writer
+    # thread and reads run on a read connection, which only sees data that has been committed. Without an executor,
+    # they are executed on the reactor thread using the main connection.
+
+    def execute_write_async(self, sql, args=None):
+        if self._executor:
+            return self._executor.write(sql, args)
+        return self._run_sync(self._execute_write_changes, sql, args)
+
+    def executemany_async(self, sql, args_list):
+        if self._executor:
+            return self._executor.write_many(sql, args_list)
+        return self._run_sync(self._executemany_changes, sql, args_list)
+
+    def fetchall_async(self, sql, args=None):
+        if self._executor:
+            return self._executor.read(sql, args)
+        return self._run_sync(self.fetchall, sql, args)
+
+    def fetchone_async(self, sql, args=None):
+        if self._executor:
+            return self._executor.read(sql, args).addCallback(lambda rows: self._first_row(sql, rows))
+        return self._run_sync(self.fetchone, sql, args)
+
+    def _execute_write_changes(self, sql, args):
+        changes_before = self._connection.totalchanges()
+        self.execute_write(sql, args)
+        return self._connection.totalchanges() - changes_before
+
+    def _executemany_changes(self, sql, args_list):
+        changes_before = self._connection.totalchanges()
+        self.executemany(sql, args_list)
+        return self._connection.totalchanges() - changes_before
+
+    @staticmethod
+    def _run_sync(func, *args):
+        try:
+            return succeed(func(*args))
+        except Exception:
+            return fail()
@@ -72,6 +72,7 @@ max_download_rate = integer(default=0)
 max_upload_rate = integer(default=0)
 utp = boolean(default=True)
 dht = boolean(default=True)
+max_metainfo_requests = integer(min=1, default=20)
 
 anon_listen_port = integer(min=-1, max=65536, default=-1)
 anon_proxy_type = integer(min=0, max=5, default=0)
@@ -413,6 +413,22 @@ class TriblerConfig(object):
     def get_libtorrent_dht_enabled(self):
         return self.config['libtorrent']['dht']
 
+    def set_libtorrent_max_metainfo_requests(self, value):
+        """
+        Sets the maximum number of torrents of which the metainfo is fetched through the DHT at the same time.
+
+        :param value: the new maximum number of metainfo requests
+        """
+        self.config['libtorrent']['max_metainfo_requests'] = value
+
+    def get_libtorrent_max_metainfo_requests(self):
+        """
+        Gets the maximum number of torrents of which the metainfo is fetched through the DHT at the same time.
+
+        :return: the maximum number of metainfo requests
+        """
+        return self.config['libtorrent'].as_int('max_metainfo_requests')
+
     # Mainline DHT
 
     def set_mainline_dht_enabled(self, value):
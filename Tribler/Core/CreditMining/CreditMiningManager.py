@@ -2,7 +2,6 @@ import os
 import psutil
 import logging
 
-from glob import glob
 from binascii import unhexlify, hexlify
 from twisted.internet.task import LoopingCall
 from twisted.internet.defer import Deferred, DeferredList, succeed
@@ -69,7 +68,7 @@ class CreditMiningManager(TaskManager):
 
         self.register_task('check_disk_space', LoopingCall(self.check_disk_space)).start(30, now=False)
         self.select_lc = self.register_task('select_torrents', LoopingCall(self.select_torrents))
-        self.num_checkpoints = len(glob(os.path.join(self.session.get_downloads_pstate_dir(), '*.state')))
+        self.num_checkpoints = len(self.session.lm.checkpoint_store)
 
         def add_sources(_):
             for source in self.session.config.get_credit_mining_sources():
@@ -202,8 +201,7 @@ class CreditMiningManager(TaskManager):
             return
 
         # If a download already exists or already has a checkpoint, skip this torrent
-        if self.session.get_download(unhexlify(infohash)) or \
-           os.path.exists(os.path.join(self.session.get_downloads_pstate_dir(), infohash + '.state')):
+        if self.session.get_download(unhexlify(infohash)) or unhexlify(infohash) in self.session.lm.checkpoint_store:
             self._logger.debug('Skipping torrent %s (download already running or scheduled to run)', infohash)
             return
 
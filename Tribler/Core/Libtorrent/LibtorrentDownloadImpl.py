@@ -31,6 +31,13 @@ from Tribler.Core.simpledefs import DLSTATUS_SEEDING, DLSTATUS_STOPPED, DLMODE_V
                                     PERSISTENTSTATE_CURRENTVERSION, dlstatus_strings
 from Tribler.pyipv8.ipv8.taskmanager import TaskManager
 
+# alert type -> name of the method of LibtorrentDownloadImpl that handles it
+ALERT_HANDLERS = {alert_type: 'on_' + alert_type for alert_type in
+                  ('tracker_reply_alert', 'tracker_error_alert', 'tracker_warning_alert', 'metadata_received_alert',
+                   'file_renamed_alert', 'performance_alert', 'torrent_checked_alert', 'torrent_finished_alert',
+                   'save_resume_data_alert', 'save_resume_data_failed_alert', 'state_update_alert')}
+LOGGED_ALERT_CATEGORIES = (lt.alert.category_t.error_notification, lt.alert.category_t.performance_warning)
+
 
 if sys.platform == "win32":
     try:
@@ -129,6 +136,8 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         self.lt_status = None
         self.error = None
         self.done = False
+        # Called with this download when its state changes, e.g. by the DownloadStates of the session
+        self.state_changed_callback = None
         self.pause_after_next_hashcheck = False
         self.checkpoint_after_next_hashcheck = False
         self.tracker_status = {}  # {url: [num_peers, status_str]}
@@ -146,6 +155,8 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
         self.correctedinfoname = u""
         self._checkpoint_disabled = False
+        # Whether the download config has changed since the last checkpoint
+        self._config_modified = False
 
         self.deferreds_resume = []
         self.deferreds_handle = []
@@ -244,6 +255,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
         except Exception as e:
             self.error = e
+            self.notify_state_changed()
 
     def can_create_engine_wrapper(self):
         """
@@ -495,20 +507,17 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
     @checkHandleAndSynchronize()
     def process_alert(self, alert, alert_type):
-        if alert.category() in [lt.alert.category_t.error_notification, lt.alert.category_t.performance_warning]:
+        if self._logger.isEnabledFor(logging.DEBUG) and alert.category() in LOGGED_ALERT_CATEGORIES:
             self._logger.debug("LibtorrentDownloadImpl: alert %s with message %s", alert_type, alert)
 
-        alert_types = ('tracker_reply_alert', 'tracker_error_alert', 'tracker_warning_alert', 'metadata_received_alert',
-                       'file_renamed_alert', 'performance_alert', 'torrent_checked_alert', 'torrent_finished_alert',
-                       'save_resume_data_alert', 'save_resume_data_failed_alert', 'state_update_alert')
-
-        if alert_type in alert_types:
-            getattr(self, 'on_' + alert_type)(alert)
+        handler_name = ALERT_HANDLERS.get(alert_type)
+        if handler_name:
+            getattr(self, handler_name)(alert)
 
     def on_save_resume_data_alert(self, alert):
         """
         Callback for the alert that contains the resume data of a specific download.
-        This resume data will be written to a file on disk.
+        This resume data will be written to the checkpoint store.
         """
         if self._checkpoint_disabled:
             return
@@ -519,13 +528,10 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         self.pstate_for_restart.set('state', 'engineresumedata', resume_data)
         self._logger.debug("%s get resume data %s", hexlify(resume_data['info-hash']), resume_data)
 
-        # save it to file
-        basename = hexlify(resume_data['info-hash']) + '.state'
-        filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
-
-        self._logger.debug("tlm: network checkpointing: to file %s", filename)
+        self._logger.debug("tlm: network checkpointing %s", hexlify(resume_data['info-hash']))
 
-        self.pstate_for_restart.write_file(filename)
+        self.session.lm.checkpoint_store.put(resume_data['info-hash'], self.pstate_for_restart)
+        self._config_modified = False
 
         # fire callback for all deferreds_resume
         for deferred_r in self.deferreds_resume:
@@ -666,8 +672,13 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
     def update_lt_status(self, lt_status):
         """ Update libtorrent stats and check if the download should be stopped."""
         self.lt_status = lt_status
+        self.notify_state_changed()
         self._stop_if_finished()
 
+    def notify_state_changed(self):
+        if self.state_changed_callback:
+            self.state_changed_callback(self)
+
     def _stop_if_finished(self):
         state = self.get_state()
         if state.get_status() == DLSTATUS_SEEDING:
@@ -1012,9 +1023,11 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                     dest_files.append((filename, os.path.join(self.get_dest_dir(), filename.decode('utf-8'))))
         return dest_files
 
-    def checkpoint(self):
+    def checkpoint(self, only_if_modified=False):
         """
         Checkpoint this download. Returns a deferred that fires when the checkpointing is completed.
+        If only_if_modified is set, the download is only checkpointed if its resume data or config has changed since
+        the last checkpoint.
         """
         if self._checkpoint_disabled:
             self._logger.warning("Ignoring checkpoint() call as checkpointing is disabled for this download")
@@ -1023,9 +1036,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         if not self.handle or not self.handle.is_valid():
             # Libtorrent hasn't received or initialized this download yet
             # 1. Check if we have data for this infohash already (don't overwrite it if we do!)
-            basename = hexlify(self.tdef.get_infohash()) + '.state'
-            filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
-            if not os.path.isfile(filename):
+            if self.tdef.get_infohash() not in self.session.lm.checkpoint_store:
                 resume_data = self.pstate_for_restart.get('state', 'engineresumedata') \
                               if self.pstate_for_restart else None
 
@@ -1040,6 +1051,9 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 self.on_save_resume_data_alert(alert)
             return succeed(None)
 
+        if only_if_modified and not self._config_modified and not self.handle.need_save_resume_data():
+            return succeed(None)
+
         return self.save_resume_data()
 
     def get_persistent_download_config(self):
@@ -1079,6 +1093,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         if hasattr(self.handle, 'add_tracker'):
             for tracker in trackers:
                 self.handle.add_tracker({'url': tracker, 'verified': False})
+            self.notify_state_changed()
 
     @checkHandleAndSynchronize()
     def get_magnet_link(self):
@@ -1103,6 +1118,9 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
             self.get_handle().addCallback(lambda handle: handle.set_download_limit(int(new_value * 1024)))
         elif section == 'download_defaults' and name in ['correctedfilename', 'super_seeder']:
             return False
+        self._config_modified = True
+        # The configuration is part of what is reported about a download (e.g. its destination and hops)
+        self.notify_state_changed()
         return True
 
     @checkHandleAndSynchronize()
@@ -11,8 +11,10 @@ import tempfile
 import threading
 import time
 from binascii import hexlify
-from copy import deepcopy
+from collections import defaultdict, deque
 from distutils.version import LooseVersion
+from heapq import heappop, heappush
+from itertools import count
 from shutil import rmtree
 from urllib import url2pathname
 
@@ -23,6 +25,7 @@ from twisted.internet.task import LoopingCall
 from twisted.python.failure import Failure
 
 from Tribler.Core.DownloadConfig import DefaultDownloadStartupConfig
+from Tribler.Core.Libtorrent.metainfo_cache import MetainfoCache
 from Tribler.Core.TorrentDef import TorrentDef, TorrentDefNoMetainfo
 from Tribler.Core.Utilities.torrent_utils import get_info_from_handle
 from Tribler.Core.Utilities.utilities import parse_magnetlink, fix_torrent
@@ -35,6 +38,17 @@ from Tribler.pyipv8.ipv8.util import blocking_call_on_reactor_thread
 
 LTSTATE_FILENAME = "lt.state"
 METAINFO_CACHE_PERIOD = 5 * 60
+METAINFO_CACHE_SIZE = 16 * 1024 * 1024
+# The keys of metainfo fetched through the DHT that are saved in the torrent store, the others describe the swarm
+METAINFO_TORRENT_KEYS = ('info', 'announce', 'announce-list', 'nodes')
+# The number of metainfo requests over which the average time to receive metainfo is computed
+METAINFO_FETCH_TIMES_WINDOW = 100
+# The number of seconds per reactor iteration that may be spent on processing libtorrent alerts
+ALERT_PROCESSING_BUDGET = 0.05
+# Priorities of metainfo requests, requests with a lower value are fetched first
+METAINFO_PRIORITY_USER = 0
+METAINFO_PRIORITY_COLLECT = 1
+METAINFO_PRIORITY_PREFETCH = 2
 DHT_CHECK_RETRIES = 1
 DEFAULT_DHT_ROUTERS = [
     ("dht.libtorrent.org", 25401),
@@ -71,9 +85,17 @@ class LibtorrentMgr(TaskManager):
         self.dht_ready = False
 
         self.metadata_tmpdir = None
+        # infohash -> request, the handle of queued requests is None
         self.metainfo_requests = {}
         self.metainfo_lock = threading.RLock()
-        self.metainfo_cache = {}
+        self.metainfo_queue = []
+        self.max_metainfo_requests = tribler_session.config.get_libtorrent_max_metainfo_requests()
+        self._metainfo_queue_counter = count()
+        self._running_metainfo_requests = set()
+        self._metainfo_fetch_times = deque(maxlen=METAINFO_FETCH_TIMES_WINDOW)
+        self.metainfo_statistics = {'requests': 0, 'coalesced': 0, 'cache_hits': 0, 'received': 0, 'timeouts': 0,
+                                    'cancelled': 0}
+        self.metainfo_cache = MetainfoCache(max_size=METAINFO_CACHE_SIZE, max_age=METAINFO_CACHE_PERIOD)
 
         self.process_alerts_lc = self.register_task("process_alerts", LoopingCall(self._task_process_alerts))
         self.check_reachability_lc = self.register_task("check_reachability", LoopingCall(self._check_reachability))
@@ -85,6 +107,17 @@ class LibtorrentMgr(TaskManager):
                                   lt.alert.category_t.tracker_notification | lt.alert.category_t.debug_notification
         self.alert_callback = None
 
+        # alert type -> handler of the alert, alerts of other types are only passed to the download they belong to
+        self.alert_handlers = {'state_update_alert': self.on_state_update_alert,
+                               'add_torrent_alert': self.on_add_torrent_alert,
+                               'torrent_removed_alert': self.on_torrent_removed_alert,
+                               'peer_disconnected_alert': self.on_peer_disconnected_alert}
+        self._alert_types = {}
+        self.pending_alerts = deque()
+        self.alert_processing_budget = ALERT_PROCESSING_BUDGET
+        # alert type -> [number of processed alerts, total processing time]
+        self.alert_statistics = defaultdict(lambda: [0, 0.0])
+
     @blocking_call_on_reactor_thread
     def initialize(self):
         # start upnp
@@ -100,9 +133,6 @@ class LibtorrentMgr(TaskManager):
         self.request_torrent_updates_lc.start(1, now=False)
         self._schedule_next_check(5, DHT_CHECK_RETRIES)
 
-        self.register_task(u'task_cleanup_metacache',
-                           LoopingCall(self._task_cleanup_metainfo_cache)).start(60, now=True)
-
     @blocking_call_on_reactor_thread
     def shutdown(self):
         self.shutdown_task_manager()
@@ -370,18 +400,19 @@ class LibtorrentMgr(TaskManager):
         else:
             self._logger.warning("port mapping method not exposed in libtorrent")
 
-    def process_alert(self, alert):
-        alert_type = str(type(alert)).split("'")[1].split(".")[-1]
+    def get_alert_type(self, alert):
+        """
+        Returns the type name of a libtorrent alert, e.g. 'add_torrent_alert'. The name is derived once per class.
+        """
+        alert_class = type(alert)
+        alert_type = self._alert_types.get(alert_class)
+        if alert_type is None:
+            alert_type = self._alert_types[alert_class] = str(alert_class).split("'")[1].split(".")[-1]
+        return alert_type
 
-        # Periodically, libtorrent will send us a state_update_alert, which contains the torrent status of
-        # all torrents changed since the last time we received this alert.
-        if alert_type == 'state_update_alert':
-            for status in alert.status:
-                infohash = str(status.info_hash)
-                if infohash not in self.torrents:
-                    self._logger.debug("Got state_update %s for unknown torrent %s", alert_type, infohash)
-                    continue
-                self.torrents[infohash][0].update_lt_status(status)
+    def process_alert(self, alert):
+        start_time = time.time()
+        alert_type = self.get_alert_type(alert)
 
         handle = getattr(alert, 'handle', None)
         if handle and handle.is_valid():
@@ -391,44 +422,78 @@ class LibtorrentMgr(TaskManager):
             else:
                 self._logger.debug("Got %s for unknown torrent %s", alert_type, infohash)
 
-        if alert_type == 'add_torrent_alert':
-            infohash = str(handle.info_hash())
-            if infohash in self.torrents:
-                if alert.error.value():
-                    self.torrents[infohash][0].deferred_added.errback(alert.error.message())
-                    self._logger.debug("Failed to add torrent (%s)", alert.error.message())
-                else:
-                    self.torrents[infohash][0].deferred_added.callback(handle)
-                    self._logger.debug("Added torrent %s", str(handle.info_hash()))
-            else:
-                self._logger.debug("Added alert for unknown torrent")
+        handler = self.alert_handlers.get(alert_type)
+        if handler:
+            handler(alert)
 
-        elif alert_type == 'torrent_removed_alert':
-            infohash = str(alert.info_hash)
-            if infohash in self.torrents:
-                deferred = self.torrents[infohash][0].deferred_removed
-                del self.torrents[infohash]
-                deferred.callback(None)
-                self._logger.debug("Removed torrent %s", infohash)
+        if self.alert_callback:
+            self.alert_callback(alert)
+
+        statistics = self.alert_statistics[alert_type]
+        statistics[0] += 1
+        statistics[1] += time.time() - start_time
+
+    def on_state_update_alert(self, alert):
+        # Periodically, libtorrent will send us a state_update_alert, which contains the torrent status of
+        # all torrents changed since the last time we received this alert.
+        for status in alert.status:
+            infohash = str(status.info_hash)
+            if infohash not in self.torrents:
+                self._logger.debug("Got state_update for unknown torrent %s", infohash)
+                continue
+            self.torrents[infohash][0].update_lt_status(status)
+
+    def on_add_torrent_alert(self, alert):
+        infohash = str(alert.handle.info_hash())
+        if infohash in self.torrents:
+            if alert.error.value():
+                self.torrents[infohash][0].deferred_added.errback(alert.error.message())
+                self._logger.debug("Failed to add torrent (%s)", alert.error.message())
             else:
-                self._logger.debug("Removed alert for unknown torrent")
+                self.torrents[infohash][0].deferred_added.callback(alert.handle)
+                self._logger.debug("Added torrent %s", infohash)
+        else:
+            self._logger.debug("Added alert for unknown torrent")
 
-        elif alert_type == 'peer_disconnected_alert' and \
-                self.tribler_session and self.tribler_session.lm.payout_manager:
+    def on_torrent_removed_alert(self, alert):
+        infohash = str(alert.info_hash)
+        if infohash in self.torrents:
+            deferred = self.torrents[infohash][0].deferred_removed
+            del self.torrents[infohash]
+            deferred.callback(None)
+            self._logger.debug("Removed torrent %s", infohash)
+        else:
+            self._logger.debug("Removed alert for unknown torrent")
+
+    def on_peer_disconnected_alert(self, alert):
+        if self.tribler_session and self.tribler_session.lm.payout_manager:
             self.tribler_session.lm.payout_manager.do_payout(alert.pid.to_string())
 
-        if self.alert_callback:
-            self.alert_callback(alert)
+    def get_alert_statistics(self):
+        """
+        Returns the number of processed alerts and the time spent on them per alert type, and the number of alerts
+        that are waiting to be processed.
+        """
+        alerts = {alert_type: {"count": num_alerts, "total_time": total_time, "average_time": total_time / num_alerts}
+                  for alert_type, (num_alerts, total_time) in self.alert_statistics.iteritems()}
+        return {"alerts": alerts, "pending_alerts": len(self.pending_alerts)}
 
-    def get_metainfo(self, infohash_or_magnet, callback, timeout=30, timeout_callback=None, notify=True):
+    def get_metainfo(self, infohash_or_magnet, callback, timeout=30, timeout_callback=None, notify=True,
+                     priority=METAINFO_PRIORITY_USER):
+        """
+        Fetches the metainfo of a torrent through the DHT. Requests are queued by priority, and at most
+        max_metainfo_requests of them are fetched at the same time. Requests for the same torrent share a single fetch.
+        The timeout starts when the request is made, so that it also covers the time spent in the queue.
+        """
         if not self.is_dht_ready() and timeout > 5:
             self._logger.info("DHT not ready, rescheduling get_metainfo")
 
             def schedule_call():
                 self.register_anonymous_task("schedule_metainfo_lookup",
                                              reactor.callLater(5, lambda i=infohash_or_magnet, c=callback, t=timeout-5,
-                                                                         tcb=timeout_callback,
-                                                                         n=notify: self.get_metainfo(i, c, t, tcb, n)))
+                                                                         tcb=timeout_callback, n=notify,
+                                                                         p=priority: self.get_metainfo(i, c, t, tcb, n,
+                                                                                                       p)))
 
             reactor.callFromThread(schedule_call)
             return
@@ -443,55 +508,130 @@ class LibtorrentMgr(TaskManager):
         with self.metainfo_lock:
             self._logger.debug('get_metainfo %s %s %s', infohash_or_magnet, callback, timeout)
 
-            cache_result = self._get_cached_metainfo(infohash)
+            cache_result = self.metainfo_cache.get(infohash)
             if cache_result:
-                callback(deepcopy(cache_result))
+                self.metainfo_statistics['cache_hits'] += 1
+                callback(cache_result)
 
             elif infohash not in self.metainfo_requests:
-                # Flags = 4 (upload mode), should prevent libtorrent from creating files
-                atp = {'save_path': self.metadata_tmpdir,
-                       'flags': (lt.add_torrent_params_flags_t.flag_upload_mode)}
-                if magnet:
-                    atp['url'] = magnet
-                else:
-                    atp['info_hash'] = lt.big_number(infohash_bin)
-                try:
-                    handle = self.ltsession_metainfo.add_torrent(encode_atp(atp))
-                except TypeError as e:
-                    self._logger.warning("Failed to add torrent with infohash %s, "
-                                         "attempting to use it as it is and hoping for the best",
-                                         hexlify(infohash_bin))
-                    self._logger.warning("Error was: %s", e)
-                    atp['info_hash'] = infohash_bin
-                    handle = self.ltsession_metainfo.add_torrent(encode_atp(atp))
-
-                if notify:
-                    self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_STARTED, infohash_bin)
-
-                self.metainfo_requests[infohash] = {'handle': handle,
+                self.metainfo_statistics['requests'] += 1
+                self.metainfo_requests[infohash] = {'handle': None,
+                                                    'magnet': magnet,
                                                     'callbacks': [callback],
                                                     'timeout_callbacks': [timeout_callback] if timeout_callback else [],
-                                                    'notify': notify}
-
-                # if the handle is valid and already has metadata which is the case when torrent already exists in
-                # session then metadata_received_alert is not fired so we call self.got_metainfo() directly here
-                if handle.is_valid() and handle.has_metadata():
-                    self.got_metainfo(infohash, timeout=False)
-                    return
-
-                def schedule_call():
-                    self.register_anonymous_task("schedule_got_metainfo_lookup",
-                                       reactor.callLater(timeout, lambda: self.got_metainfo(infohash, timeout=True)))
-
-                reactor.callFromThread(schedule_call)
+                                                    'notify': notify,
+                                                    'priority': priority,
+                                                    'time': time.time()}
+                self._queue_metainfo_request(infohash, priority)
+                self._start_metainfo_requests()
+
+                # The request might have been answered immediately, in which case there is nothing to time out
+                if infohash in self.metainfo_requests:
+                    def schedule_call():
+                        self.register_anonymous_task("schedule_got_metainfo_lookup",
+                                                     reactor.callLater(timeout, lambda: self.got_metainfo(infohash,
+                                                                                                          timeout=True)))
+
+                    reactor.callFromThread(schedule_call)
             else:
-                self.metainfo_requests[infohash]['notify'] = self.metainfo_requests[infohash]['notify'] and notify
-                callbacks = self.metainfo_requests[infohash]['callbacks']
+                self.metainfo_statistics['coalesced'] += 1
+                request = self.metainfo_requests[infohash]
+                request['notify'] = request['notify'] and notify
+                if priority < request.get('priority', priority) and request['handle'] is None:
+                    request['priority'] = priority
+                    self._queue_metainfo_request(infohash, priority)
+                    self._start_metainfo_requests()
+
+                if timeout_callback and timeout_callback not in request['timeout_callbacks']:
+                    request['timeout_callbacks'].append(timeout_callback)
+                callbacks = request['callbacks']
                 if callback not in callbacks:
                     callbacks.append(callback)
                 else:
                     self._logger.debug('get_metainfo duplicate detected, ignoring')
 
+    def cancel_metainfo_request(self, infohash_or_magnet, callback=None):
+        """
+        Cancels a request for the metainfo of a torrent. If a callback is given, only that callback is removed and the
+        fetch goes on as long as other callbacks are waiting for it.
+        :return: True if a request has been found, False otherwise.
+        """
+        magnet = infohash_or_magnet if infohash_or_magnet.startswith('magnet') else None
+        infohash_bin = infohash_or_magnet if not magnet else parse_magnetlink(magnet)[1]
+        infohash = binascii.hexlify(infohash_bin)
+
+        with self.metainfo_lock:
+            request = self.metainfo_requests.get(infohash)
+            if request is None:
+                return False
+
+            if callback is not None:
+                if callback in request['callbacks']:
+                    request['callbacks'].remove(callback)
+                if request['callbacks']:
+                    return True
+
+            self._logger.debug('cancel_metainfo_request %s', infohash)
+            del self.metainfo_requests[infohash]
+            self._running_metainfo_requests.discard(infohash)
+            self.metainfo_statistics['cancelled'] += 1
+
+            handle = request['handle']
+            if handle:
+                self.ltsession_metainfo.remove_torrent(handle, 1)
+                if request['notify']:
+                    self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_CLOSE, infohash_bin)
+
+            self._start_metainfo_requests()
+            return True
+
+    def _queue_metainfo_request(self, infohash, priority):
+        # Entries of requests that have been cancelled, started or requeued are skipped when they are popped
+        heappush(self.metainfo_queue, (priority, next(self._metainfo_queue_counter), infohash))
+
+    def _start_metainfo_requests(self):
+        """
+        Starts fetching the queued metainfo requests with the highest priority, as long as there are free slots.
+        """
+        with self.metainfo_lock:
+            while self.metainfo_queue and len(self._running_metainfo_requests) < self.max_metainfo_requests:
+                priority, _, infohash = heappop(self.metainfo_queue)
+                request = self.metainfo_requests.get(infohash)
+                if request is None or request['handle'] is not None or request['priority'] != priority:
+                    continue
+                self._start_metainfo_request(infohash, request)
+
+    def _start_metainfo_request(self, infohash, request):
+        infohash_bin = binascii.unhexlify(infohash)
+
+        # Flags = 4 (upload mode), should prevent libtorrent from creating files
+        atp = {'save_path': self.metadata_tmpdir,
+               'flags': (lt.add_torrent_params_flags_t.flag_upload_mode)}
+        if request['magnet']:
+            atp['url'] = request['magnet']
+        else:
+            atp['info_hash'] = lt.big_number(infohash_bin)
+        try:
+            handle = self.ltsession_metainfo.add_torrent(encode_atp(atp))
+        except TypeError as e:
+            self._logger.warning("Failed to add torrent with infohash %s, "
+                                 "attempting to use it as it is and hoping for the best",
+                                 hexlify(infohash_bin))
+            self._logger.warning("Error was: %s", e)
+            atp['info_hash'] = infohash_bin
+            handle = self.ltsession_metainfo.add_torrent(encode_atp(atp))
+
+        request['handle'] = handle
+        self._running_metainfo_requests.add(infohash)
+
+        if request['notify']:
+            self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_STARTED, infohash_bin)
+
+        # if the handle is valid and already has metadata which is the case when torrent already exists in
+        # session then metadata_received_alert is not fired so we call self.got_metainfo() directly here
+        if handle.is_valid() and handle.has_metadata():
+            self.got_metainfo(infohash, timeout=False)
+
     def got_metainfo(self, infohash, timeout=False):
         with self.metainfo_lock:
             infohash_bin = binascii.unhexlify(infohash)
@@ -502,70 +642,93 @@ class LibtorrentMgr(TaskManager):
                 callbacks = request_dict['callbacks']
                 timeout_callbacks = request_dict['timeout_callbacks']
                 notify = request_dict['notify']
+                self._running_metainfo_requests.discard(infohash)
 
                 self._logger.debug('got_metainfo %s %s %s', infohash, handle, timeout)
 
-                assert handle
-                if handle:
-                    if callbacks and not timeout:
-                        metainfo = {"info": lt.bdecode(get_info_from_handle(handle).metadata())}
-                        trackers = [tracker.url for tracker in get_info_from_handle(handle).trackers()]
-                        peers = []
-                        leechers = 0
-                        seeders = 0
-                        for peer in handle.get_peer_info():
-                            peers.append(peer.ip)
-                            if peer.progress == 1:
-                                seeders += 1
-                            else:
-                                leechers += 1
-
-                        if trackers:
-                            if len(trackers) > 1:
-                                metainfo["announce-list"] = [trackers]
-                            metainfo["announce"] = trackers[0]
+                if handle and callbacks and not timeout:
+                    metainfo = {"info": lt.bdecode(get_info_from_handle(handle).metadata())}
+                    trackers = [tracker.url for tracker in get_info_from_handle(handle).trackers()]
+                    peers = []
+                    leechers = 0
+                    seeders = 0
+                    for peer in handle.get_peer_info():
+                        peers.append(peer.ip)
+                        if peer.progress == 1:
+                            seeders += 1
                         else:
-                            metainfo["nodes"] = []
-                        if peers and notify:
-                            self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_GOT_PEERS, infohash_bin, len(peers))
-                        metainfo["initial peers"] = peers
-                        metainfo["leechers"] = leechers
-                        metainfo["seeders"] = seeders
-
-                        self._add_cached_metainfo(infohash, metainfo)
-
-                        for callback in callbacks:
-                            callback(deepcopy(metainfo))
-
-                        # let's not print the hashes of the pieces
-                        debuginfo = deepcopy(metainfo)
-                        del debuginfo['info']['pieces']
-                        self._logger.debug('got_metainfo result %s', debuginfo)
-
-                    elif timeout_callbacks and timeout:
-                        for callback in timeout_callbacks:
-                            callback(infohash_bin)
+                            leechers += 1
+
+                    if trackers:
+                        if len(trackers) > 1:
+                            metainfo["announce-list"] = [trackers]
+                        metainfo["announce"] = trackers[0]
+                    else:
+                        metainfo["nodes"] = []
+                    if peers and notify:
+                        self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_GOT_PEERS, infohash_bin, len(peers))
+                    metainfo["initial peers"] = peers
+                    metainfo["leechers"] = leechers
+                    metainfo["seeders"] = seeders
+
+                    self.metainfo_cache.put(infohash, metainfo)
+                    self._save_metainfo(infohash, metainfo)
+
+                    self.metainfo_statistics['received'] += 1
+                    if 'time' in request_dict:
+                        self._metainfo_fetch_times.append(time.time() - request_dict['time'])
+
+                    # Every callback gets its own top-level dictionary, the info dictionary is shared
+                    for callback in callbacks:
+                        callback(dict(metainfo))
+
+                    # let's not print the hashes of the pieces
+                    debuginfo = dict(metainfo, info=dict(metainfo['info']))
+                    debuginfo['info'].pop('pieces', None)
+                    self._logger.debug('got_metainfo result %s', debuginfo)
+
+                elif timeout:
+                    self.metainfo_statistics['timeouts'] += 1
+                    for callback in timeout_callbacks:
+                        callback(infohash_bin)
 
                 if handle:
                     self.ltsession_metainfo.remove_torrent(handle, 1)
                     if notify:
                         self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_CLOSE, infohash_bin)
 
-    def _get_cached_metainfo(self, infohash):
-        if infohash in self.metainfo_cache:
-            return self.metainfo_cache[infohash]['meta_info']
+                self._start_metainfo_requests()
 
-    def _add_cached_metainfo(self, infohash, metainfo):
-        self.metainfo_cache[infohash] = {'time': time.time(),
-                                         'meta_info': metainfo}
-
-    def _task_cleanup_metainfo_cache(self):
-        oldest_time = time.time() - METAINFO_CACHE_PERIOD
+    def get_metainfo_statistics(self):
+        """
+        Returns the number of queued and running metainfo requests, the counters of what happened to the requests
+        and the average time between requesting and receiving metainfo over the last received metainfo.
+        """
+        with self.metainfo_lock:
+            fetch_times = self._metainfo_fetch_times
+            statistics = dict(self.metainfo_statistics)
+            statistics.update({'queued': len(self.metainfo_requests) - len(self._running_metainfo_requests),
+                               'running': len(self._running_metainfo_requests),
+                               'max_running': self.max_metainfo_requests,
+                               'average_time_to_metainfo': sum(fetch_times) / len(fetch_times)
+                                                           if fetch_times else None})
+            return statistics
+
+    def _save_metainfo(self, infohash, metainfo):
+        """
+        Saves metainfo fetched through the DHT in the torrent store, so that it survives restarts and later requests
+        for the same torrent do not have to go to the DHT again.
+        """
+        torrent_store = self.tribler_session.lm.torrent_store
+        if torrent_store is None or infohash in torrent_store:
+            return
 
-        for info_hash, values in self.metainfo_cache.items():
-            last_time, _ = values
-            if last_time < oldest_time:
-                del self.metainfo_cache[info_hash]
+        torrent = {key: value for key, value in metainfo.iteritems() if key in METAINFO_TORRENT_KEYS}
+        try:
+            torrent_store[infohash] = lt.bencode(torrent)
+        except TypeError:
+            # Note: in libtorrent 1.1.1, bencode throws a TypeError which is a known bug
+            pass
 
     def _request_torrent_updates(self):
         for ltsession in self.ltsessions.itervalues():
@@ -577,10 +740,13 @@ class LibtorrentMgr(TaskManager):
                     ltsession.post_torrent_updates()
 
     def _task_process_alerts(self):
-        for ltsession in self.ltsessions.itervalues():
-            if ltsession:
-                for alert in ltsession.pop_alerts():
-                    self.process_alert(alert)
+        # Libtorrent frees the alerts of a session on the next pop_alerts call, so the sessions are not popped again
+        # until all alerts of the previous call have been processed.
+        if not self.pending_alerts:
+            for ltsession in self.ltsessions.itervalues():
+                if ltsession:
+                    self.pending_alerts.extend(ltsession.pop_alerts())
+        self._process_pending_alerts()
 
         # We have a separate session for metainfo requests.
         # For this session we are only interested in the metadata_received_alert.
@@ -589,6 +755,19 @@ class LibtorrentMgr(TaskManager):
                 if isinstance(alert, lt.metadata_received_alert):
                     self.got_metainfo(str(alert.handle.info_hash()))
 
+    def _process_pending_alerts(self):
+        """
+        Processes the alerts we received from libtorrent, until alert_processing_budget seconds have been spent. The
+        remaining alerts are processed in the next iteration of the reactor, so other events are not delayed for long.
+        """
+        deadline = time.time() + self.alert_processing_budget
+        while self.pending_alerts:
+            self.process_alert(self.pending_alerts.popleft())
+            if self.pending_alerts and time.time() > deadline:
+                if not self.is_pending_task_active("process_pending_alerts"):
+                    self.register_task("process_pending_alerts", reactor.callLater(0, self._process_pending_alerts))
+                return
+
     def _check_reachability(self):
         if self.get_session() and self.get_session().status().has_incoming_connections:
             self.notifier.notify(NTFY_REACHABLE, NTFY_INSERT, None, '')
@@ -0,0 +1,106 @@
+"""
+Cache of the metainfo fetched through the DHT.
+
+Fetching metainfo takes anywhere from seconds to minutes, while the same torrent is often requested several times in a
+row (e.g. by the GUI and by the torrent checker). The metainfo is decoded once and shared between all requesters.
+"""
+from collections import OrderedDict
+from time import time
+
+# The total (approximate) number of bytes used by the metainfo in the cache
+DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+
+# The number of seconds for which the swarm information (seeders, leechers, peers) in the metainfo is up to date
+DEFAULT_MAX_AGE = 5 * 60
+
+# The size we count for values that are not strings or containers
+SCALAR_SIZE = 8
+
+
+def get_metainfo_size(value):
+    """
+    Returns the approximate number of bytes used by (a part of) a decoded metainfo dictionary.
+    """
+    if isinstance(value, basestring):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key) + get_metainfo_size(item) for key, item in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return sum(get_metainfo_size(item) for item in value)
+    return SCALAR_SIZE
+
+
+class MetainfoCache(object):
+    """
+    LRU cache of metainfo dictionaries, keyed by hex-encoded infohash. The memory used is bounded by the total size of
+    the cached metainfo rather than by the number of entries, since the piece hashes of a large torrent are thousands
+    of times larger than those of a small one.
+
+    Metainfo returned by get is a copy of the top-level dictionary only: the info dictionary (with the piece hashes) is
+    shared between all callers and must not be modified.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.size = 0
+
+        # infohash -> (metainfo, size, time at which it was added)
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, infohash):
+        return infohash in self._entries
+
+    def get(self, infohash):
+        """
+        Returns the cached metainfo of a torrent, or None if it is not cached or its swarm information is outdated.
+        """
+        entry = self._entries.pop(infohash, None)
+        if entry is None or time() - entry[2] > self.max_age:
+            if entry is not None:
+                self.size -= entry[1]
+            self.misses += 1
+            return None
+
+        # Move the entry to the back of the LRU order
+        self._entries[infohash] = entry
+        self.hits += 1
+        return dict(entry[0])
+
+    def put(self, infohash, metainfo):
+        """
+        Adds the metainfo of a torrent to the cache, evicting the least recently used metainfo if needed. Metainfo
+        that is larger than the cache itself is not stored.
+        """
+        self.remove(infohash)
+
+        size = get_metainfo_size(metainfo)
+        if size > self.max_size:
+            return
+
+        self._entries[infohash] = (metainfo, size, time())
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def remove(self, infohash):
+        entry = self._entries.pop(infohash, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def get_statistics(self):
+        return {"entries": len(self._entries), "size": self.size, "max_size": self.max_size, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,179 @@
+"""
+Store for the checkpoints of the downloads.
+"""
+import codecs
+import logging
+import os
+from binascii import hexlify, unhexlify
+from glob import glob
+from StringIO import StringIO
+from threading import RLock
+
+import apsw
+from twisted.internet.task import LoopingCall
+
+from Tribler.Core.Utilities.configparser import CallbackConfigParser
+from Tribler.pyipv8.ipv8.taskmanager import TaskManager
+
+CHECKPOINT_DB_FILENAME = u"checkpoints.db"
+
+# The number of seconds between two writes of the checkpoints that have been changed
+FLUSH_INTERVAL = 10
+
+
+class CheckpointStore(TaskManager):
+    """
+    Keeps the checkpoints (persistent download configuration and libtorrent resume data) of all downloads in a single
+    SQLite table, keyed by infohash, instead of in one .state file per download.
+
+    Changed checkpoints are kept in memory and written every FLUSH_INTERVAL seconds, or when flush is called, in a
+    single transaction. Checkpointing thousands of downloads therefore takes a single write to disk rather than
+    thousands, and since the transaction either completes or not at all, a crash never leaves a partial checkpoint.
+    The first checkpoint of a download is written immediately, so a crash cannot lose a download that was just added.
+    """
+
+    def __init__(self, db_path):
+        super(CheckpointStore, self).__init__()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.db_path = db_path
+        self.lock = RLock()
+        # infohash -> serialized checkpoint, or None when the checkpoint has been removed
+        self._pending = {}
+
+        self._connection = apsw.Connection(self.db_path)
+        cursor = self._connection.cursor()
+        cursor.execute(u"PRAGMA synchronous = NORMAL;")
+        cursor.execute(u"PRAGMA journal_mode = WAL;")
+        cursor.execute(u"CREATE TABLE IF NOT EXISTS checkpoint (infohash TEXT PRIMARY KEY, pstate TEXT NOT NULL);")
+
+    def start(self):
+        self.register_task("flush", LoopingCall(self.flush)).start(FLUSH_INTERVAL, now=False)
+
+    def close(self):
+        self.shutdown_task_manager()
+        with self.lock:
+            if not self._connection:
+                return
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def serialize(pstate):
+        output = StringIO()
+        pstate.write(output)
+        return output.getvalue()
+
+    @staticmethod
+    def deserialize(data):
+        pstate = CallbackConfigParser()
+        pstate.readfp(StringIO(data))
+        return pstate
+
+    def __contains__(self, infohash):
+        return self.get_serialized(infohash) is not None
+
+    def __len__(self):
+        return len(self.get_all())
+
+    def put(self, infohash, pstate):
+        """
+        Store the checkpoint of a download. The checkpoint is written to disk on the next flush, unless it is the first
+        checkpoint of the download, which is written immediately.
+        """
+        with self.lock:
+            if not self._connection:
+                self._logger.warning("Not storing the checkpoint of %s, the store has been closed", hexlify(infohash))
+                return
+
+            is_new = self.get_serialized(infohash) is None
+            self._pending[hexlify(infohash)] = self.serialize(pstate)
+            if is_new:
+                self.flush()
+
+    def remove(self, infohash):
+        with self.lock:
+            if not self._connection:
+                self._logger.warning("Not removing the checkpoint of %s, the store has been closed", hexlify(infohash))
+                return
+
+            self._pending[hexlify(infohash)] = None
+
+    def get(self, infohash):
+        """
+        Returns the checkpoint of a download as a CallbackConfigParser, or None if there is none.
+        """
+        data = self.get_serialized(infohash)
+        return self.deserialize(data) if data is not None else None
+
+    def get_serialized(self, infohash):
+        key = hexlify(infohash)
+        with self.lock:
+            if key in self._pending or not self._connection:
+                return self._pending.get(key)
+
+            for pstate, in self._connection.cursor().execute(u"SELECT pstate FROM checkpoint WHERE infohash = ?",
+                                                             (key,)):
+                return pstate
+        return None
+
+    def get_all(self):
+        """
+        Returns a list with the (infohash, serialized checkpoint) of all downloads. Use deserialize to parse them.
+        """
+        with self.lock:
+            if not self._connection:
+                return []
+
+            checkpoints = {key: pstate for key, pstate in self._connection.cursor().execute(
+                u"SELECT infohash, pstate FROM checkpoint")}
+            checkpoints.update(self._pending)
+        return [(unhexlify(key), pstate) for key, pstate in checkpoints.iteritems() if pstate is not None]
+
+    def flush(self):
+        """
+        Write all changed checkpoints to disk, in a single transaction.
+        """
+        with self.lock:
+            if not self._pending or not self._connection:
+                return
+
+            pending, self._pending = self._pending, {}
+            with self._connection:
+                cursor = self._connection.cursor()
+                cursor.executemany(u"INSERT OR REPLACE INTO checkpoint (infohash, pstate) VALUES (?, ?)",
+                                   [(key, pstate) for key, pstate in pending.iteritems() if pstate is not None])
+                cursor.executemany(u"DELETE FROM checkpoint WHERE infohash = ?",
+                                   [(key,) for key, pstate in pending.iteritems() if pstate is None])
+            self._logger.debug("Wrote %d checkpoints", len(pending))
+
+    def migrate(self, pstate_dir):
+        """
+        Move the checkpoints in the .state files in pstate_dir, as written by previous versions, into the store.
+        The files are removed once their checkpoints have been written.
+        """
+        filenames = glob(os.path.join(pstate_dir, '*.state'))
+        if not filenames:
+            return
+
+        migrated = []
+        with self.lock:
+            for filename in filenames:
+                try:
+                    infohash = unhexlify(os.path.basename(filename)[:-6])
+                    with codecs.open(filename, 'rb', 'utf-8') as state_file:
+                        data = state_file.read()
+                except (TypeError, IOError, UnicodeDecodeError):
+                    self._logger.warning("Not migrating invalid checkpoint %s", filename)
+                    continue
+
+                # A checkpoint in the store is newer than one in a file
+                if self.get_serialized(infohash) is None:
+                    self._pending[hexlify(infohash)] = data
+                migrated.append(filename)
+            self.flush()
+
+        for filename in migrated:
+            os.remove(filename)
+        self._logger.info("Migrated %d checkpoints", len(migrated))
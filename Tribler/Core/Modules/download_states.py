@@ -0,0 +1,158 @@
+"""
+Incrementally updated snapshot of the states of all downloads.
+"""
+from collections import defaultdict, OrderedDict
+
+from Tribler.Core.simpledefs import UPLOAD, DOWNLOAD
+
+# The number of revisions for which removed downloads are remembered. With an update per second, this is an hour.
+REMOVED_REVISIONS_RETENTION = 3600
+
+
+class DownloadStates(object):
+    """
+    Keeps the last DownloadState of every download, keyed by infohash.
+
+    Downloads report a change of their state (for instance when libtorrent posts a new status in a state_update_alert)
+    through mark_changed. Only the states of those downloads are rebuilt by update, which returns them together with
+    the infohashes of the downloads that have been removed since. The number of downloads per status and the total
+    speeds are kept up to date along the way, so the aggregate view does not require a pass over all downloads.
+
+    Every update in which states changed or downloads were removed increments the revision of the snapshot. The
+    revision in which each download last changed or was removed is kept, so that pollers can fetch only the changes
+    since the revision they have seen last. Removed downloads are only remembered for REMOVED_REVISIONS_RETENTION
+    revisions, so pollers that are further behind have to fetch all downloads again.
+    """
+
+    def __init__(self):
+        # infohash -> last DownloadState
+        self.states = {}
+        # infohash -> (status, upload speed, download speed) of the last state, as counted in the aggregate view
+        self._summaries = {}
+        self.status_counts = defaultdict(int)
+        self.total_speed = {UPLOAD: 0, DOWNLOAD: 0}
+
+        self.changed = set()
+        self.removed = set()
+
+        self.revision = 0
+        # infohash -> revision in which the state of a download last changed
+        self.revisions = {}
+        # infohash -> revision in which a download was removed, in the order of removal
+        self.removed_revisions = OrderedDict()
+        # The last revision of which the removed downloads have been forgotten
+        self.pruned_revision = 0
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, infohash):
+        return infohash in self.states
+
+    def mark_changed(self, download):
+        """
+        Mark the state of a download as changed, so that it is rebuilt on the next update.
+        """
+        self.changed.add(download.get_def().get_infohash())
+
+    def remove(self, infohash):
+        """
+        Remove the state of a download, which is reported as removed on the next update.
+        """
+        self.changed.discard(infohash)
+        if self.states.pop(infohash, None) is not None:
+            self._remove_summary(infohash)
+            self.removed.add(infohash)
+
+    def update(self, downloads):
+        """
+        Rebuild the states of the downloads that have been marked as changed.
+        :param downloads: a dictionary with the current downloads, keyed by infohash.
+        :return: a tuple with the list of changed states and the list of infohashes of removed downloads.
+        """
+        changed, self.changed = self.changed, set()
+        removed, self.removed = self.removed, set()
+
+        changed_states = []
+        changed_infohashes = []
+        for infohash in changed:
+            download = downloads.get(infohash)
+            if download is None:
+                # A download that has been stopped and removed can still report a final state change
+                continue
+
+            state = download.get_state()
+            if infohash in self.states:
+                self._remove_summary(infohash)
+            self.states[infohash] = state
+            self._add_summary(infohash, state)
+            changed_states.append(state)
+            changed_infohashes.append(infohash)
+
+        # A download that has been removed and added again (e.g. to change its number of hops) is not removed
+        removed_infohashes = list(removed - set(self.states))
+
+        if changed_states or removed_infohashes:
+            self.revision += 1
+            for infohash in changed_infohashes:
+                self.revisions[infohash] = self.revision
+                self.removed_revisions.pop(infohash, None)
+            for infohash in removed_infohashes:
+                self.revisions.pop(infohash, None)
+                self.removed_revisions.pop(infohash, None)
+                self.removed_revisions[infohash] = self.revision
+            self._prune_removed_revisions()
+
+        return changed_states, removed_infohashes
+
+    def _prune_removed_revisions(self):
+        while self.removed_revisions:
+            infohash, removed_revision = next(self.removed_revisions.iteritems())
+            if removed_revision > self.revision - REMOVED_REVISIONS_RETENTION:
+                break
+            del self.removed_revisions[infohash]
+            self.pruned_revision = removed_revision
+
+    def get_state(self, infohash):
+        return self.states.get(infohash)
+
+    def get_states(self):
+        return self.states.values()
+
+    def get_changes_since(self, revision):
+        """
+        Returns the infohashes of the downloads that have changed after the given revision, and the infohashes of the
+        downloads that have been removed after the given revision.
+        """
+        return ([infohash for infohash, changed_revision in self.revisions.iteritems() if changed_revision > revision],
+                [infohash for infohash, removed_revision in self.removed_revisions.iteritems()
+                 if removed_revision > revision])
+
+    def is_resync_required(self, revision):
+        """
+        Returns whether downloads that have been removed after the given revision may have been forgotten, in which
+        case all downloads have to be fetched again.
+        """
+        return revision < self.pruned_revision
+
+    def get_summary(self):
+        """
+        Returns the number of downloads, the number of downloads per status and the total upload and download speed.
+        """
+        return {"downloads": len(self.states),
+                "status": {status: count for status, count in self.status_counts.iteritems() if count},
+                "speed_up": self.total_speed[UPLOAD],
+                "speed_down": self.total_speed[DOWNLOAD]}
+
+    def _add_summary(self, infohash, state):
+        summary = (state.get_status(), state.get_current_speed(UPLOAD), state.get_current_speed(DOWNLOAD))
+        self._summaries[infohash] = summary
+        self.status_counts[summary[0]] += 1
+        self.total_speed[UPLOAD] += summary[1]
+        self.total_speed[DOWNLOAD] += summary[2]
+
+    def _remove_summary(self, infohash):
+        status, speed_up, speed_down = self._summaries.pop(infohash)
+        self.status_counts[status] -= 1
+        self.total_speed[UPLOAD] -= speed_up
+        self.total_speed[DOWNLOAD] -= speed_down
@@ -33,7 +33,10 @@ class DebugEndpoint(resource.Resource):
         child_handler_dict = {"circuits": DebugCircuitsEndpoint, "open_files": DebugOpenFilesEndpoint,
                               "open_sockets": DebugOpenSocketsEndpoint, "threads": DebugThreadsEndpoint,
                               "cpu": DebugCPUEndpoint, "memory": DebugMemoryEndpoint,
-                              "log": DebugLogEndpoint, "profiler": DebugProfilerEndpoint}
+                              "log": DebugLogEndpoint, "profiler": DebugProfilerEndpoint,
+                              "torrent_checker": DebugTorrentCheckerEndpoint, "alerts": DebugAlertsEndpoint,
+                              "reactor": DebugReactorEndpoint, "metainfo": DebugMetainfoEndpoint,
+                              "search_cache": DebugSearchCacheEndpoint}
 
         for path, child_cls in child_handler_dict.iteritems():
             self.putChild(path, child_cls(session))
@@ -142,6 +145,193 @@ class DebugCircuitSlotsEndpoint(resource.Resource):
         })
 
 
+class DebugTorrentCheckerEndpoint(resource.Resource):
+    """
+    This class handles requests for statistics about the torrent checker.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/torrent_checker
+
+        A GET request to this endpoint returns the throughput of the automatic tracker checks of the torrent checker,
+        measured over the last ten minutes, and the totals since Tribler has been started.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/torrent_checker
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "torrent_checker": {
+                        "scrapes_in_flight": 12,
+                        "max_concurrent_scrapes": 50,
+                        "scrapes_per_second": 1.4,
+                        "torrents_refreshed_per_hour": 261000,
+                        "scrapes_started": 4532,
+                        "scrapes_succeeded": 3988,
+                        "scrapes_failed": 532,
+                        "torrents_refreshed": 294210
+                    }
+                }
+        """
+        torrent_checker = self.session.lm.torrent_checker
+        if not torrent_checker:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "torrent checker not found"})
+
+        return json.dumps({"torrent_checker": torrent_checker.get_statistics()})
+
+
+class DebugAlertsEndpoint(resource.Resource):
+    """
+    This class handles requests for statistics about the libtorrent alerts that have been processed.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/alerts
+
+        A GET request to this endpoint returns, per type of libtorrent alert, how many alerts have been processed and
+        how many seconds have been spent on processing them. It also returns the number of alerts that are waiting to
+        be processed.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/alerts
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "alerts": {
+                        "state_update_alert": {
+                            "count": 3600,
+                            "total_time": 12.4,
+                            "average_time": 0.0034
+                        }, ...
+                    },
+                    "pending_alerts": 0
+                }
+        """
+        ltmgr = self.session.lm.ltmgr
+        if not ltmgr:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "libtorrent not enabled"})
+
+        return json.dumps(ltmgr.get_alert_statistics())
+
+
+class DebugMetainfoEndpoint(resource.Resource):
+    """
+    This class handles requests for statistics about the metainfo requests that are sent to the DHT.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/metainfo
+
+        A GET request to this endpoint returns the number of queued and running metainfo requests, how many requests
+        were coalesced, answered from the cache, received, timed out or cancelled, and the average number of seconds
+        it took to receive metainfo.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/metainfo
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "metainfo": {
+                        "requests": 12,
+                        "coalesced": 3,
+                        "cache_hits": 5,
+                        "received": 9,
+                        "timeouts": 2,
+                        "cancelled": 1,
+                        "queued": 0,
+                        "running": 1,
+                        "max_running": 10,
+                        "average_time_to_metainfo": 4.2
+                    }
+                }
+        """
+        ltmgr = self.session.lm.ltmgr
+        if not ltmgr:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "libtorrent not enabled"})
+
+        return json.dumps({"metainfo": ltmgr.get_metainfo_statistics()})
+
+
+class DebugSearchCacheEndpoint(resource.Resource):
+    """
+    This class handles requests for statistics about the cache of local search results.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/search_cache
+
+        A GET request to this endpoint returns the number of cached searches and result rows, and how often the cache
+        has been hit, missed and invalidated.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/search_cache
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "search_cache": {
+                        "entries": 12,
+                        "results": 2400,
+                        "hits": 40,
+                        "misses": 12,
+                        "invalidations": 3
+                    }
+                }
+        """
+        search_cache = self.session.lm.search_cache
+        if not search_cache:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "search cache not enabled"})
+
+        return json.dumps({"search_cache": search_cache.get_statistics()})
+
+
 class DebugOpenFilesEndpoint(resource.Resource):
     """
     This class handles request for information about open files.
@@ -311,6 +501,63 @@ class DebugCPUHistoryEndpoint(resource.Resource):
         return json.dumps({"cpu_history": self.session.lm.resource_monitor.get_cpu_history_dict()})
 
 
+class DebugReactorEndpoint(resource.Resource):
+    """
+    This class handles requests for information about the lag of the reactor.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/reactor
+
+        A GET request to this endpoint returns how late the reactor runs scheduled calls, and the sites in the code
+        where the reactor thread was when it stalled. A stall site consists of the innermost frames of the reactor
+        thread, and the number of samples of a site is proportional to the time the reactor stalled there.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/reactor
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "reactor": {
+                        "interval": 0.1,
+                        "stall_threshold": 0.25,
+                        "lag": {
+                            "count": 36000,
+                            "average": 0.0021,
+                            "max": 1.2,
+                            "recent": [0.0012, 0.0009, ...],
+                            "histogram": [{"max_lag": 0.01, "count": 35812}, ..., {"max_lag": null, "count": 0}]
+                        },
+                        "stalls": 4,
+                        "stalled_time": 2.35,
+                        "stall_sites": [{
+                            "frames": ["/path/to/SqliteCacheDBHandler.py:1143 searchNames", ...],
+                            "samples": 31,
+                            "stalls": 3,
+                            "stalled_time": 1.55
+                        }, ...]
+                    }
+                }
+        """
+        reactor_lag_monitor = self.session.lm.reactor_lag_monitor
+        if not reactor_lag_monitor:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "reactor lag monitor not enabled"})
+
+        return json.dumps({"reactor": reactor_lag_monitor.get_statistics()})
+
+
 class DebugMemoryEndpoint(resource.Resource):
     """
     This class handles request for information about memory.
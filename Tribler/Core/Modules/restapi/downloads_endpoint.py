@@ -28,6 +28,48 @@ def _safe_extended_peer_info(ext_peer_info):
         return u''.join([unichr(ord(c)) for c in ext_peer_info])
 
 
+def _get_tracker_info(download):
+    return [{"url": url, "peers": url_info[0], "status": url_info[1]}
+            for url, url_info in download.get_tracker_status().iteritems()]
+
+
+# The fields of a download in the response of GET /downloads, with the function that computes each of them from the
+# session, the download and its state. Only the fields that have been requested are computed.
+DOWNLOAD_FIELDS = {
+    "name": lambda session, download, state: download.get_def().get_name_utf8(),
+    "progress": lambda session, download, state: state.get_progress(),
+    "speed_down": lambda session, download, state: state.get_current_payload_speed(DOWNLOAD),
+    "speed_up": lambda session, download, state: state.get_current_payload_speed(UPLOAD),
+    "status": lambda session, download, state: dlstatus_strings[state.get_status()],
+    "size": lambda session, download, state: download.get_def().get_length(),
+    "eta": lambda session, download, state: state.get_eta(),
+    "num_peers": lambda session, download, state: state.get_num_seeds_peers()[1],
+    "num_seeds": lambda session, download, state: state.get_num_seeds_peers()[0],
+    "total_up": lambda session, download, state: state.get_total_transferred(UPLOAD),
+    "total_down": lambda session, download, state: state.get_total_transferred(DOWNLOAD),
+    "ratio": lambda session, download, state: state.get_seeding_ratio(),
+    "trackers": lambda session, download, state: _get_tracker_info(download),
+    "hops": lambda session, download, state: download.get_hops(),
+    "anon_download": lambda session, download, state: download.get_anon_mode(),
+    "safe_seeding": lambda session, download, state: download.get_safe_seeding(),
+    # Maximum upload/download rates are set for entire sessions
+    "max_upload_speed": lambda session, download, state: session.config.get_libtorrent_max_upload_rate(),
+    "max_download_speed": lambda session, download, state: session.config.get_libtorrent_max_download_rate(),
+    "destination": lambda session, download, state: download.get_dest_dir(),
+    "availability": lambda session, download, state: state.get_availability(),
+    "total_pieces": lambda session, download, state: download.get_def().get_nr_pieces(),
+    "vod_mode": lambda session, download, state: download.get_mode() == DLMODE_VOD,
+    "vod_prebuffering_progress": lambda session, download, state: state.get_vod_prebuffering_progress(),
+    "vod_prebuffering_progress_consec": lambda session, download, state: state.get_vod_prebuffering_progress_consec(),
+    "error": lambda session, download, state: repr(state.get_error()) if state.get_error() else "",
+    "time_added": lambda session, download, state: download.get_time_added(),
+    "credit_mining": lambda session, download, state: download.get_credit_mining(),
+}
+
+# The fields that are only added when they are requested, since they are expensive to compute and large to transmit
+DETAIL_DOWNLOAD_FIELDS = ("peers", "pieces", "files")
+
+
 class DownloadBaseEndpoint(resource.Resource):
     """
     Base class for all endpoints related to fetching information about downloads or a specific download.
@@ -85,12 +127,13 @@ class DownloadBaseEndpoint(resource.Resource):
 
         return download_config, None
 
-    def get_files_info_json(self, download):
+    def get_files_info_json(self, download, state=None):
         """
         Return file information as JSON from a specified download.
         """
         files_json = []
-        files_completion = dict((name, progress) for name, progress in download.get_state().get_files_completion())
+        state = state or download.get_state()
+        files_completion = dict((name, progress) for name, progress in state.get_files_completion())
         selected_files = download.get_selected_files()
         file_index = 0
         for fn, size in download.get_def().get_files_with_length():
@@ -116,7 +159,7 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
 
     def render_GET(self, request):
         """
-        .. http:get:: /downloads?get_peers=(boolean: get_peers)&get_pieces=(boolean: get_pieces)
+        .. http:get:: /downloads?get_peers=(boolean: get_peers)&get_pieces=(boolean: get_pieces)&fields=(string: fields)&infohash=(string: infohash)&status=(string: status)&offset=(int: offset)&limit=(int: limit)&since=(int: revision)
 
         A GET request to this endpoint returns all downloads in Tribler, both active and inactive. The progress is a
         number ranging from 0 to 1, indicating the progress of the specific state (downloading, checking etc). The
@@ -127,6 +170,20 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
         Note that setting this flag has a negative impact on performance and should only be used in situations
         where this data is required.
 
+        The response can be reduced with the following optional parameters:
+        - fields: a comma-separated list of the fields of every download to return, for instance "status,progress".
+          The infohash is always returned. The peers, pieces and files can be requested as fields as well.
+        - infohash: a comma-separated list of hex-encoded infohashes of the downloads to return.
+        - status: a comma-separated list of statuses, such as DLSTATUS_DOWNLOADING, of the downloads to return.
+        - offset and limit: return a page of the downloads, ordered by the time they were added. The response then
+          contains the total number of matching downloads.
+        - since: only return the downloads that have changed after the given revision. The response then contains
+          the current revision, which can be passed in the next request, and the infohashes of the downloads that
+          have been removed after the given revision. Pass 0 to fetch all downloads and the current revision.
+          When the given revision is too old to know which downloads have been removed since, all downloads are
+          returned and full_resync is true in the response: the client should then forget the downloads that are
+          not in the response.
+
             **Example request**:
 
             .. sourcecode:: none
@@ -200,40 +257,79 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
 
         get_files = 'get_files' in request.args and request.args['get_files'] and request.args['get_files'][0] == "1"
 
-        downloads_json = []
+        fields = set(DOWNLOAD_FIELDS)
+        if 'fields' in request.args:
+            fields = set(field for arg in request.args['fields'] for field in arg.split(',') if field)
+            unknown_fields = fields - set(DOWNLOAD_FIELDS) - set(DETAIL_DOWNLOAD_FIELDS) - {"infohash"}
+            if unknown_fields:
+                request.setResponseCode(http.BAD_REQUEST)
+                return json.dumps({"error": "unknown fields: %s" % ", ".join(sorted(unknown_fields))})
+            get_peers = get_peers or "peers" in fields
+            get_pieces = get_pieces or "pieces" in fields
+            get_files = get_files or "files" in fields
+
+        numbers = {}
+        for name in ('offset', 'limit', 'since'):
+            if name in request.args and request.args[name]:
+                if not request.args[name][0].isdigit():
+                    request.setResponseCode(http.BAD_REQUEST)
+                    return json.dumps({"error": "%s must be a non-negative number" % name})
+                numbers[name] = int(request.args[name][0])
+
+        infohashes = None
+        if 'infohash' in request.args:
+            try:
+                infohashes = set(infohash.decode('hex') for arg in request.args['infohash']
+                                 for infohash in arg.split(',') if infohash)
+            except TypeError:
+                request.setResponseCode(http.BAD_REQUEST)
+                return json.dumps({"error": "invalid infohash"})
+
+        statuses = None
+        if 'status' in request.args:
+            statuses = set(status for arg in request.args['status'] for status in arg.split(',') if status)
+
         downloads = self.session.get_downloads()
+        if infohashes is not None:
+            downloads = [download for download in downloads if download.get_def().get_infohash() in infohashes]
+
+        download_states = self.session.lm.download_states
+        since = numbers.get('since')
+        full_resync = since is not None and download_states.is_resync_required(since)
+        removed_infohashes = []
+        if since is not None and not full_resync:
+            # Only the downloads that changed after the given revision are returned, with the states of the current
+            # revision
+            changed_infohashes, removed_infohashes = download_states.get_changes_since(since)
+            changed_infohashes = set(changed_infohashes)
+            downloads = [download for download in downloads
+                         if download.get_def().get_infohash() in changed_infohashes]
+
+        states = {}
+        for download in downloads:
+            infohash = download.get_def().get_infohash()
+            states[infohash] = (download_states.get_state(infohash) if since is not None else None) \
+                or download.get_state()
+
+        if statuses is not None:
+            downloads = [download for download in downloads
+                         if dlstatus_strings[states[download.get_def().get_infohash()].get_status()] in statuses]
+
+        response = {}
+        if 'offset' in numbers or 'limit' in numbers:
+            # Pages are only consistent when the downloads are in a fixed order
+            downloads.sort(key=lambda download: (download.get_time_added(), download.get_def().get_infohash()))
+            response["total"] = len(downloads)
+            offset = numbers.get('offset', 0)
+            limit = numbers.get('limit')
+            downloads = downloads[offset:offset + limit if limit is not None else None]
+
+        downloads_json = []
         for download in downloads:
-            state = download.get_state()
-            tdef = download.get_def()
-
-            # Create tracker information of the download
-            tracker_info = []
-            for url, url_info in download.get_tracker_status().iteritems():
-                tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
-
-            num_seeds, num_peers = state.get_num_seeds_peers()
-
-            download_json = {"name": tdef.get_name_utf8(), "progress": state.get_progress(),
-                             "infohash": tdef.get_infohash().encode('hex'),
-                             "speed_down": state.get_current_payload_speed(DOWNLOAD),
-                             "speed_up": state.get_current_payload_speed(UPLOAD),
-                             "status": dlstatus_strings[state.get_status()],
-                             "size": tdef.get_length(), "eta": state.get_eta(),
-                             "num_peers": num_peers, "num_seeds": num_seeds,
-                             "total_up": state.get_total_transferred(UPLOAD),
-                             "total_down": state.get_total_transferred(DOWNLOAD), "ratio": state.get_seeding_ratio(),
-                             "trackers": tracker_info, "hops": download.get_hops(),
-                             "anon_download": download.get_anon_mode(), "safe_seeding": download.get_safe_seeding(),
-                             # Maximum upload/download rates are set for entire sessions
-                             "max_upload_speed": self.session.config.get_libtorrent_max_upload_rate(),
-                             "max_download_speed": self.session.config.get_libtorrent_max_download_rate(),
-                             "destination": download.get_dest_dir(), "availability": state.get_availability(),
-                             "total_pieces": tdef.get_nr_pieces(), "vod_mode": download.get_mode() == DLMODE_VOD,
-                             "vod_prebuffering_progress": state.get_vod_prebuffering_progress(),
-                             "vod_prebuffering_progress_consec": state.get_vod_prebuffering_progress_consec(),
-                             "error": repr(state.get_error()) if state.get_error() else "",
-                             "time_added": download.get_time_added(),
-                             "credit_mining": download.get_credit_mining()}
+            state = states[download.get_def().get_infohash()]
+            download_json = {field: DOWNLOAD_FIELDS[field](self.session, download, state)
+                             for field in fields if field in DOWNLOAD_FIELDS}
+            download_json["infohash"] = download.get_def().get_infohash().encode('hex')
 
             # Add peers information if requested
             if get_peers:
@@ -252,10 +348,17 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
 
             # Add files if requested
             if get_files:
-                download_json["files"] = self.get_files_info_json(download)
+                download_json["files"] = self.get_files_info_json(download, state)
 
             downloads_json.append(download_json)
-        return json.dumps({"downloads": downloads_json})
+
+        response["downloads"] = downloads_json
+        if since is not None:
+            response["revision"] = download_states.revision
+            response["full_resync"] = full_resync
+            response["removed"] = [infohash.encode('hex') for infohash in removed_infohashes
+                                   if infohashes is None or infohash in infohashes]
+        return json.dumps(response)
 
     def render_PUT(self, request):
         """
@@ -1,4 +1,7 @@
+from twisted.internet import reactor
+from twisted.internet.interfaces import IPushProducer
 from twisted.web import server, resource
+from zope.interface import implementer
 
 from Tribler.Core.Modules.restapi.util import convert_db_channel_to_json, convert_search_torrent_to_json, \
     fix_unicode_dict
@@ -13,12 +16,86 @@ from Tribler.Core.simpledefs import (NTFY_CHANNELCAST, SIGNAL_CHANNEL, SIGNAL_ON
 import Tribler.Core.Utilities.json_util as json
 from Tribler.Core.version import version_id
 
+# The number of seconds during which events are collected before they are written to the clients in a single write
+EVENTS_FLUSH_INTERVAL = 0.1
+
+# The maximum number of events queued for a client that does not read them fast enough
+MAX_QUEUED_EVENTS = 1000
+
+# Events of these types are dropped for a client whose queue is full
+DROPPABLE_EVENT_TYPES = frozenset(["search_result_channel", "search_result_torrent", "channel_discovered",
+                                   "torrent_discovered", "market_ask", "market_bid"])
+
+# Only the most recent queued event of these types is written to a client
+MERGED_EVENT_TYPES = frozenset(["upgrader_tick"])
+
+
+@implementer(IPushProducer)
+class EventsClient(object):
+    """
+    The queue of the events that are still to be written to a client of the events endpoint.
+
+    The client is registered as the producer of its request, so Twisted pauses it when the client does not read the
+    data that has been written fast enough. The queue of a paused client is bounded: the high-volume events in
+    DROPPABLE_EVENT_TYPES are dropped when it is full. The queue of a client that is not paused is written as soon as
+    it is full instead.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.queue = []  # List of (event type, encoded event)
+        self.merged = {}  # Map: event type in MERGED_EVENT_TYPES -> queued (event type, encoded event) of that type
+        self.paused = False
+        self.dropped = 0
+
+        request.registerProducer(self, True)
+
+    def enqueue(self, event_type, data):
+        # A merged event replaces the queued event of its type, at the position of the new event so that the order of
+        # the events is preserved
+        if event_type in self.merged:
+            self.queue.remove(self.merged.pop(event_type))
+        elif len(self.queue) >= MAX_QUEUED_EVENTS:
+            if not self.paused:
+                self.flush()
+            elif event_type in DROPPABLE_EVENT_TYPES:
+                self.dropped += 1
+                return
+
+        event = (event_type, data)
+        if event_type in MERGED_EVENT_TYPES:
+            self.merged[event_type] = event
+        self.queue.append(event)
+
+    def flush(self):
+        """
+        Write all queued events to the client in a single write, unless the client is paused.
+        """
+        if self.paused or not self.queue:
+            return
+
+        queue, self.queue, self.merged = self.queue, [], {}
+        self.request.write(''.join(data for _, data in queue))
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        self.flush()
+
+    def stopProducing(self):
+        self.paused = True
+        self.queue = []
+        self.merged = {}
+
 
 class EventsEndpoint(resource.Resource):
     """
     Important events in Tribler are returned over the events endpoint. This connection is held open. Each event is
     pushed over this endpoint in the form of a JSON dictionary. Each JSON dictionary contains a type field that
-    indicates the type of the event. Individual events are separated by a newline character (\n).
+    indicates the type of the event. Individual events are separated by a newline character (\n). Events that occur
+    shortly after each other may be written in a single frame.
 
     Currently, the following events are implemented:
 
@@ -61,6 +138,8 @@ class EventsEndpoint(resource.Resource):
         resource.Resource.__init__(self)
         self.session = session
         self.events_requests = []
+        self.events_clients = []
+        self.flush_call = None
 
         self.infohashes_sent = set()
         self.channel_cids_sent = set()
@@ -92,18 +171,37 @@ class EventsEndpoint(resource.Resource):
 
     def write_data(self, message):
         """
-        Write data over the event socket if it's open.
+        Write data over the event socket if it's open. The message is encoded once, and written to all clients with
+        the other events of the next EVENTS_FLUSH_INTERVAL seconds.
         """
+        if len(self.events_clients) == 0:
+            return
+
         try:
             message_str = json.dumps(message)
         except UnicodeDecodeError:
             # The message contains invalid characters; fix them
             message_str = json.dumps(fix_unicode_dict(message))
 
-        if len(self.events_requests) == 0:
-            return
-        else:
-            [request.write(message_str + '\n') for request in self.events_requests]
+        for client in self.events_clients:
+            client.enqueue(message["type"], message_str + '\n')
+
+        if not self.flush_call:
+            self.flush_call = reactor.callLater(EVENTS_FLUSH_INTERVAL, self.flush)
+
+    def flush(self):
+        """
+        Write the events that have been queued to the clients.
+        """
+        if self.flush_call and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+
+        for client in self.events_clients:
+            client.flush()
+
+    def shutdown(self):
+        self.flush()
 
     def start_new_query(self):
         self.infohashes_sent = set()
@@ -134,14 +232,15 @@ class EventsEndpoint(resource.Resource):
 
         for torrent in results['result_list']:
             torrent_json = convert_search_torrent_to_json(torrent)
-            torrent_name = torrent_json['name']
-            torrent_json['relevance_score'] = torrent_json['relevance_score'] if 'relevance_score' in torrent_json \
-                else self.session.lm.torrent_db.relevance_score_remote_torrent(torrent_name)
 
             if self.session.config.get_family_filter_enabled() and torrent_json['category'] == 'xxx':
                 continue
 
             if 'infohash' in torrent_json and torrent_json['infohash'] not in self.infohashes_sent:
+                # Only the results that are sent are scored
+                if 'relevance_score' not in torrent_json:
+                    torrent_json['relevance_score'] = \
+                        self.session.lm.torrent_db.relevance_score_remote_torrent(torrent_json['name'])
                 self.write_data({"type": "search_result_torrent", "event": {"query": query, "result": torrent_json}})
                 self.infohashes_sent.add(torrent_json['infohash'])
 
@@ -220,10 +319,14 @@ class EventsEndpoint(resource.Resource):
 
                     curl -X GET http://localhost:8085/events
         """
+        client = EventsClient(request)
+
         def on_request_finished(_):
             self.events_requests.remove(request)
+            self.events_clients.remove(client)
 
         self.events_requests.append(request)
+        self.events_clients.append(client)
         request.notifyFinish().addCallbacks(on_request_finished, on_request_finished)
 
         request.write(json.dumps({"type": "events_start", "event": {
@@ -35,6 +35,7 @@ class RESTManager(TaskManager):
         """
         Stop the HTTP API and return a deferred that fires when the server has shut down.
         """
+        self.root_endpoint.events_endpoint.shutdown()
         return maybeDeferred(self.site.stopListening)
 
 
@@ -7,6 +7,9 @@ from Tribler.Core.simpledefs import NTFY_CHANNELCAST, NTFY_TORRENTS, SIGNAL_TORR
     SIGNAL_CHANNEL
 import Tribler.Core.Utilities.json_util as json
 
+# The maximum number of best ranked torrents we return from the local database
+LOCAL_TORRENT_RESULTS_LIMIT = 250
+
 
 class SearchEndpoint(resource.Resource):
     """
@@ -69,13 +72,23 @@ class SearchEndpoint(resource.Resource):
         # We first search the local database for torrents and channels
         query = unicode(request.args['q'][0], 'utf-8')
         keywords = split_into_keywords(query)
-        results_local_channels = self.channel_db_handler.search_in_local_channels_db(query)
+        # Repeated queries are answered from the search cache, if there is one
+        search_cache = self.session.lm.search_cache
+        if search_cache:
+            results_local_channels = search_cache.search_channels(query)
+        else:
+            results_local_channels = self.channel_db_handler.search_in_local_channels_db(query)
         results_dict = {"keywords": keywords, "result_list": results_local_channels}
         self.session.notifier.notify(SIGNAL_CHANNEL, SIGNAL_ON_SEARCH_RESULTS, None, results_dict)
 
         torrent_db_columns = ['T.torrent_id', 'infohash', 'T.name', 'length', 'category',
                               'num_seeders', 'num_leechers', 'last_tracker_check']
-        results_local_torrents = self.torrent_db_handler.search_in_local_torrents_db(query, keys=torrent_db_columns)
+        if search_cache:
+            results_local_torrents = search_cache.search_torrents(query, torrent_db_columns,
+                                                                  limit=LOCAL_TORRENT_RESULTS_LIMIT)
+        else:
+            results_local_torrents = self.torrent_db_handler.search_in_local_torrents_db(
+                query, keys=torrent_db_columns, limit=LOCAL_TORRENT_RESULTS_LIMIT)
         results_dict = {"keywords": keywords, "result_list": results_local_torrents}
         self.session.notifier.notify(SIGNAL_TORRENT, SIGNAL_ON_SEARCH_RESULTS, None, results_dict)
 
@@ -0,0 +1,195 @@
+"""
+Cache of local search results.
+
+The same query is often issued many times in a row, for instance while a user is typing or when several GUI clients
+are connected to the same core. This cache keeps the ranked results of recent local searches and drops them as soon
+as the torrents or channels they contain are changed in the database.
+"""
+import logging
+from collections import OrderedDict
+from threading import RLock
+from time import time
+
+from Tribler.Core.Utilities.search_utils import split_into_keywords
+from Tribler.Core.simpledefs import (NTFY_TORRENTS, NTFY_CHANNELCAST, NTFY_VOTECAST, NTFY_INSERT, NTFY_UPDATE,
+                                     NTFY_DELETE)
+
+DEFAULT_MAX_ENTRIES = 100
+DEFAULT_MAX_RESULTS = 50000
+DEFAULT_MAX_AGE = 60
+
+KIND_TORRENTS = u"torrents"
+KIND_CHANNELS = u"channels"
+
+
+class CacheEntry(object):
+
+    def __init__(self, keywords, results, infohashes):
+        self.keywords = keywords
+        self.results = results
+        self.infohashes = infohashes
+        self.timestamp = time()
+
+
+class LocalSearchCache(object):
+    """
+    LRU cache of local torrent and channel search results, keyed by the normalized set of query keywords.
+    The memory used is bounded by both the number of entries and the total number of cached result rows.
+    Entries also expire after max_age seconds, since not every database change is announced by the notifier.
+    """
+
+    def __init__(self, session, max_entries=DEFAULT_MAX_ENTRIES, max_results=DEFAULT_MAX_RESULTS,
+                 max_age=DEFAULT_MAX_AGE):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.session = session
+        self.max_entries = max_entries
+        self.max_results = max_results
+        self.max_age = max_age
+
+        self.torrent_db = None
+        self.channel_db = None
+
+        self._entries = OrderedDict()
+        self._num_results = 0
+        self._lock = RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def initialize(self):
+        self.torrent_db = self.session.open_dbhandler(NTFY_TORRENTS)
+        self.channel_db = self.session.open_dbhandler(NTFY_CHANNELCAST)
+
+        self.session.add_observer(self.on_torrent_changed, NTFY_TORRENTS, [NTFY_INSERT, NTFY_UPDATE, NTFY_DELETE])
+        self.session.add_observer(self.on_channels_changed, NTFY_CHANNELCAST, [NTFY_INSERT, NTFY_UPDATE, NTFY_DELETE])
+        self.session.add_observer(self.on_channels_changed, NTFY_VOTECAST, [NTFY_UPDATE])
+
+    def shutdown(self):
+        self.session.remove_observer(self.on_torrent_changed)
+        self.session.remove_observer(self.on_channels_changed)
+        self.clear()
+        self.torrent_db = None
+        self.channel_db = None
+
+    @staticmethod
+    def normalize_query(query):
+        """
+        Returns the set of keywords that determine the results of a query, in the same way the database does.
+        """
+        return frozenset(split_into_keywords(query, to_filter_stopwords=True))
+
+    def search_torrents(self, query, keys, limit=None):
+        """
+        Returns the ranked results of search_in_local_torrents_db, from the cache if possible.
+        """
+        keywords = self.normalize_query(query)
+        key = (KIND_TORRENTS, tuple(keys), limit, keywords)
+        results = self.get(key)
+        if results is None:
+            results = [tuple(result) for result in
+                       self.torrent_db.search_in_local_torrents_db(query, keys=keys, limit=limit)]
+            infohash_index = keys.index('infohash')
+            self.put(key, keywords, list(results), {result[infohash_index] for result in results})
+        return results
+
+    def search_channels(self, query):
+        """
+        Returns the results of search_in_local_channels_db, from the cache if possible.
+        """
+        keywords = self.normalize_query(query)
+        key = (KIND_CHANNELS, keywords)
+        results = self.get(key)
+        if results is None:
+            results = [tuple(result) for result in self.channel_db.search_in_local_channels_db(query)]
+            self.put(key, keywords, list(results), set())
+        return results
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time() - entry.timestamp > self.max_age:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            # Move the entry to the end, so the least recently used entry is at the front
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+            # Callers get their own list, so they cannot change the cached results
+            return list(entry.results)
+
+    def put(self, key, keywords, results, infohashes):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(results) > self.max_results:
+                return
+
+            self._entries[key] = CacheEntry(keywords, results, infohashes)
+            self._num_results += len(results)
+            while len(self._entries) > self.max_entries or self._num_results > self.max_results:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._num_results -= len(entry.results)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._num_results = 0
+
+    def invalidate(self, predicate):
+        """
+        Remove all entries for which predicate(key, entry) holds.
+        """
+        with self._lock:
+            for key in [key for key, entry in self._entries.iteritems() if predicate(key, entry)]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def on_torrent_changed(self, subject, change_type, infohash, *args):
+        """
+        A torrent has been inserted, updated or removed. An inserted or updated torrent only affects the results it
+        is part of and the searches for one of the terms it is now indexed with, since an update may rename it.
+        """
+        with self._lock:
+            if not any(key[0] == KIND_TORRENTS for key in self._entries):
+                return
+
+        indexed_terms = self.get_indexed_terms(infohash) if change_type != NTFY_DELETE and infohash else None
+        if indexed_terms:
+            self.invalidate(lambda key, entry: key[0] == KIND_TORRENTS and
+                            (entry.keywords & indexed_terms or infohash in entry.infohashes))
+        else:
+            self.invalidate(lambda key, _: key[0] == KIND_TORRENTS)
+
+    def get_indexed_terms(self, infohash):
+        """
+        Returns the terms in the FullTextIndex of a torrent, or None if it has not been indexed.
+        """
+        torrent_id = self.torrent_db.getTorrentID(infohash)
+        if torrent_id is None:
+            return None
+        row = self.torrent_db._db.fetchone(u"SELECT swarmname, filenames, fileextensions FROM FullTextIndex "
+                                           u"WHERE rowid = ?", (torrent_id,))
+        if not row:
+            return None
+        return set(split_into_keywords(u" ".join(column or u"" for column in row)))
+
+    def on_channels_changed(self, subject, change_type, channel_id, *args):
+        self.invalidate(lambda key, _: key[0] == KIND_CHANNELS)
+
+    def get_statistics(self):
+        """
+        Returns the number of cached entries and result rows, and how often the cache was hit, missed and invalidated.
+        """
+        with self._lock:
+            return {"entries": len(self._entries),
+                    "results": self._num_results,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "invalidations": self.invalidations}
@@ -101,16 +101,12 @@ class TrackerManager(object):
         self._session.sqlite_db.execute(sql_stmt, value_tuple)
 
     @blocking_call_on_reactor_thread
-    def get_next_tracker_for_auto_check(self):
+    def get_next_trackers_for_auto_check(self, limit):
         """
-        Gets the next tracker for automatic tracker-checking.
-        :return: The next tracker for automatic tracker-checking.
+        Gets the trackers that are due for automatic tracker-checking, the ones checked longest ago first.
+        :param limit: The maximum number of trackers to return.
+        :return: A list with the URLs of the trackers.
         """
-        try:
-            sql_stmt = u"SELECT tracker FROM TrackerInfo WHERE tracker != 'no-DHT' AND tracker != 'DHT' AND " \
-                       u"last_check + ? <= strftime('%s','now') AND is_alive = 1 ORDER BY last_check LIMIT 1;"
-            result = self._session.sqlite_db.execute(sql_stmt, (TRACKER_RETRY_INTERVAL,)).next()
-        except StopIteration:
-            return None
-
-        return result[0]
+        sql_stmt = u"SELECT tracker FROM TrackerInfo WHERE tracker != 'no-DHT' AND tracker != 'DHT' AND " \
+                   u"last_check + ? <= strftime('%s','now') AND is_alive = 1 ORDER BY last_check LIMIT ?;"
+        return [row[0] for row in self._session.sqlite_db.execute(sql_stmt, (TRACKER_RETRY_INTERVAL, limit))]
@@ -14,6 +14,7 @@ from decorator import decorator
 from twisted.internet import reactor
 from twisted.internet.task import LoopingCall
 
+from Tribler.Core.Libtorrent.LibtorrentMgr import METAINFO_PRIORITY_COLLECT
 from Tribler.Core.TFTP.handler import METADATA_PREFIX
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.simpledefs import INFOHASH_LENGTH, NTFY_TORRENTS
@@ -79,6 +80,8 @@ class RemoteTorrentHandler(TaskManager):
         self.running = False
         for requester in self.torrent_requesters.itervalues():
             requester.stop()
+        for requester in self.magnet_requesters.itervalues():
+            requester.stop()
         self.shutdown_task_manager()
 
     @blocking_call_on_reactor_thread
@@ -425,6 +428,15 @@ class MagnetRequester(Requester):
 
         self._running_requests = []
 
+    def stop(self):
+        super(MagnetRequester, self).stop()
+
+        # Make room in the metainfo queue of libtorrent for other requests
+        ltmgr = self._session.lm.ltmgr
+        if ltmgr:
+            for infohash in self._running_requests:
+                ltmgr.cancel_metainfo_request(infohash, self._success_callback)
+
     @pass_when_stopped
     def add_request(self, infohash, candidate=None, timeout=None):
         queue_was_empty = len(self._pending_request_queue) == 0
@@ -458,7 +470,8 @@ class MagnetRequester(Requester):
                                infohash_str, self._priority, magnetlink)
 
             self._session.lm.ltmgr.get_metainfo(magnetlink, self._success_callback,
-                                                timeout=self.TIMEOUT, timeout_callback=self._failure_callback)
+                                                timeout=self.TIMEOUT, timeout_callback=self._failure_callback,
+                                                priority=METAINFO_PRIORITY_COLLECT)
             self._running_requests.append(infohash)
 
     @blocking_call_on_reactor_thread
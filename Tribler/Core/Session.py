@@ -464,6 +464,7 @@ class Session(object):
         self.readable_status = STATE_OPEN_DB
         self.sqlite_db.initialize()
         self.sqlite_db.initial_begin()
+        self.sqlite_db.start_executor()
 
     @blocking_call_on_reactor_thread
     def start(self):
@@ -23,9 +23,20 @@ REP_TTL_EXPIRED = 0x06
 REP_COMMAND_NOT_SUPPORTED = 0x07
 REP_ADDRESS_TYPE_NOT_SUPPORTED = 0x08
 
+# The length of the header of a SOCKS5 UDP packet to or from an IPv4 address
+IPV4_UDP_HEADER_LENGTH = 10
+
+# The maximum number of entries in the caches with encoded and decoded UDP headers
+UDP_HEADER_CACHE_SIZE = 4096
 
 logger = logging.getLogger(__name__)
 
+# (address, port) -> encoded header of a SOCKS5 UDP packet
+_encoded_udp_headers = {}
+
+# encoded header of a SOCKS5 UDP packet -> (rsv, frag, address_type, address, port)
+_decoded_udp_headers = {}
+
 
 class MethodRequest(object):
 
@@ -219,6 +230,18 @@ def decode_udp_packet(data):
     @return: An UdpRequest object containing the parsed data
     @rtype: UdpRequest
     """
+    # Libtorrent sends all packets to a peer with the same header, so the decoded IPv4 headers are cached
+    if len(data) >= IPV4_UDP_HEADER_LENGTH and data[3] == '\x01':
+        header = data[:IPV4_UDP_HEADER_LENGTH]
+        fields = _decoded_udp_headers.get(header)
+        if fields is None:
+            fields = struct.unpack_from("!HBB", data) + (socket.inet_ntoa(data[4:8]),) + \
+                     struct.unpack_from("!H", data, 8)
+            if len(_decoded_udp_headers) >= UDP_HEADER_CACHE_SIZE:
+                _decoded_udp_headers.clear()
+            _decoded_udp_headers[header] = fields
+        return UdpRequest(*(fields + (data[IPV4_UDP_HEADER_LENGTH:],)))
+
     offset = 0
     (rsv, frag, address_type) = struct.unpack_from("!HBB", data, offset)
     offset += 4
@@ -234,6 +257,24 @@ def decode_udp_packet(data):
                       destination_port, payload)
 
 
+def encode_udp_header(address, port):
+    """
+    Encodes the header of a (non-fragmented) SOCKS5 UDP packet from an IPv4 address.
+    The headers are cached, since all packets from a peer have the same header.
+    @param str address: address host
+    @param int port: address port
+    @return: serialised byte string
+    @rtype: str
+    """
+    header = _encoded_udp_headers.get((address, port))
+    if header is None:
+        header = struct.pack("!HBB4sH", 0, 0, ADDRESS_TYPE_IPV4, socket.inet_aton(address), port)
+        if len(_encoded_udp_headers) >= UDP_HEADER_CACHE_SIZE:
+            _encoded_udp_headers.clear()
+        _encoded_udp_headers[(address, port)] = header
+    return header
+
+
 def encode_udp_packet(rsv, frag, address_type, address, port, payload):
     """
     Encodes a SOCKS5 UDP packet
@@ -246,6 +287,9 @@ def encode_udp_packet(rsv, frag, address_type, address, port, payload):
     @return: serialised byte string
     @rtype: str
     """
+    if rsv == 0 and frag == 0 and address_type == ADDRESS_TYPE_IPV4:
+        return encode_udp_header(address, port) + payload
+
     strings = [
         struct.pack("!HBB", rsv, frag, address_type),
         __encode_address(address_type, address),
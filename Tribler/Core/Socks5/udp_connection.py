@@ -4,6 +4,9 @@ from Tribler.Core.Socks5 import conversion
 from twisted.internet import reactor
 from twisted.internet.protocol import DatagramProtocol
 
+# The maximum number of datagrams that are passed on to the output stream at once
+MAX_BATCH_SIZE = 512
+
 
 class SocksUDPConnection(DatagramProtocol):
 
@@ -16,6 +19,10 @@ class SocksUDPConnection(DatagramProtocol):
         else:
             self.remote_udp_address = None
 
+        # Datagrams received in the current reactor iteration, which are passed on to the output stream as one batch
+        self.pending_requests = []
+        self.flush_call = None
+
         self.listen_port = reactor.listenUDP(0, self)
 
     def get_listen_port(self):
@@ -42,7 +49,12 @@ class SocksUDPConnection(DatagramProtocol):
                 return False
 
             if request.frag == 0:
-                return self.socksconnection.socksserver.udp_output_stream.on_socks5_udp_data(self, request)
+                self.pending_requests.append(request)
+                if len(self.pending_requests) >= MAX_BATCH_SIZE:
+                    self.flush_requests()
+                elif not self.flush_call:
+                    self.flush_call = reactor.callLater(0, self.flush_requests)
+                return True
             else:
                 self._logger.debug("No support for fragmented data, dropping")
         else:
@@ -51,7 +63,24 @@ class SocksUDPConnection(DatagramProtocol):
 
         return False
 
+    def flush_requests(self):
+        """
+        Pass the datagrams that have been received since the last flush on to the output stream.
+        """
+        if self.flush_call and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+
+        requests, self.pending_requests = self.pending_requests, []
+        if requests:
+            self.socksconnection.socksserver.udp_output_stream.on_socks5_udp_batch(self, requests)
+
     def close(self):
+        if self.flush_call and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+        self.pending_requests = []
+
         exit_value = self.listen_port.stopListening()
         self.listen_port = None
         return exit_value
@@ -20,12 +20,15 @@ from Tribler.pyipv8.ipv8.taskmanager import TaskManager
 TRACKER_ACTION_CONNECT = 0
 TRACKER_ACTION_ANNOUNCE = 1
 TRACKER_ACTION_SCRAPE = 2
+TRACKER_ACTION_ERROR = 3
 
 MAX_INT32 = 2 ** 16 - 1
 
 UDP_TRACKER_INIT_CONNECTION_ID = 0x41727101980
 UDP_TRACKER_RECHECK_INTERVAL = 15
 UDP_TRACKER_MAX_RETRIES = 8
+# A connection ID may be used for one minute after it has been received (BEP 15), we stay a bit below that
+UDP_TRACKER_CONNECTION_ID_LIFETIME = 55
 
 HTTP_TRACKER_RECHECK_INTERVAL = 60
 HTTP_TRACKER_MAX_RETRIES = 0
@@ -50,6 +53,15 @@ def create_tracker_session(tracker_url, timeout, socket_manager, connection_pool
     return HttpTrackerSession(tracker_url, tracker_address, announce_page, timeout, connection_pool=connection_pool)
 
 
+def get_max_multi_scrape(tracker_url):
+    """
+    Returns the maximum number of infohashes that can be scraped from a tracker in a single request.
+    :param tracker_url: The URL of the tracker.
+    """
+    # TODO(ardhi) : quickfix for etree.org can't handle multiple infohash in single call
+    return 1 if "etree" in tracker_url else MAX_TRACKER_MULTI_SCRAPE
+
+
 class TrackerSession(TaskManager):
     __meta__ = ABCMeta
 
@@ -101,11 +113,7 @@ class TrackerSession(TaskManager):
         Checks if we still can add requests to this session.
         :return: True or False.
         """
-
-        #TODO(ardhi) : quickfix for etree.org can't handle multiple infohash in single call
-        etree_condition = "etree" not in self.tracker_url
-
-        return not self._is_initiated and len(self._infohash_list) < MAX_TRACKER_MULTI_SCRAPE and etree_condition
+        return not self._is_initiated and len(self._infohash_list) < get_max_multi_scrape(self.tracker_url)
 
     def has_infohash(self, infohash):
         return infohash in self._infohash_list
@@ -367,6 +375,38 @@ class UdpSocketManager(DatagramProtocol):
     def __init__(self):
         self._logger = logging.getLogger(self.__class__.__name__)
         self.tracker_sessions = {}
+        # (ip address, port) -> (connection ID, time at which it was received)
+        self._connection_ids = {}
+
+    def get_connection_id(self, address):
+        """
+        Returns the connection ID we have for the UDP tracker at the given address, or None if there is no connection
+        ID that we can still use.
+        :param address: The (ip address, port) tuple of the tracker.
+        """
+        connection_id, timestamp = self._connection_ids.get(address, (None, 0))
+        if connection_id is not None and time.time() - timestamp > UDP_TRACKER_CONNECTION_ID_LIFETIME:
+            del self._connection_ids[address]
+            return None
+        return connection_id
+
+    def store_connection_id(self, address, connection_id):
+        """
+        Stores a connection ID received from the UDP tracker at the given address, so later sessions can skip the
+        connect handshake.
+        """
+        now = time.time()
+        # Drop the connection IDs that have expired, there is at most one entry per tracker we recently contacted
+        for expired_address in [key for key, (_, timestamp) in self._connection_ids.iteritems()
+                                if now - timestamp > UDP_TRACKER_CONNECTION_ID_LIFETIME]:
+            del self._connection_ids[expired_address]
+        self._connection_ids[address] = (connection_id, now)
+
+    def invalidate_connection_id(self, address):
+        """
+        Forgets the connection ID of the UDP tracker at the given address, for instance when the tracker rejected it.
+        """
+        self._connection_ids.pop(address, None)
 
     def send_request(self, data, tracker_session):
         self.tracker_sessions[tracker_session.transaction_id] = tracker_session
@@ -388,6 +428,9 @@ class UdpTrackerSession(TrackerSession):
     The UDPTrackerSession makes a connection with a UDP tracker and queries
     seeders and leechers for one or more infohashes. It handles the message serialization
     and communication with the torrent checker by making use of Deferred (asynchronously).
+
+    The infohashes are split over as many scrape packets as needed, each carrying at most MAX_TRACKER_MULTI_SCRAPE
+    infohashes. The connection ID is shared with other sessions to the same tracker through the socket manager.
     """
 
     # A list of transaction IDs that have been used in order to avoid conflict.
@@ -406,6 +449,11 @@ class UdpTrackerSession(TrackerSession):
         self.socket_mgr = socket_mgr
         self.ip_resolve_deferred = None
 
+        # transaction ID -> (start, end) slice of the infohash list of the scrape packets we are waiting for
+        self._pending_scrapes = {}
+        self._scrape_results = []
+        self._reused_connection_id = False
+
         # prepare connection message
         self._connection_id = UDP_TRACKER_INIT_CONNECTION_ID
         self.action = TRACKER_ACTION_CONNECT
@@ -454,14 +502,25 @@ class UdpTrackerSession(TrackerSession):
 
         self._is_failed = True
 
+    def can_add_request(self):
+        """
+        Checks if we still can add requests to this session. Since the infohashes are split over multiple scrape
+        packets, there is no limit on the number of infohashes.
+        :return: True or False.
+        """
+        return not self._is_initiated
+
     def generate_transaction_id(self):
         """
-        Generates a unique transaction id and stores this in the _active_session_dict set.
+        Generates a unique transaction id and stores this in the _active_session_dict set. The ID is also unique among
+        the IDs of all packets that are still waiting for a response, including the scrape packets of other sessions.
         """
         while True:
             # make sure there is no duplicated transaction IDs
             transaction_id = random.randint(0, MAX_INT32)
-            if transaction_id not in UdpTrackerSession._active_session_dict.items():
+            if transaction_id not in UdpTrackerSession._active_session_dict.values() \
+                    and transaction_id not in self._pending_scrapes \
+                    and not (self.socket_mgr and transaction_id in self.socket_mgr.tracker_sessions):
                 UdpTrackerSession._active_session_dict[self] = transaction_id
                 self.transaction_id = transaction_id
                 break
@@ -477,8 +536,9 @@ class UdpTrackerSession(TrackerSession):
         # Checking for socket_mgr is a workaround for race condition
         # in Tribler Session startup/shutdown that sometimes causes
         # unit tests to fail on teardown.
-        if self.socket_mgr and self.transaction_id in self.socket_mgr.tracker_sessions:
-            self.socket_mgr.tracker_sessions.pop(self.transaction_id)
+        if self.socket_mgr:
+            for transaction_id in [self.transaction_id] + self._pending_scrapes.keys():
+                self.socket_mgr.tracker_sessions.pop(transaction_id, None)
 
     @inlineCallbacks
     def cleanup(self):
@@ -543,6 +603,15 @@ class UdpTrackerSession(TrackerSession):
             self.failed(msg="UDP socket transport not ready")
             return
 
+        # Skip the handshake if another session recently received a connection ID from this tracker
+        connection_id = self.socket_mgr.get_connection_id((self.ip_address, self.port))
+        if connection_id is not None:
+            self._connection_id = connection_id
+            self._reused_connection_id = True
+            self.expect_connection_response = False
+            self.send_scrape_requests()
+            return
+
         # Initiate the connection
         message = struct.pack('!qii', self._connection_id, self.action, self.transaction_id)
         self.socket_mgr.send_request(message, self)
@@ -584,20 +653,55 @@ class UdpTrackerSession(TrackerSession):
             self.failed(msg=''.join(error_message))
             return
 
-        # update action and IDs
         self._connection_id = struct.unpack_from('!q', response, 8)[0]
+        if self.ip_address is not None:
+            self.socket_mgr.store_connection_id((self.ip_address, self.port), self._connection_id)
+        self.send_scrape_requests()
+
+    def send_scrape_requests(self):
+        """
+        Sends the scrape packets for the infohashes in this session, each packet being as full as possible.
+        """
         self.action = TRACKER_ACTION_SCRAPE
-        self.generate_transaction_id()
+        self._pending_scrapes = {}
+        self._scrape_results = []
+
+        # The timeout of the handshake has been cancelled, so a lost scrape packet would otherwise hang this session
+        self.cancel_pending_task("timeout")
+        self.start_timeout()
 
-        # pack and send the message
-        fmt = '!qii' + ('20s' * len(self._infohash_list))
-        message = struct.pack(fmt, self._connection_id, self.action, self.transaction_id, *self._infohash_list)
+        # The last packet covers the rest of the infohash list, so there is always at least one
+        starts = range(0, len(self._infohash_list), MAX_TRACKER_MULTI_SCRAPE) or [0]
+        for start in starts:
+            end = start + MAX_TRACKER_MULTI_SCRAPE if start != starts[-1] else None
+            infohashes = self._infohash_list[start:end]
 
-        # Send the scrape message
-        self.socket_mgr.send_request(message, self)
+            self.generate_transaction_id()
+            self._pending_scrapes[self.transaction_id] = (start, end)
+
+            fmt = '!qii' + ('20s' * len(infohashes))
+            message = struct.pack(fmt, self._connection_id, self.action, self.transaction_id, *infohashes)
+            self.socket_mgr.send_request(message, self)
 
         self._last_contact = int(time.time())
 
+    def reconnect(self):
+        """
+        Forgets the connection ID that the tracker rejected and performs the connect handshake again.
+        """
+        self._logger.debug(u"%s Connection ID rejected, reconnecting", self)
+        self.socket_mgr.invalidate_connection_id((self.ip_address, self.port))
+        self.remove_transaction_id()
+
+        self._pending_scrapes = {}
+        self._scrape_results = []
+        self._reused_connection_id = False
+        self._connection_id = UDP_TRACKER_INIT_CONNECTION_ID
+        self.action = TRACKER_ACTION_CONNECT
+        self.expect_connection_response = True
+        self.generate_transaction_id()
+        self.connect()
+
     def handle_scrape_response(self, response):
         """
         Handles the scrape response from the UDP tracker.
@@ -611,7 +715,19 @@ class UdpTrackerSession(TrackerSession):
 
         # check response
         action, transaction_id = struct.unpack_from('!ii', response, 0)
-        if action != self.action or transaction_id != self.transaction_id:
+        if transaction_id in self._pending_scrapes:
+            scrape_slice = self._pending_scrapes[transaction_id]
+        elif not self._pending_scrapes and transaction_id == self.transaction_id:
+            scrape_slice = (0, None)
+        else:
+            scrape_slice = None
+
+        if action != self.action or scrape_slice is None:
+            if action == TRACKER_ACTION_ERROR and scrape_slice is not None and self._reused_connection_id:
+                # The tracker does not accept the connection ID of an earlier session (anymore)
+                self.reconnect()
+                return
+
             # get error message
             errmsg_length = len(response) - 8
             error_message = struct.unpack_from('!' + str(errmsg_length) + 's', response, 8)
@@ -622,30 +738,38 @@ class UdpTrackerSession(TrackerSession):
             return
 
         # get results
-        if len(response) - 8 != len(self._infohash_list) * 12:
+        infohashes = self._infohash_list[scrape_slice[0]:scrape_slice[1]]
+        if len(response) - 8 != len(infohashes) * 12:
             self._logger.info(u"%s UDP SCRAPE response mismatch: %s", self, len(response))
             self.failed(msg="invalid response size")
             return
 
         offset = 8
 
-        response_list = []
-
-        for infohash in self._infohash_list:
+        for infohash in infohashes:
             complete, _downloaded, incomplete = struct.unpack_from('!iii', response, offset)
             offset += 12
 
             # Store the information in the hash dict to be returned.
             # Sow complete as seeders. "complete: number of peers with the entire file, i.e. seeders (integer)"
             #  - https://wiki.theory.org/BitTorrentSpecification#Tracker_.27scrape.27_Convention
-            response_list.append({'infohash': infohash.encode('hex'), 'seeders': complete, 'leechers': incomplete})
+            self._scrape_results.append({'infohash': infohash.encode('hex'), 'seeders': complete,
+                                         'leechers': incomplete})
+
+        self._pending_scrapes.pop(transaction_id, None)
+        if self._pending_scrapes:
+            # Wait for the responses to the other scrape packets
+            return
 
         # close this socket and remove its transaction ID from the list
         self.remove_transaction_id()
         self._is_finished = True
 
+        if self.timeout_call and self.timeout_call.active():
+            self.timeout_call.cancel()
+
         if self.result_deferred and not self.result_deferred.called:
-            self.result_deferred.callback({self.tracker_url: response_list})
+            self.result_deferred.callback({self.tracker_url: self._scrape_results})
 
 
 class FakeDHTSession(TrackerSession):
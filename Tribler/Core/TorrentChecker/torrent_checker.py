@@ -2,7 +2,8 @@ import logging
 import socket
 import time
 from Tribler.Core.Utilities.utilities import is_valid_url
-from binascii import hexlify
+from binascii import hexlify, unhexlify
+from collections import deque
 
 from twisted.internet import reactor
 from twisted.internet.defer import DeferredList, CancelledError, fail, succeed, maybeDeferred
@@ -10,7 +11,8 @@ from twisted.internet.error import ConnectingCancelledError, ConnectionLost
 from twisted.python.failure import Failure
 from twisted.web.client import HTTPConnectionPool
 
-from Tribler.Core.TorrentChecker.session import create_tracker_session, FakeDHTSession, UdpSocketManager
+from Tribler.Core.TorrentChecker.session import create_tracker_session, FakeDHTSession, UdpSocketManager, \
+    get_max_multi_scrape
 from Tribler.Core.Utilities.tracker_utils import MalformedTrackerURLException
 from Tribler.Core.simpledefs import NTFY_TORRENTS
 from Tribler.community.popularity.repository import TYPE_TORRENT_HEALTH
@@ -18,7 +20,14 @@ from Tribler.pyipv8.ipv8.taskmanager import TaskManager
 from Tribler.pyipv8.ipv8.util import blocking_call_on_reactor_thread
 
 # some settings
-DEFAULT_TORRENT_SELECTION_INTERVAL = 20  # every 20 seconds, the thread will select torrents to check
+DEFAULT_TORRENT_SELECTION_INTERVAL = 5  # every 5 seconds, the free scrape slots are filled with tracker checks
+DEFAULT_MAX_CONCURRENT_SCRAPES = 50  # the maximum number of tracker sessions in flight at the same time
+DEFAULT_MAX_SCRAPES_PER_TRACKER = 4  # the maximum number of scrape requests to a single tracker per check
+DEFAULT_TRACKER_CHECK_TIMEOUT = 30
+# a scrape that has not finished some time after its session should have timed out is failed by the torrent checker
+DEFAULT_SCRAPE_WATCHDOG_TIMEOUT = DEFAULT_TRACKER_CHECK_TIMEOUT + 10
+SCRAPE_STATISTICS_WINDOW = 600  # the throughput of the torrent checker is measured over the last 10 minutes
+
 DEFAULT_TORRENT_CHECK_INTERVAL = 900  # base multiplier for the check delay
 
 DEFAULT_MAX_TORRENT_CHECK_RETRIES = 8  # max check delay increments when failed.
@@ -43,6 +52,18 @@ class TorrentChecker(TaskManager):
         self._session_list = {'DHT': []}
         self._last_torrent_selection_time = 0
 
+        # Tracker sessions of the automatic checks, per tracker URL
+        self._scrape_sessions = {}
+        self._num_scrape_sessions = 0
+        self._max_concurrent_scrapes = DEFAULT_MAX_CONCURRENT_SCRAPES
+        self._scrape_watchdog_timeout = DEFAULT_SCRAPE_WATCHDOG_TIMEOUT
+
+        # (time, number of refreshed torrents) of every finished scrape within the statistics window
+        self._scrape_history = deque()
+        self._scrape_statistics = {'scrapes_started': 0, 'scrapes_succeeded': 0, 'scrapes_failed': 0,
+                                   'torrents_refreshed': 0}
+        self._start_time = time.time()
+
         # Track all session cleanups
         self.session_stop_defer_list = []
 
@@ -99,73 +120,178 @@ class TorrentChecker(TaskManager):
 
     def _reschedule_tracker_select(self):
         """
-        Changes the tracker selection interval dynamically and schedules the task.
+        Schedules the next round of tracker checks.
         """
-        # dynamically change the interval: update at least every 2h
-        num_torrents = self._torrent_db.getNumberCollectedTorrents()
-
-        tracker_select_interval = min(max(7200 / num_torrents, 10), 100) if num_torrents \
-            else DEFAULT_TORRENT_SELECTION_INTERVAL
-
-        self._logger.debug(u"tracker selection interval changed to %s", tracker_select_interval)
-
         self.register_task(u"torrent_checker_tracker_selection",
-                           reactor.callLater(tracker_select_interval, self._task_select_tracker))
+                           reactor.callLater(DEFAULT_TORRENT_SELECTION_INTERVAL, self._task_select_tracker))
 
     def _task_select_tracker(self):
         """
-        The regularly scheduled task that selects torrents associated with a specific tracker to check.
+        The regularly scheduled task that fills the free scrape slots with checks of the trackers that have not been
+        checked for the longest time.
+        :return: A deferred that fires once all started tracker checks have finished.
         """
-
-        # update the torrent selection interval
         self._reschedule_tracker_select()
 
-        # start selecting torrents
-        tracker_url = self.get_valid_next_tracker_for_auto_check()
-        if tracker_url is None:
+        free_slots = self._max_concurrent_scrapes - self._num_scrape_sessions
+        if free_slots <= 0:
+            self._logger.debug(u"All %d scrape slots are in use, skip", self._max_concurrent_scrapes)
+            return succeed(None)
+
+        # Trackers that are still being checked are skipped, so we ask for some more
+        tracker_urls = [tracker_url for tracker_url in
+                        self.get_valid_next_trackers_for_auto_check(free_slots + len(self._scrape_sessions))
+                        if tracker_url not in self._scrape_sessions]
+        if not tracker_urls:
             self._logger.warn(u"No tracker to select from, skip")
             return succeed(None)
 
+        deferred_list = []
+        for tracker_url in tracker_urls:
+            if free_slots <= 0:
+                break
+            deferred, num_sessions = self._check_tracker(tracker_url, min(free_slots, DEFAULT_MAX_SCRAPES_PER_TRACKER))
+            deferred_list.append(deferred)
+            free_slots -= num_sessions
+
+        return DeferredList(deferred_list).addCallback(lambda _: None)
+
+    def _check_tracker(self, tracker_url, max_sessions):
+        """
+        Scrape the torrents on a tracker that are due for a check, the most stale and popular ones first.
+        :param tracker_url: The URL of the tracker to check.
+        :param max_sessions: The maximum number of scrape requests we may send to the tracker.
+        :return: A tuple with a deferred that fires once the check has finished and the number of started sessions.
+        """
         self._logger.debug(u"Start selecting torrents on tracker %s.", tracker_url)
 
         # get the torrents that should be checked
-        infohashes = self._torrent_db.getTorrentsOnTracker(tracker_url, int(time.time()))
+        max_infohashes = get_max_multi_scrape(tracker_url)
+        infohashes = self._torrent_db.getTorrentsOnTracker(tracker_url, int(time.time()),
+                                                           limit=max_sessions * max_infohashes)
 
         if len(infohashes) == 0:
             # We have not torrent to recheck for this tracker. Still update the last_check for this tracker.
             self._logger.info("No torrent to check for tracker %s", tracker_url)
             self.update_tracker_info(tracker_url, True)
-            return succeed(None)
-        elif tracker_url != u'DHT' and tracker_url != u'no-DHT':
+            return succeed(None), 0
+
+        if tracker_url == u'DHT' or tracker_url == u'no-DHT':
+            return succeed(None), 0
+
+        # A UDP session splits its infohashes over full scrape packets by itself, sharing a single connection ID
+        session_size = len(infohashes) if tracker_url.startswith(u'udp') else max_infohashes
+
+        deferred_list = []
+        for index in xrange(0, len(infohashes), session_size):
             try:
-                session = self._create_session_for_request(tracker_url, timeout=30)
+                session = self._create_session_for_request(tracker_url, timeout=DEFAULT_TRACKER_CHECK_TIMEOUT)
             except MalformedTrackerURLException as e:
                 # Remove the tracker from the database
                 self.remove_tracker(tracker_url)
                 self._logger.error(e)
-                return succeed(None)
+                break
 
-            for infohash in infohashes:
+            for infohash in infohashes[index:index + session_size]:
                 session.add_infohash(infohash)
+            deferred_list.append(self._start_scrape(session))
+
+        self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker_url)
+        return DeferredList(deferred_list).addCallback(lambda _: None), len(deferred_list)
+
+    def _start_scrape(self, session):
+        """
+        Connect to the tracker of an automatic check session and store the results in the database.
+        The session is failed when it has not finished in time, so a lost response never keeps its scrape slot taken.
+        """
+        self._scrape_sessions.setdefault(session.tracker_url, []).append(session)
+        self._num_scrape_sessions += 1
+        self._scrape_statistics['scrapes_started'] += 1
+
+        deferred = session.connect_to_tracker()
+        watchdog_name = u"scrape_watchdog_%d" % id(session)
+
+        def on_watchdog():
+            if not deferred.called:
+                self._logger.warning(u"Scrape of tracker %s did not finish in time", session.tracker_url)
+                deferred.errback(ValueError("scrape of tracker %s did not finish in time" % session.tracker_url))
+
+        def on_finished(result):
+            self.cancel_pending_task(watchdog_name)
+            self._scrape_sessions[session.tracker_url].remove(session)
+            if not self._scrape_sessions[session.tracker_url]:
+                del self._scrape_sessions[session.tracker_url]
+            self._num_scrape_sessions -= 1
+            return result
+
+        if not deferred.called:
+            self.register_task(watchdog_name, reactor.callLater(self._scrape_watchdog_timeout, on_watchdog))
+
+        return deferred.addCallbacks(*self.get_callbacks_for_session(session))\
+            .addCallbacks(self._on_scrape_result, self._on_scrape_error).addBoth(on_finished)
+
+    def _on_scrape_result(self, result):
+        if not result:
+            return
 
-            self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker_url)
-            return session.connect_to_tracker().addCallbacks(*self.get_callbacks_for_session(session))\
-                .addErrback(lambda _: None)
+        last_check = int(time.time())
+        num_refreshed = 0
+        for response_list in result.itervalues():
+            for response in response_list:
+                self._update_torrent_result({'infohash': unhexlify(response['infohash']),
+                                             'seeders': response['seeders'], 'leechers': response['leechers'],
+                                             'last_check': last_check})
+                num_refreshed += 1
+
+        self._scrape_statistics['scrapes_succeeded'] += 1
+        self._scrape_statistics['torrents_refreshed'] += num_refreshed
+        self._add_scrape_to_history(num_refreshed)
+
+    def _on_scrape_error(self, _):
+        self._scrape_statistics['scrapes_failed'] += 1
+        self._add_scrape_to_history(0)
+
+    def _add_scrape_to_history(self, num_refreshed):
+        now = time.time()
+        self._scrape_history.append((now, num_refreshed))
+        while self._scrape_history[0][0] < now - SCRAPE_STATISTICS_WINDOW:
+            self._scrape_history.popleft()
+
+    def get_statistics(self):
+        """
+        Returns the throughput of the automatic torrent checks, measured over the last SCRAPE_STATISTICS_WINDOW
+        seconds, together with the totals since the start.
+        """
+        now = time.time()
+        while self._scrape_history and self._scrape_history[0][0] < now - SCRAPE_STATISTICS_WINDOW:
+            self._scrape_history.popleft()
+
+        window = max(min(now - self._start_time, SCRAPE_STATISTICS_WINDOW), 1)
+        num_refreshed = sum(refreshed for _, refreshed in self._scrape_history)
+
+        statistics = dict(self._scrape_statistics)
+        statistics.update({'scrapes_in_flight': self._num_scrape_sessions,
+                           'max_concurrent_scrapes': self._max_concurrent_scrapes,
+                           'scrapes_per_second': len(self._scrape_history) / window,
+                           'torrents_refreshed_per_hour': num_refreshed * 3600 / window})
+        return statistics
 
     def get_callbacks_for_session(self, session):
         success_lambda = lambda info_dict: self._on_result_from_session(session, info_dict)
         error_lambda = lambda failure: self.on_session_error(session, failure)
         return success_lambda, error_lambda
 
-    def get_valid_next_tracker_for_auto_check(self):
-        tracker_url = self.get_next_tracker_for_auto_check()
-        while tracker_url and not is_valid_url(tracker_url):
-            self.remove_tracker(tracker_url)
-            tracker_url = self.get_next_tracker_for_auto_check()
-        return tracker_url
+    def get_valid_next_trackers_for_auto_check(self, limit):
+        tracker_urls = []
+        for tracker_url in self.get_next_trackers_for_auto_check(limit):
+            if is_valid_url(tracker_url):
+                tracker_urls.append(tracker_url)
+            else:
+                self.remove_tracker(tracker_url)
+        return tracker_urls
 
-    def get_next_tracker_for_auto_check(self):
-        return self.tribler_session.lm.tracker_manager.get_next_tracker_for_auto_check()
+    def get_next_trackers_for_auto_check(self, limit):
+        return self.tribler_session.lm.tracker_manager.get_next_trackers_for_auto_check(limit)
 
     def remove_tracker(self, tracker_url):
         self.tribler_session.lm.tracker_manager.remove_tracker(tracker_url)
@@ -308,6 +434,9 @@ class TorrentChecker(TaskManager):
         self._logger.debug(u"Update result %s/%s for %s", seeders, leechers, hexlify(infohash))
 
         result = self._torrent_db.getTorrent(infohash, (u'torrent_id', u'tracker_check_retries'), include_mypref=False)
+        if result is None:
+            self._logger.debug(u"Torrent %s has been removed from the database, skip", hexlify(infohash))
+            return
         torrent_id = result[u'torrent_id']
         retries = result[u'tracker_check_retries']
 
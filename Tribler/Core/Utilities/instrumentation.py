@@ -4,6 +4,7 @@ instrumentation.
 Author(s): Elric Milon
 """
 import threading
+from collections import deque
 from decorator import decorator
 from os import sys
 from threading import Lock, RLock, Thread
@@ -11,6 +12,19 @@ from time import sleep, time
 
 MAX_SAME_STACK_TIME = 60
 
+# The interval in seconds at which the reactor lag monitor schedules a call on the reactor
+REACTOR_LAG_INTERVAL = 0.1
+# The interval in seconds at which the stack of a stalled reactor thread is sampled
+REACTOR_STALL_SAMPLE_INTERVAL = 0.05
+# The delay in seconds of a scheduled call after which the reactor is considered to be stalled
+REACTOR_STALL_THRESHOLD = 0.25
+# The upper bounds in seconds of the buckets of the lag histogram
+REACTOR_LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+REACTOR_LAG_HISTORY_SIZE = 100
+MAX_STALL_SITES = 100
+# The number of innermost frames of the reactor thread that identify the site of a stall
+STALL_SITE_DEPTH = 5
+
 
 @decorator
 def synchronized(wrapped, instance, *args, **kwargs):
@@ -195,3 +209,143 @@ class WatchDog(Thread):
                 self.stacks.pop(thread_id)
                 self.times.pop(thread_id)
                 self.print_all_stacks()
+
+
+class ReactorLagMonitor(WatchDog):
+
+    """
+    Watchdog thread that measures how late the reactor runs a call that is scheduled every interval seconds. When the
+    reactor has not run it for longer than the stall threshold, the stack of the reactor thread is sampled every sample
+    interval until it runs again. The innermost frames of the samples are aggregated per stall site, so the sites
+    where the reactor spends most of its stalled time can be found without running a profiler.
+    """
+
+    def __init__(self, interval=REACTOR_LAG_INTERVAL, stall_threshold=REACTOR_STALL_THRESHOLD,
+                 sample_interval=REACTOR_STALL_SAMPLE_INTERVAL):
+        super(ReactorLagMonitor, self).__init__()
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.sample_interval = sample_interval
+
+        self.reactor_thread_id = None
+        self.heartbeat_call = None
+        self.last_heartbeat = time()
+        self.expected_heartbeat = self.last_heartbeat
+
+        self.lag_count = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_histogram = [0] * (len(REACTOR_LAG_BUCKETS) + 1)
+        self.recent_lags = deque(maxlen=REACTOR_LAG_HISTORY_SIZE)
+
+        self.stall_count = 0
+        self.stall_samples = 0
+        self.stalled_heartbeat = None
+        self.stall_sites = {}  # Tuple of frames -> [number of samples, number of stalls, last stalled heartbeat]
+
+    def start(self, *argv, **kwargs):
+        from twisted.internet import reactor
+        self.last_heartbeat = self.expected_heartbeat = time()
+        self.heartbeat_call = reactor.callLater(0, self.heartbeat)
+        return super(ReactorLagMonitor, self).start(*argv, **kwargs)
+
+    def stop(self):
+        """
+        Stop measuring the lag. Should be called from the reactor thread.
+        """
+        self.should_stop = True
+        if self.heartbeat_call and self.heartbeat_call.active():
+            self.heartbeat_call.cancel()
+        self.heartbeat_call = None
+        if self.is_alive():
+            self.join()
+
+    def heartbeat(self):
+        from twisted.internet import reactor
+        now = time()
+        self.reactor_thread_id = threading.current_thread().ident
+        self.record_lag(max(0.0, now - self.expected_heartbeat))
+
+        self.last_heartbeat = now
+        self.expected_heartbeat = now + self.interval
+        if not self.should_stop:
+            self.heartbeat_call = reactor.callLater(self.interval, self.heartbeat)
+
+    @synchronized
+    def record_lag(self, lag):
+        self.lag_count += 1
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        self.recent_lags.append(lag)
+
+        for index, upper_bound in enumerate(REACTOR_LAG_BUCKETS):
+            if lag <= upper_bound:
+                self.lag_histogram[index] += 1
+                break
+        else:
+            self.lag_histogram[-1] += 1
+
+    def run(self):
+        while not self.should_stop:
+            sleep(self.sample_interval)
+            self.check_stall()
+
+    def check_stall(self):
+        """
+        Sample the stack of the reactor thread if the reactor is stalled.
+        """
+        last_heartbeat = self.last_heartbeat
+        if self.reactor_thread_id is None or time() - last_heartbeat - self.interval < self.stall_threshold:
+            return
+
+        frame = sys._current_frames().get(self.reactor_thread_id)
+        if frame is None:
+            return
+
+        site = []
+        while frame and len(site) < STALL_SITE_DEPTH:
+            site.append("%s:%s %s" % (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+            frame = frame.f_back
+        self.record_stall_sample(tuple(site), last_heartbeat)
+
+    @synchronized
+    def record_stall_sample(self, site, stalled_heartbeat):
+        if stalled_heartbeat != self.stalled_heartbeat:
+            self.stalled_heartbeat = stalled_heartbeat
+            self.stall_count += 1
+        self.stall_samples += 1
+
+        site_stats = self.stall_sites.get(site)
+        if site_stats is None:
+            if len(self.stall_sites) >= MAX_STALL_SITES:
+                # Make room by dropping the site with the fewest samples
+                del self.stall_sites[min(self.stall_sites, key=lambda key: self.stall_sites[key][0])]
+            site_stats = self.stall_sites[site] = [0, 0, None]
+
+        site_stats[0] += 1
+        if site_stats[2] != stalled_heartbeat:
+            site_stats[1] += 1
+            site_stats[2] = stalled_heartbeat
+
+    @synchronized
+    def get_statistics(self):
+        """
+        Return the lag of the reactor and the sites where it stalled, the site with the most samples first.
+        """
+        histogram = [{"max_lag": upper_bound, "count": count}
+                     for upper_bound, count in zip(REACTOR_LAG_BUCKETS + (None,), self.lag_histogram)]
+        stall_sites = [{"frames": list(site), "samples": samples, "stalls": stalls,
+                        "stalled_time": samples * self.sample_interval}
+                       for site, (samples, stalls, _) in self.stall_sites.iteritems()]
+        stall_sites.sort(key=lambda site_stats: site_stats["samples"], reverse=True)
+
+        return {"interval": self.interval,
+                "stall_threshold": self.stall_threshold,
+                "lag": {"count": self.lag_count,
+                        "average": self.lag_total / self.lag_count if self.lag_count else 0.0,
+                        "max": self.lag_max,
+                        "recent": list(self.recent_lags),
+                        "histogram": histogram},
+                "stalls": self.stall_count,
+                "stalled_time": self.stall_samples * self.sample_interval,
+                "stall_sites": stall_sites}
@@ -4,10 +4,18 @@ Search utilities.
 Author(s): Jelle Roozenburg, Arno Bakker
 """
 import re
+from math import log
+from struct import Struct, unpack_from
 
 RE_KEYWORD_SPLIT = re.compile(r"[\W_]", re.UNICODE)
 DIALOG_STOPWORDS = {'an', 'and', 'by', 'for', 'from', 'of', 'the', 'to', 'with'}
 
+# The relevance of a torrent is 80% dependent on matching in its name, 10% on the names of its files and 10% on the
+# extensions of its files. These are the columns of the FullTextIndex table.
+BM25_COLUMN_WEIGHTS = (0.8, 0.1, 0.1)
+
+_matchinfo_structs = {}
+
 
 def split_into_keywords(string, to_filter_stopwords=False):
     """
@@ -27,3 +35,35 @@ def split_into_keywords(string, to_filter_stopwords=False):
 
 def filter_keywords(keywords):
     return [kw for kw in keywords if len(kw) > 0 and kw not in DIALOG_STOPWORDS]
+
+
+def bm25_score(matchinfo):
+    """
+    Computes the relevance score of a FullTextIndex match, given its matchinfo(FullTextIndex, 'pcnalx') blob.
+    This function is registered as bm25_score in SQLite, so the ranking happens while the query is executed.
+
+    The algorithm is based on BM25. The document length factor is disregarded since our "documents" are very small
+    (often a few keywords). See https://en.wikipedia.org/wiki/Okapi_BM25 for more information about BM25 and
+    https://www.sqlite.org/fts3.html#matchinfo for the layout of the matchinfo blob.
+    """
+    num_phrases, num_cols, num_rows = unpack_from('III', matchinfo)
+
+    # The blob of a query always has the same layout, so we only construct its decoder once
+    key = (num_phrases, num_cols)
+    if key not in _matchinfo_structs:
+        _matchinfo_structs[key] = Struct('I' * (3 + 2 * num_cols + 3 * num_cols * num_phrases))
+    values = _matchinfo_structs[key].unpack_from(matchinfo)
+    offset = 3 + 2 * num_cols
+
+    score = 0.0
+    for col_ind, weight in enumerate(BM25_COLUMN_WEIGHTS[:num_cols]):
+        for phrase_ind in xrange(num_phrases):
+            base_term_offset = offset + 3 * (col_ind + phrase_ind * num_cols)
+            term_freq = values[base_term_offset]
+            if not term_freq:
+                continue
+            rows_with_term = values[base_term_offset + 2]
+
+            inv_doc_freq = log((num_rows - rows_with_term + 0.5) / (rows_with_term + 0.5), 2)
+            score += weight * inv_doc_freq * ((term_freq * (1.2 + 1)) / (term_freq + 1.2))
+    return score
@@ -0,0 +1,239 @@
+"""
+In-memory index over the terms of torrent names, used for search suggestions and autocompletion.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from heapq import nsmallest
+
+# The maximum number of distinct terms kept in memory. Terms seen after this limit has been reached are ignored.
+DEFAULT_MAX_TERMS = 250000
+
+# The number of terms sharing the most trigrams with a keyword, for which the edit distance is computed
+DEFAULT_MAX_CANDIDATES = 100
+
+# The number of most common completions kept for prefixes of at most SHORT_PREFIX_LENGTH characters
+DEFAULT_MAX_COMPLETIONS = 20
+SHORT_PREFIX_LENGTH = 2
+
+
+def levenshtein_distance(a, b, max_distance=None):
+    """
+    Calculates the Levenshtein distance between a and b, using O(min(n, m)) space.
+    If max_distance is given, the computation stops as soon as the distance is known to exceed it, in which case
+    max_distance + 1 is returned.
+    """
+    n, m = len(a), len(b)
+    if n > m:
+        a, b = b, a
+        n, m = m, n
+
+    if max_distance is not None and m - n > max_distance:
+        return max_distance + 1
+
+    current = range(n + 1)
+    for i in xrange(1, m + 1):
+        previous, current = current, [i] + [0] * n
+        for j in xrange(1, n + 1):
+            change = previous[j - 1] if a[j - 1] == b[i - 1] else previous[j - 1] + 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, change)
+
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+
+    return current[n]
+
+
+def rank_by_distance(rows, keywords, limit):
+    """
+    Ranks (rowid, name) rows by the summed edit distance between the keywords and their closest terms in the name.
+    Rows with the same distance keep the order of their rowid.
+    :return: the names of the best limit rows.
+    """
+    # Distances are only computed up to the score of the worst row ranked so far, which never increases.
+    # A distance that has been cut off therefore stays larger than the score of any row that can still be ranked.
+    distances = {}
+    ranked = []
+
+    def distance(term, keyword, max_distance):
+        if (term, keyword) not in distances:
+            distances[(term, keyword)] = levenshtein_distance(term, keyword, max_distance)
+        return distances[(term, keyword)]
+
+    for rowid, name in rows:
+        max_score = ranked[-1][0] if len(ranked) == limit else None
+        score = sum(sorted(distance(term, keyword, max_score)
+                           for term in name.split() for keyword in keywords)[:len(keywords)])
+        if max_score is None or (score, rowid) < ranked[-1][:2]:
+            insort(ranked, (score, rowid, name))
+            del ranked[limit:]
+
+    return [name for _, _, name in ranked]
+
+
+def trigrams(term):
+    """
+    Returns the set of trigrams of a term, padded so that the start and end of the term count as well.
+    """
+    padded = u"  %s " % term
+    return {padded[i:i + 3] for i in xrange(len(padded) - 2)}
+
+
+class TermIndex(object):
+    """
+    Index over the terms in the names of the torrents in the database, weighted by the number of names they occur in.
+
+    It is used to find the terms that are closest to a (possibly misspelled) keyword, through an index of their
+    trigrams, and the most common completions of a prefix, through a sorted array of the terms. The cost of both does
+    not depend on the number of torrents. The most common completions of very short prefixes, which match a large
+    part of the vocabulary, are kept up to date incrementally.
+    """
+
+    def __init__(self, max_terms=DEFAULT_MAX_TERMS, max_candidates=DEFAULT_MAX_CANDIDATES,
+                 max_completions=DEFAULT_MAX_COMPLETIONS):
+        self.max_terms = max_terms
+        self.max_candidates = max_candidates
+        self.max_completions = max_completions
+
+        # The number of torrent names every term occurs in
+        self.term_counts = {}
+        self._trigram_terms = defaultdict(set)
+        self._sorted_terms = []
+        # New terms are sorted into _sorted_terms when it is used, so that adding a term is O(1)
+        self._new_terms = []
+        # Sorted (-count, term) tuples of the most common completions of the prefixes up to SHORT_PREFIX_LENGTH
+        self._short_prefix_completions = {}
+
+    def __len__(self):
+        return len(self.term_counts)
+
+    def __contains__(self, term):
+        return term in self.term_counts
+
+    def add(self, terms):
+        """
+        Add the (unique) terms of a torrent name to the index.
+        """
+        for term in terms:
+            count = self.term_counts.get(term)
+            if count is None:
+                if len(self.term_counts) >= self.max_terms:
+                    continue
+                count = 0
+                self._new_terms.append(term)
+                for trigram in trigrams(term):
+                    self._trigram_terms[trigram].add(term)
+
+            self.term_counts[term] = count + 1
+            self._update_short_prefix_completions(term, count, count + 1)
+
+    def remove(self, terms):
+        """
+        Remove the (unique) terms of a torrent name that has been added before.
+        """
+        for term in terms:
+            count = self.term_counts.get(term)
+            if count is None:
+                continue
+
+            self._update_short_prefix_completions(term, count, count - 1)
+            if count > 1:
+                self.term_counts[term] = count - 1
+                continue
+
+            del self.term_counts[term]
+            sorted_terms = self.get_sorted_terms()
+            del sorted_terms[bisect_left(sorted_terms, term)]
+            for trigram in trigrams(term):
+                trigram_terms = self._trigram_terms[trigram]
+                trigram_terms.discard(term)
+                if not trigram_terms:
+                    del self._trigram_terms[trigram]
+
+    def clear(self):
+        self.term_counts.clear()
+        self._trigram_terms.clear()
+        self._sorted_terms = []
+        self._new_terms = []
+        self._short_prefix_completions.clear()
+
+    def get_sorted_terms(self):
+        """
+        Returns all terms in sorted order, after sorting in the terms that have been added since the last call.
+        """
+        if self._new_terms:
+            # Sorting a sorted list with a run of new terms appended to it only takes a merge
+            self._new_terms.sort()
+            self._sorted_terms.extend(self._new_terms)
+            self._sorted_terms.sort()
+            self._new_terms = []
+        return self._sorted_terms
+
+    def _update_short_prefix_completions(self, term, old_count, new_count):
+        for length in xrange(1, min(SHORT_PREFIX_LENGTH, len(term)) + 1):
+            prefix = term[:length]
+            completions = self._short_prefix_completions.get(prefix)
+            if completions is None:
+                continue
+
+            index = bisect_left(completions, (-old_count, term))
+            if index < len(completions) and completions[index] == (-old_count, term):
+                if new_count < old_count and len(completions) >= self.max_completions:
+                    # A term that is not among the cached completions might now have to take its place
+                    del self._short_prefix_completions[prefix]
+                    continue
+                del completions[index]
+            elif new_count < old_count:
+                continue
+
+            if new_count > 0:
+                insort(completions, (-new_count, term))
+                del completions[self.max_completions:]
+
+    def _prefix_completions(self, prefix, limit):
+        sorted_terms = self.get_sorted_terms()
+        end = start = bisect_left(sorted_terms, prefix)
+        while end < len(sorted_terms) and sorted_terms[end].startswith(prefix):
+            end += 1
+        return nsmallest(limit, ((-self.term_counts[term], term) for term in sorted_terms[start:end]))
+
+    def complete(self, prefix, limit=5):
+        """
+        Returns up to limit terms starting with prefix, the terms occurring in most torrent names first.
+        """
+        if not prefix:
+            return []
+
+        if len(prefix) <= SHORT_PREFIX_LENGTH and limit <= self.max_completions:
+            completions = self._short_prefix_completions.get(prefix)
+            if completions is None:
+                completions = self._prefix_completions(prefix, self.max_completions)
+                self._short_prefix_completions[prefix] = completions
+        else:
+            completions = self._prefix_completions(prefix, limit)
+
+        return [term for _, term in completions[:limit]]
+
+    def lookup(self, keyword, limit=5, max_distance=None):
+        """
+        Returns up to limit terms that are closest to keyword, ordered by edit distance and then by how many
+        torrent names contain them.
+        """
+        shared_trigrams = defaultdict(int)
+        for trigram in trigrams(keyword):
+            for term in self._trigram_terms.get(trigram, ()):
+                shared_trigrams[term] += 1
+
+        candidates = nsmallest(self.max_candidates, shared_trigrams.iterkeys(),
+                               key=lambda term: (-shared_trigrams[term], -self.term_counts[term]))
+
+        ranked = []
+        for term in candidates:
+            bound = ranked[-1][0] if len(ranked) == limit else None
+            if max_distance is not None and (bound is None or max_distance < bound):
+                bound = max_distance
+
+            distance = levenshtein_distance(keyword, term, bound)
+            if bound is None or distance <= bound:
+                insort(ranked, (distance, -self.term_counts[term], term))
+                del ranked[limit:]
+        return [term for _, _, term in ranked]
@@ -0,0 +1,3 @@
+"""
+This package contains benchmarks for performance-sensitive parts of Tribler. They are not run as part of the tests.
+"""
@@ -0,0 +1,108 @@
+"""
+Benchmark of the MatchingEngine, replaying a synthetic stream of ticks through the order book. Compares the linked
+price levels with the sorted list of prices that was used before.
+
+Usage: python -m Tribler.Test.Benchmarks.bench_matching_engine [number of ticks]
+"""
+import random
+import sys
+from time import time
+
+from Tribler.community.market.core import side
+from Tribler.community.market.core.assetamount import AssetAmount
+from Tribler.community.market.core.assetpair import AssetPair
+from Tribler.community.market.core.matching_engine import MatchingEngine, PriceTimeStrategy
+from Tribler.community.market.core.message import TraderId
+from Tribler.community.market.core.order import OrderId, OrderNumber
+from Tribler.community.market.core.orderbook import OrderBook
+from Tribler.community.market.core.pricelevel_list import PriceLevelList
+from Tribler.community.market.core.tick import Ask, Bid
+from Tribler.community.market.core.timeout import Timeout
+from Tribler.community.market.core.timestamp import Timestamp
+
+NUM_TICKS = 100000
+NUM_TRADERS = 100
+# The number of distinct prices is bounded by the range of the amounts
+MIN_AMOUNT = 1000
+MAX_AMOUNT = 20000
+QUANTITY = 10000
+
+
+class LegacyPriceLevelList(PriceLevelList):
+    """
+    The implementation of PriceLevelList before the prices were linked, which sorts the prices on every insert and
+    searches the price for every step to a neighbouring price level.
+    """
+
+    def __init__(self):
+        super(LegacyPriceLevelList, self).__init__()
+        self._price_list = []
+
+    def insert(self, price_level):
+        self._price_list.append(price_level.price)
+        self._price_list.sort()
+        self._price_level_dictionary[price_level.price] = price_level
+
+    def remove(self, price):
+        self._price_list.remove(price)
+        del self._price_level_dictionary[price]
+
+    def succ_item(self, price):
+        index = self._price_list.index(price) + 1
+        if index >= len(self._price_list):
+            raise IndexError
+        return self._price_level_dictionary[self._price_list[index]]
+
+    def prev_item(self, price):
+        index = self._price_list.index(price) - 1
+        if index < 0:
+            raise IndexError
+        return self._price_level_dictionary[self._price_list[index]]
+
+
+def create_ticks(num_ticks):
+    rand = random.Random(42)
+    ticks = []
+    for order_number in xrange(num_ticks):
+        order_id = OrderId(TraderId(str(rand.randrange(NUM_TRADERS))), OrderNumber(order_number))
+        assets = AssetPair(AssetAmount(QUANTITY, 'BTC'), AssetAmount(rand.randint(MIN_AMOUNT, MAX_AMOUNT), 'MB'))
+        tick_class = Ask if rand.random() < 0.5 else Bid
+        ticks.append(tick_class(order_id, assets, Timeout(3600), Timestamp.now()))
+    return ticks
+
+
+def replay(ticks):
+    """
+    Insert every tick in the order book and match it, like the market community does for incoming ticks.
+    :return: the number of matches
+    """
+    order_book = OrderBook()
+    matching_engine = MatchingEngine(PriceTimeStrategy(order_book))
+    num_matches = 0
+    for tick in ticks:
+        if tick.is_ask():
+            order_book.insert_ask(tick)
+            tick_entry = order_book.get_ask(tick.order_id)
+        else:
+            order_book.insert_bid(tick)
+            tick_entry = order_book.get_bid(tick.order_id)
+        num_matches += len(matching_engine.match(tick_entry))
+    order_book.shutdown_task_manager()
+    return num_matches
+
+
+def main(num_ticks):
+    ticks = create_ticks(num_ticks)
+
+    for label, price_level_list_class in ((u"legacy", LegacyPriceLevelList), (u"linked", PriceLevelList)):
+        side.PriceLevelList = price_level_list_class
+        start = time()
+        num_matches = replay(ticks)
+        duration = time() - start
+        print "%-8s %10.0f ticks/s %10.0f matches/s (%d matches)" % (label, num_ticks / duration,
+                                                                     num_matches / duration, num_matches)
+    side.PriceLevelList = PriceLevelList
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NUM_TICKS)
@@ -0,0 +1,118 @@
+"""
+Benchmark of the search suggestions of the TorrentDBHandler, comparing the trigram suggestion index with the
+Levenshtein collation that was used before.
+
+Usage: python -m Tribler.Test.Benchmarks.bench_search_suggestions [number of torrents]
+"""
+import random
+import string
+import sys
+from time import time
+
+import apsw
+
+from Tribler.Core.Utilities.term_index import TermIndex, levenshtein_distance, rank_by_distance
+
+NUM_TORRENTS = 100000
+NUM_WORDS = 20000
+NUM_QUERIES = 20
+LIMIT = 1
+
+
+def create_corpus(num_torrents, num_words):
+    rand = random.Random(42)
+    words = [u"".join(rand.choice(string.ascii_lowercase) for _ in xrange(rand.randint(4, 10)))
+             for _ in xrange(num_words)]
+    # Torrent names have a Zipf-like distribution of words
+    weights = [1.0 / (rank + 1) for rank in xrange(num_words)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    def pick_word():
+        target = rand.random() * total
+        low, high = 0, num_words - 1
+        while low < high:
+            middle = (low + high) // 2
+            if cumulative[middle] < target:
+                low = middle + 1
+            else:
+                high = middle
+        return words[low]
+
+    names = [u" ".join(pick_word() for _ in xrange(rand.randint(2, 6))) for _ in xrange(num_torrents)]
+    queries = []
+    for index, word in enumerate(rand.sample(words[:1000], NUM_QUERIES)):
+        if index % 2:
+            # A word the user is still typing
+            queries.append([word[:4]])
+        else:
+            # A misspelled word
+            position = rand.randint(0, len(word) - 1)
+            queries.append([word[:position] + rand.choice(string.ascii_lowercase) + word[position + 1:]])
+    return names, queries
+
+
+def collation_suggestion(cursor, keywords, limit):
+    """
+    The implementation of TorrentDBHandler.getSearchSuggestion before the suggestion index was introduced.
+    """
+    match = [keyword.lower() for keyword in keywords if len(keyword) > 3]
+
+    def levcollate(s1, s2):
+        l1 = sum(sorted([levenshtein_distance(a, b) for a in s1.split() for b in match])[:len(match)])
+        l2 = sum(sorted([levenshtein_distance(a, b) for a in s2.split() for b in match])[:len(match)])
+        return cmp(l1, l2)
+
+    connection = cursor.getconnection()
+    connection.createcollation("leven", levcollate)
+    sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? ORDER By swarmname collate leven ASC LIMIT ?"
+    results = list(cursor.execute(sql, (' OR '.join(['*%s*' % m for m in match]), limit)))
+    connection.createcollation("leven", None)
+    return [result[0] for result in results]
+
+
+def index_suggestion(cursor, index, keywords, limit):
+    """
+    The implementation of TorrentDBHandler.getSearchSuggestion using the suggestion index.
+    """
+    match = [keyword.lower() for keyword in keywords if len(keyword) > 3]
+    terms = set()
+    for keyword in match:
+        terms.update(index.lookup(keyword, limit=5))
+    if not terms:
+        return []
+
+    sql = u"SELECT rowid, swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
+    results = list(cursor.execute(sql, (u' OR '.join(u'"%s"' % term for term in terms), 200)))
+    return rank_by_distance(results, match, limit)
+
+
+def main(num_torrents):
+    names, queries = create_corpus(num_torrents, NUM_WORDS)
+
+    connection = apsw.Connection(u":memory:")
+    cursor = connection.cursor()
+    cursor.execute(u"CREATE VIRTUAL TABLE FullTextIndex USING fts4(swarmname, filenames, fileextensions)")
+    cursor.execute(u"BEGIN")
+    cursor.executemany(u"INSERT INTO FullTextIndex (rowid, swarmname) VALUES (?, ?)", enumerate(names, 1))
+    cursor.execute(u"COMMIT")
+
+    start = time()
+    index = TermIndex()
+    for name in names:
+        index.add(set(name.split()))
+    print "Built suggestion index of %d terms over %d torrents in %.2f s" % (len(index), num_torrents, time() - start)
+
+    for label, suggest in ((u"collation", lambda keywords: collation_suggestion(cursor, keywords, LIMIT)),
+                           (u"index", lambda keywords: index_suggestion(cursor, index, keywords, LIMIT))):
+        start = time()
+        answered = sum(1 for keywords in queries if suggest(keywords))
+        print "%-10s %8.2f ms per query, %d of %d queries answered" % \
+              (label, (time() - start) * 1000 / len(queries), answered, len(queries))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NUM_TORRENTS)
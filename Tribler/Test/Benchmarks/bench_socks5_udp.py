@@ -0,0 +1,110 @@
+"""
+Benchmark of the throughput of the SOCKS5 UDP path used by anonymous downloads, from the local SOCKS5 servers to the
+tunnels and back. Compares the cached header encoding and batched dispatching with the previous implementation, which
+packed every header and dispatched every datagram separately.
+
+Usage: python -m Tribler.Test.Benchmarks.bench_socks5_udp [number of peers]
+"""
+import socket
+import struct
+import sys
+from time import time
+
+from Tribler.Core.Socks5 import conversion
+from Tribler.Core.Socks5.udp_connection import MAX_BATCH_SIZE
+from Tribler.community.triblertunnel.dispatcher import TunnelDispatcher
+from Tribler.pyipv8.ipv8.messaging.anonymization.tunnel import CIRCUIT_STATE_READY, CIRCUIT_TYPE_DATA
+
+NUM_PEERS = 200
+NUM_CIRCUITS = 4
+NUM_PACKETS = 200000
+# Libtorrent sends uTP packets of up to 1400 bytes
+PAYLOAD = 'x' * 1400
+# The number of datagrams received in a single reactor iteration
+BURST_SIZE = 64
+
+
+class FakeObject(object):
+    pass
+
+
+def legacy_encode_udp_packet(rsv, frag, address_type, address, port, payload):
+    return ''.join([struct.pack("!HBB", rsv, frag, address_type), socket.inet_aton(address), struct.pack("!H", port),
+                    payload])
+
+
+def legacy_decode_udp_packet(data):
+    rsv, frag, address_type = struct.unpack_from("!HBB", data, 0)
+    address = socket.inet_ntoa(data[4:8])
+    port, = struct.unpack_from("!H", data, 8)
+    return conversion.UdpRequest(rsv, frag, address_type, address, port, data[10:])
+
+
+def create_dispatcher():
+    circuits = []
+    for circuit_id in xrange(NUM_CIRCUITS):
+        circuit = FakeObject()
+        circuit.circuit_id = circuit_id
+        circuit.goal_hops = 1
+        circuit.ctype = CIRCUIT_TYPE_DATA
+        circuit.state = CIRCUIT_STATE_READY
+        circuit.peer = FakeObject()
+        circuit.peer.address = ("1.1.1.1", 1024 + circuit_id)
+        circuits.append(circuit)
+
+    community = FakeObject()
+    community.selection_strategy = FakeObject()
+    community.selection_strategy.select = lambda destination, _: circuits[hash(destination) % NUM_CIRCUITS]
+    community.send_data = lambda *_: None
+
+    udp_socket = FakeObject()
+    udp_socket.sendDatagram = lambda _: True
+    socks_connection = FakeObject()
+    socks_connection._udp_socket = udp_socket
+    socks_server = FakeObject()
+    socks_server.sessions = [socks_connection]
+    socks_connection.socksserver = socks_server
+    udp_connection = FakeObject()
+    udp_connection.socksconnection = socks_connection
+
+    dispatcher = TunnelDispatcher(community)
+    dispatcher.set_socks_servers([socks_server])
+    return dispatcher, udp_connection
+
+
+def report(label, direction, num_packets, duration):
+    print "%-8s %-8s %10.0f packets/s %8.1f MB/s" % (label, direction, num_packets / duration,
+                                                       num_packets * len(PAYLOAD) / duration / 1024 ** 2)
+
+
+def main(num_peers):
+    peers = [("10.0.%d.%d" % (i >> 8 & 255, i & 255), 6881) for i in xrange(num_peers)]
+    datagrams = [conversion.encode_udp_packet(0, 0, conversion.ADDRESS_TYPE_IPV4, peer[0], peer[1], PAYLOAD)
+                 for peer in peers]
+
+    # Outgoing: datagrams from libtorrent are decoded and sent over the circuits
+    dispatcher, udp_connection = create_dispatcher()
+    start = time()
+    for i in xrange(NUM_PACKETS):
+        dispatcher.on_socks5_udp_data(udp_connection, legacy_decode_udp_packet(datagrams[i % num_peers]))
+    report(u"legacy", u"outgoing", NUM_PACKETS, time() - start)
+
+    dispatcher, udp_connection = create_dispatcher()
+    batch_size = min(BURST_SIZE, MAX_BATCH_SIZE)
+    start = time()
+    for offset in xrange(0, NUM_PACKETS, batch_size):
+        dispatcher.on_socks5_udp_batch(udp_connection, [conversion.decode_udp_packet(datagrams[i % num_peers])
+                                                        for i in xrange(offset, offset + batch_size)])
+    report(u"batched", u"outgoing", NUM_PACKETS, time() - start)
+
+    # Incoming: data from the circuits is encoded and sent to libtorrent
+    for label, encode in ((u"legacy", legacy_encode_udp_packet), (u"cached", conversion.encode_udp_packet)):
+        start = time()
+        for i in xrange(NUM_PACKETS):
+            peer = peers[i % num_peers]
+            encode(0, 0, conversion.ADDRESS_TYPE_IPV4, peer[0], peer[1], PAYLOAD)
+        report(label, u"incoming", NUM_PACKETS, time() - start)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NUM_PEERS)
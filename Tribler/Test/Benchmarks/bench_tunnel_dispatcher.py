@@ -0,0 +1,114 @@
+"""
+Benchmark of the number of packets per second the TunnelDispatcher can handle, comparing the circuit index with the
+linear scan over the destinations that was used before.
+
+Usage: python -m Tribler.Test.Benchmarks.bench_tunnel_dispatcher [number of destinations]
+"""
+import sys
+from time import time
+
+from Tribler.Core.Socks5 import conversion
+from Tribler.community.triblertunnel.dispatcher import TunnelDispatcher
+from Tribler.pyipv8.ipv8.messaging.anonymization.tunnel import CIRCUIT_STATE_READY, CIRCUIT_TYPE_DATA
+
+NUM_DESTINATIONS = 10000
+NUM_CIRCUITS = 50
+NUM_PACKETS = 100000
+PAYLOAD = 'x' * 1024
+
+
+class FakeObject(object):
+    pass
+
+
+class LinearTunnelDispatcher(TunnelDispatcher):
+    """
+    The implementation of TunnelDispatcher.on_incoming_from_tunnel before the circuit index was introduced.
+    """
+
+    def on_incoming_from_tunnel(self, community, circuit, origin, data, force=False):
+        session_hops = circuit.goal_hops
+        sock_server = self.socks_servers[session_hops - 1]
+
+        destinations = self.destinations[session_hops]
+        if circuit in destinations.values() or force:
+            destinations[origin] = circuit
+
+            sessions = [self.circuit_id_to_connection[circuit.circuit_id]] \
+                if circuit.circuit_id in self.circuit_id_to_connection else sock_server.sessions
+
+            for session in sessions:
+                if session._udp_socket:
+                    socks5_data = conversion.encode_udp_packet(
+                        0, 0, conversion.ADDRESS_TYPE_IPV4, origin[0], origin[1], data)
+                    return session._udp_socket.sendDatagram(socks5_data)
+
+        return False
+
+
+def create_dispatcher(dispatcher_class, circuits, destinations):
+    community = FakeObject()
+    community.selection_strategy = FakeObject()
+    community.selection_strategy.select = lambda destination, _: circuits[hash(destination) % len(circuits)]
+    community.send_data = lambda *_: None
+
+    udp_socket = FakeObject()
+    udp_socket.sendDatagram = lambda _: True
+    session = FakeObject()
+    session._udp_socket = udp_socket
+    socks_server = FakeObject()
+    socks_server.sessions = [session]
+
+    dispatcher = dispatcher_class(community)
+    dispatcher.set_socks_servers([socks_server])
+
+    # Every destination is associated with a circuit through outgoing data
+    connection = FakeObject()
+    connection.socksconnection = FakeObject()
+    connection.socksconnection.socksserver = socks_server
+    for destination in destinations:
+        request = FakeObject()
+        request.destination = destination
+        request.payload = PAYLOAD
+        dispatcher.on_socks5_udp_data(connection, request)
+    return dispatcher, connection
+
+
+def main(num_destinations):
+    circuits = []
+    for circuit_id in xrange(NUM_CIRCUITS):
+        circuit = FakeObject()
+        circuit.circuit_id = circuit_id
+        circuit.goal_hops = 1
+        circuit.ctype = CIRCUIT_TYPE_DATA
+        circuit.state = CIRCUIT_STATE_READY
+        circuit.peer = FakeObject()
+        circuit.peer.address = ("1.1.1.1", 1024 + circuit_id)
+        circuits.append(circuit)
+    destinations = [("10.%d.%d.%d" % (i >> 16 & 255, i >> 8 & 255, i & 255), 6881) for i in xrange(num_destinations)]
+
+    for label, dispatcher_class in ((u"linear", LinearTunnelDispatcher), (u"index", TunnelDispatcher)):
+        dispatcher, connection = create_dispatcher(dispatcher_class, circuits, destinations)
+        # The linear scan is too slow to send as many packets through
+        num_packets = NUM_PACKETS if dispatcher_class is TunnelDispatcher else NUM_PACKETS // 100
+
+        start = time()
+        for i in xrange(num_packets):
+            destination = destinations[i % num_destinations]
+            dispatcher.on_incoming_from_tunnel(None, dispatcher.destinations[1][destination], destination, PAYLOAD)
+        incoming_rate = num_packets / (time() - start)
+
+        request = FakeObject()
+        request.payload = PAYLOAD
+        start = time()
+        for i in xrange(num_packets):
+            request.destination = destinations[i % num_destinations]
+            dispatcher.on_socks5_udp_data(connection, request)
+        outgoing_rate = num_packets / (time() - start)
+
+        print "%-8s %10.0f incoming packets/s %10.0f outgoing packets/s (%d destinations)" % \
+              (label, incoming_rate, outgoing_rate, num_destinations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NUM_DESTINATIONS)
@@ -1,6 +1,7 @@
 from Tribler.Test.Community.Market.Reputation.test_reputation_base import TestReputationBase
 from Tribler.community.market.core.assetamount import AssetAmount
 from Tribler.community.market.core.assetpair import AssetPair
+from Tribler.community.market.reputation.temporal_pagerank_manager import TemporalPagerankReputationManager
 
 
 class TestReputationPagerank(TestReputationBase):
@@ -63,3 +64,18 @@ class TestReputationPagerank(TestReputationBase):
         rep_dict = self.compute_reputations()
         self.assertTrue('c' in rep_dict)
         self.assertTrue('d' in rep_dict)
+
+    def test_pagerank_incremental(self):
+        """
+        Test whether only new interactions are added to an existing Temporal Pagerank computation
+        """
+        self.insert_transaction('a', 'b', AssetPair(AssetAmount(1, 'BTC'), AssetAmount(1, 'MB')))
+        rep_manager = TemporalPagerankReputationManager(self.market_db.get_all_blocks())
+        self.assertIn('b', rep_manager.compute(own_public_key='a'))
+        self.assertEqual(rep_manager.add_blocks(self.market_db.get_all_blocks()), 0)
+
+        self.insert_transaction('a', 'c', AssetPair(AssetAmount(2, 'BTC'), AssetAmount(2, 'MB')))
+        self.assertEqual(rep_manager.add_blocks(self.market_db.get_all_blocks()), 1)
+        rep_dict = rep_manager.compute(own_public_key='a')
+        for public_key, rep in self.compute_reputations().iteritems():
+            self.assertAlmostEqual(rep_dict[public_key], rep, places=4)
@@ -1,7 +1,7 @@
 from Tribler.Core.Modules.wallet.dummy_wallet import DummyWallet1, DummyWallet2
 from Tribler.Core.Modules.wallet.tc_wallet import TrustchainWallet
 from Tribler.community.market.block import MarketBlock
-from Tribler.community.market.community import MarketCommunity, PingRequestCache
+from Tribler.community.market.community import MarketCommunity, PingRequestCache, MAX_SYNC_OFFSETS
 from Tribler.community.market.core.assetamount import AssetAmount
 from Tribler.community.market.core.assetpair import AssetPair
 from Tribler.community.market.core.message import TraderId
@@ -10,6 +10,7 @@ from Tribler.community.market.core.tick import Ask, Bid
 from Tribler.community.market.core.timeout import Timeout
 from Tribler.community.market.core.timestamp import Timestamp
 from Tribler.community.market.core.transaction import TransactionId, TransactionNumber, Transaction
+from Tribler.Test.Core.base_test import MockObject
 from Tribler.pyipv8.ipv8.test.base import TestBase
 from Tribler.pyipv8.ipv8.test.mocking.ipv8 import MockIPv8
 from Tribler.Test.tools import trial_timeout
@@ -503,6 +504,51 @@ class TestMarketCommunitySingle(TestMarketCommunityBase):
         self.assertEqual(len(self.nodes[0].overlay.order_book.asks), 1)
         self.assertEqual(len(self.nodes[0].overlay.order_book.bids), 1)
 
+    def test_orderbook_sync_pages(self):
+        """
+        Test whether the pages of an order book synchronization advance when the peer never accepts the orders
+        """
+        sent_blocks = []
+        overlay = self.nodes[0].overlay
+        entry = MockObject()
+        entry.tick = MockObject()
+
+        def get_ask(order_id):
+            entry.tick.block_hash = order_id
+            return entry
+
+        overlay.order_book.get_order_ids = lambda: range(120)
+        overlay.order_book.ask_exists = lambda _: True
+        overlay.order_book.get_ask = get_ask
+        overlay.trustchain.persistence.get_block_with_hash = lambda block_hash: block_hash + 1
+        overlay.trustchain.persistence.get_linked = lambda block: block
+        overlay.trustchain.send_block_pair = lambda block, _, address: sent_blocks.append(block - 1)
+
+        peer = self.nodes[0].my_peer
+        for _ in xrange(3):
+            overlay.send_orderbook_page(peer, set())
+
+        self.assertEqual(sent_blocks, range(120) + range(30))
+
+    def test_orderbook_sync_offsets_bounded(self):
+        """
+        Test whether only the synchronization offsets of the most recently synchronized peers are kept
+        """
+        overlay = self.nodes[0].overlay
+        overlay.order_book.get_order_ids = lambda: range(10)
+        bloomfilter = {str(order_id) for order_id in range(10)}
+
+        peers = []
+        for mid in xrange(MAX_SYNC_OFFSETS + 1):
+            peer = MockObject()
+            peer.mid = mid
+            peers.append(peer)
+            overlay.send_orderbook_page(peer, bloomfilter)
+
+        self.assertEqual(len(overlay.sync_offsets), MAX_SYNC_OFFSETS)
+        self.assertNotIn(0, overlay.sync_offsets)
+        self.assertIn(MAX_SYNC_OFFSETS, overlay.sync_offsets)
+
     def test_tx_done_block_new(self):
         """
         Test whether receiving a tx_done block, update the entries in the order book correctly
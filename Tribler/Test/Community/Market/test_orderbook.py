@@ -117,6 +117,29 @@ class TestOrderBook(AbstractTestOrderBook):
         self.order_book.remove_bid(self.bid2.order_id)
         self.assertFalse(self.order_book.tick_exists(self.bid2.order_id))
 
+    def test_bloom_filter(self):
+        """
+        Test whether the bloom filter with the order ids is updated when ticks are inserted
+        """
+        self.order_book.insert_ask(self.ask)
+        bloom_filter = self.order_book.get_bloom_filter()
+        self.assertIn(str(self.ask.order_id), bloom_filter)
+        self.assertNotIn(str(self.bid.order_id), bloom_filter)
+
+        self.order_book.insert_bid(self.bid)
+        self.assertIs(bloom_filter, self.order_book.get_bloom_filter())
+        self.assertIn(str(self.bid.order_id), bloom_filter)
+
+    def test_bloom_filter_full(self):
+        """
+        Test whether the bloom filter is created again when it is full
+        """
+        bloom_filter = self.order_book.get_bloom_filter()
+        self.order_book._bloom_filter_keys = self.order_book._bloom_filter_capacity
+        self.order_book.insert_bid(self.bid)
+        self.assertIsNot(bloom_filter, self.order_book.get_bloom_filter())
+        self.assertIn(str(self.bid.order_id), self.order_book.get_bloom_filter())
+
     def test_properties(self):
         # Test for properties
         self.order_book.insert_ask(self.ask2)
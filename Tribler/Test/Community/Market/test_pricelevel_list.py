@@ -100,3 +100,14 @@ class PriceLevelListTestSuite(unittest.TestCase):
     def test_items_reverse_empty(self):
         # Test for items when empty with reverse attribute
         self.assertEquals([], self.price_level_list2.items(reverse=True))
+
+    def test_len(self):
+        # Test for the number of price levels
+        self.assertEquals(4, len(self.price_level_list))
+        self.assertEquals(0, len(self.price_level_list2))
+
+    def test_neighbours_after_remove(self):
+        # Test for succ and prev item after removing a price level in the middle
+        self.price_level_list.remove(self.price2)
+        self.assertEquals(self.price_level3, self.price_level_list.succ_item(self.price))
+        self.assertEquals(self.price_level, self.price_level_list.prev_item(self.price3))
@@ -56,10 +56,74 @@ class TestSearchCommunity(AbstractTestCommunity):
         self.search_community._create_search_response = create_search_response
         self.search_community.log_incoming_searches = log_incoming_searches
         self.search_community.on_search([fake_message])
+        self.search_community.process_pending_search()
 
         self.assertTrue(log_incoming_searches.called)
         self.assertTrue(create_search_response.called)
 
+    def create_search_message(self, keywords, sock_addr="1234"):
+        message = MockObject()
+        message.candidate = MockObject()
+        message.candidate.sock_addr = sock_addr
+        message.payload = MockObject()
+        message.payload.keywords = keywords
+        message.payload.identifier = "abc"
+        return message
+
+    def mock_search(self):
+        searches = []
+        responses = []
+
+        def search_names(keywords, local=False, keys=None):
+            searches.append(keywords)
+            return []
+
+        self.search_community._torrent_db = MockObject()
+        self.search_community._torrent_db.searchNames = search_names
+        self.search_community._create_search_response = lambda *args: responses.append(args)
+        return searches, responses
+
+    def test_on_search_cached(self):
+        """
+        Test whether search requests for the same keywords are answered from the cache
+        """
+        searches, responses = self.mock_search()
+        self.search_community.on_search([self.create_search_message([u"ubuntu", u"linux"])])
+        self.search_community.process_pending_search()
+        self.search_community.on_search([self.create_search_message([u"Linux", u"ubuntu"], sock_addr="5678")])
+
+        self.assertEqual(len(searches), 1)
+        self.assertEqual(len(responses), 2)
+        statistics = self.search_community.get_search_statistics()
+        self.assertEqual(statistics["served"], 1)
+        self.assertEqual(statistics["cached"], 1)
+
+    def test_on_search_candidate_rate_limit(self):
+        """
+        Test whether search requests are dropped when a candidate searches too often
+        """
+        _, responses = self.mock_search()
+        self.search_community.on_search([self.create_search_message([u"test%d" % i]) for i in xrange(10)])
+        while self.search_community.pending_searches:
+            self.search_community.process_pending_search()
+
+        self.assertEqual(len(responses), 5)
+        self.assertEqual(self.search_community.get_search_statistics()["dropped_rate_limit"], 5)
+
+    def test_on_search_queue_full(self):
+        """
+        Test whether search requests are dropped when too many requests are waiting
+        """
+        self.mock_search()
+        self.search_community.global_search_rate_limiter.burst = 1000
+        self.search_community.global_search_rate_limiter.tokens = 1000
+        self.search_community.on_search([self.create_search_message([u"test%d" % i], sock_addr=str(i))
+                                         for i in xrange(60)])
+
+        statistics = self.search_community.get_search_statistics()
+        self.assertEqual(statistics["pending"], 50)
+        self.assertEqual(statistics["dropped_queue_full"], 10)
+
     @raises(DropPacket)
     def test_decode_response_invalid(self):
         """
@@ -117,9 +117,27 @@ class TestTriblerTunnelCommunity(TestBase):
         self.nodes[0].overlay.num_hops_by_downloads[1] = 1
         mock_download = MockObject()
         mock_download.get_hops = lambda: 1
+        mock_download.get_def = lambda: mock_download
+        mock_download.get_infohash = lambda: 'a' * 20
+        self.nodes[0].overlay.on_download_added(mock_download)
         self.nodes[0].overlay.on_download_removed(mock_download)
 
         self.assertEqual(self.nodes[0].overlay.num_hops_by_downloads[1], 0)
+        self.assertFalse(self.nodes[0].overlay.lookup_downloads)
+
+    def test_get_download(self):
+        """
+        Test whether a download is found by the infohash used for looking up its introduction points
+        """
+        self.nodes[0].overlay.tribler_session = MockObject()
+        mock_download = MockObject()
+        mock_download.get_def = lambda: mock_download
+        mock_download.get_infohash = lambda: 'a' * 20
+        self.nodes[0].overlay.on_download_added(mock_download)
+
+        lookup_info_hash = self.nodes[0].overlay.get_lookup_info_hash('a' * 20)
+        self.assertEqual(self.nodes[0].overlay.get_download(lookup_info_hash), mock_download)
+        self.assertIsNone(self.nodes[0].overlay.get_download('b' * 20))
 
     def test_readd_bittorrent_peers(self):
         """
@@ -47,7 +47,7 @@ class TestTunnelDispatcher(AbstractServer):
         mock_session._udp_socket = None
         mock_sock_server.sessions = [mock_session]
         self.dispatcher.set_socks_servers([mock_sock_server])
-        self.dispatcher.destinations[1] = {'a': mock_circuit}
+        self.dispatcher.set_destination(1, 'a', mock_circuit)
         self.assertFalse(self.dispatcher.on_incoming_from_tunnel(self.mock_tunnel_community, mock_circuit, origin, 'a'))
 
         mock_session._udp_socket = MockObject()
@@ -82,12 +82,57 @@ class TestTunnelDispatcher(AbstractServer):
         # Circuit ready, should be able to tunnel data
         self.assertTrue(self.dispatcher.on_socks5_udp_data(mock_udp_connection, mock_request))
 
+    def test_on_socks_in_batch(self):
+        """
+        Test whether a batch of data is dispatched to the circuits
+        """
+        mock_socks_server = MockObject()
+        self.dispatcher.set_socks_servers([mock_socks_server])
+
+        mock_udp_connection = MockObject()
+        mock_udp_connection.socksconnection = MockObject()
+        mock_udp_connection.socksconnection.socksserver = mock_socks_server
+
+        requests = []
+        for port in [1024, 1025]:
+            mock_request = MockObject()
+            mock_request.destination = ("0.0.0.0", port)
+            mock_request.payload = 'a'
+            requests.append(mock_request)
+
+        sent = []
+        self.mock_tunnel_community.send_data = lambda *args: sent.append(args)
+        self.mock_circuit.state = CIRCUIT_STATE_READY
+        self.selection_strategy.select = lambda *_: self.mock_circuit
+
+        self.assertEqual(self.dispatcher.on_socks5_udp_batch(mock_udp_connection, requests), 2)
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(len(self.dispatcher.destinations[1]), 2)
+
     def test_circuit_dead(self):
         """
         Test whether the correct peers are removed when a circuit breaks
         """
-        self.dispatcher.destinations = {1: {'a': self.mock_circuit, 'b': self.mock_circuit},
-                                        2: {'c': self.mock_circuit, 'a': self.mock_circuit}}
+        self.dispatcher.set_socks_servers([MockObject(), MockObject()])
+        for hops, destination in [(1, 'a'), (1, 'b'), (2, 'c'), (2, 'a')]:
+            self.dispatcher.set_destination(hops, destination, self.mock_circuit)
         res = self.dispatcher.circuit_dead(self.mock_circuit)
         self.assertTrue(res)
         self.assertEqual(len(res), 3)
+        self.assertFalse(self.dispatcher.destinations[1])
+        self.assertFalse(self.dispatcher.circuit_destinations[2])
+
+    def test_set_destination(self):
+        """
+        Test whether a destination that is associated with another circuit is moved in the circuit index
+        """
+        other_circuit = MockObject()
+        self.dispatcher.set_socks_servers([MockObject()])
+        self.dispatcher.set_destination(1, 'a', self.mock_circuit)
+        self.dispatcher.set_destination(1, 'b', self.mock_circuit)
+        self.dispatcher.set_destination(1, 'a', other_circuit)
+        self.assertEqual(self.dispatcher.circuit_destinations[1], {self.mock_circuit: {'b'}, other_circuit: {'a'}})
+
+        self.dispatcher.remove_destination(1, 'b')
+        self.assertEqual(self.dispatcher.circuit_destinations[1], {other_circuit: {'a'}})
+        self.assertEqual(self.dispatcher.destinations[1], {'a': other_circuit})
@@ -7,9 +7,10 @@ from Tribler.community.popularity import constants
 from Tribler.community.popularity.community import PopularityCommunity, MSG_TORRENT_HEALTH_RESPONSE, \
     MSG_CHANNEL_HEALTH_RESPONSE, ERROR_UNKNOWN_PEER, ERROR_NO_CONTENT, \
     ERROR_UNKNOWN_RESPONSE
-from Tribler.community.popularity.constants import SEARCH_TORRENT_REQUEST, MSG_TORRENT_INFO_RESPONSE, MSG_SUBSCRIPTION
+from Tribler.community.popularity.constants import SEARCH_TORRENT_REQUEST, MSG_TORRENT_INFO_RESPONSE, MSG_SUBSCRIPTION, \
+    MSG_TORRENT_HEALTH_BATCH_RESPONSE
 from Tribler.community.popularity.payload import SearchResponseItemPayload, TorrentInfoResponsePayload, \
-    TorrentHealthPayload, ContentSubscription
+    TorrentHealthPayload, ContentSubscription, TorrentHealthBatchPayload
 from Tribler.community.popularity.repository import TYPE_TORRENT_HEALTH
 from Tribler.community.popularity.request import ContentRequest
 from Tribler.pyipv8.ipv8.test.base import TestBase
@@ -114,6 +115,8 @@ class TestPopularityCommunity(TestPopularityCommunityBase):
         self.assertGreater(len(self.nodes[0].overlay.publishers), 0, "Publisher expected")
         # Node 1 should have a subscriber added
         self.assertGreater(len(self.nodes[1].overlay.subscribers), 0, "Subscriber expected")
+        # Node 0 should have announced the support for batches to node 1
+        self.assertEqual(len(self.nodes[1].overlay.batch_subscribers), 1, "Batch subscriber expected")
 
     @inlineCallbacks
     def test_subscribe_unsubscribe_individual_peers(self):
@@ -229,7 +232,7 @@ class TestPopularityCommunity(TestPopularityCommunityBase):
             peer.torrent_health_response_received = True
 
         self.nodes[0].torrent_health_response_received = False
-        self.nodes[0].overlay.decode_map[chr(MSG_TORRENT_HEALTH_RESPONSE)] = lambda source_address, data: \
+        self.nodes[0].overlay.decode_map[chr(MSG_TORRENT_HEALTH_BATCH_RESPONSE)] = lambda source_address, data: \
             on_torrent_health_response(self.nodes[0], source_address, data)
 
         yield self.introduce_nodes()
@@ -246,6 +249,94 @@ class TestPopularityCommunity(TestPopularityCommunityBase):
 
         self.assertTrue(self.nodes[0].torrent_health_response_received, "Expected to receive torrent response")
 
+    @inlineCallbacks
+    def test_content_publishing_batch(self):
+        """
+        Tests whether the health of many torrents is published in a few messages.
+        """
+        received_health = []
+
+        def on_torrent_health_batch_response(source_address, data):
+            _, _, payload = self.nodes[0].overlay._ez_unpack_auth(TorrentHealthBatchPayload, data)
+            health_list, _ = self.nodes[0].overlay.serializer.unpack_multiple_as_list(
+                TorrentHealthPayload.format_list, payload.health)
+            received_health.append(health_list)
+
+        self.nodes[0].overlay.decode_map[chr(MSG_TORRENT_HEALTH_BATCH_RESPONSE)] = on_torrent_health_batch_response
+
+        yield self.introduce_nodes()
+        self.nodes[0].overlay.subscribe_peers()
+        yield self.deliver_messages()
+
+        for index in range(50):
+            self.nodes[1].overlay.queue_content(TYPE_TORRENT_HEALTH, (chr(index) * 20, index, 1, 123456))
+        # An older health of the same torrent is not published
+        self.nodes[1].overlay.content_repository.queue.appendleft((TYPE_TORRENT_HEALTH, (chr(0) * 20, 1, 1, 1)))
+
+        self.nodes[1].overlay.publish_next_content()
+        yield self.deliver_messages()
+
+        self.assertEqual(len(received_health), 2)
+        self.assertEqual(sorted(health[0] for health_list in received_health for health in health_list),
+                         [chr(index) * 20 for index in range(50)])
+        self.assertEqual(self.nodes[1].overlay.content_repository.count_content(), 0)
+
+    @inlineCallbacks
+    def test_content_publishing_no_batch_support(self):
+        """
+        Tests whether the health of torrents is published per torrent to a subscriber that does not support batches.
+        """
+        received_infohashes = []
+
+        def on_torrent_health_response(source_address, data):
+            _, _, payload = self.nodes[0].overlay._ez_unpack_auth(TorrentHealthPayload, data)
+            received_infohashes.append(payload.infohash)
+
+        self.nodes[0].overlay.decode_map[chr(MSG_TORRENT_HEALTH_RESPONSE)] = on_torrent_health_response
+
+        yield self.introduce_nodes()
+        # Subscribe like an older version, without announcing the support for batches
+        self.nodes[1].overlay.subscribers.add(self.nodes[0].my_peer)
+
+        for index in range(3):
+            self.nodes[1].overlay.queue_content(TYPE_TORRENT_HEALTH, (chr(index) * 20, index, 1, 123456))
+
+        self.nodes[1].overlay.publish_next_content()
+        yield self.deliver_messages()
+
+        self.assertEqual(sorted(received_infohashes), [chr(index) * 20 for index in range(3)])
+
+    @inlineCallbacks
+    def test_on_torrent_health_batch_response(self):
+        """
+        Tests whether the health of all torrents in a batch response is updated at once, and the info of unknown
+        torrents is requested.
+        """
+        updated_health = []
+        requested_infohashes = []
+
+        def update_torrents_health(payloads, peer_trust):
+            updated_health.extend(payloads)
+            return [payloads[0].infohash]
+
+        self.nodes[0].overlay.content_repository = MockRepository()
+        self.nodes[0].overlay.content_repository.update_torrents_health = update_torrents_health
+        self.nodes[0].overlay.send_torrent_info_request = lambda infohash, peer: requested_infohashes.append(infohash)
+
+        serialized_health = ''.join(self.nodes[1].overlay.serializer.pack_multiple(
+            TorrentHealthPayload(chr(index) * 20, 10, 5, 123123123).to_pack_list())[0] for index in range(3))
+        data = self.nodes[1].overlay.create_message_packet(MSG_TORRENT_HEALTH_BATCH_RESPONSE,
+                                                           TorrentHealthBatchPayload(serialized_health))
+
+        yield self.introduce_nodes()
+
+        self.nodes[0].overlay.publishers.add(self.nodes[1].my_peer)
+        self.nodes[0].overlay.on_torrent_health_batch_response(self.nodes[1].my_peer.address, data)
+        yield self.deliver_messages()
+
+        self.assertEqual([payload.infohash for payload in updated_health], [chr(index) * 20 for index in range(3)])
+        self.assertEqual(requested_infohashes, [chr(0) * 20])
+
     @inlineCallbacks
     def test_publish_no_content(self):
         """
@@ -72,11 +72,38 @@ class TestContentRepository(unittest.TestCase):
             update_torrent(self.content_repository, infohash)
 
         # If torrent does not exist in the database, then it should be added to the database
-        self.content_repository.has_torrent = lambda infohash: False
+        self.content_repository.get_torrent = lambda infohash: None
         self.content_repository.update_torrent_health(fake_torrent_health_payload, peer_trust=0)
 
         self.assertTrue(self.content_repository.update_torrent_called)
 
+    def test_update_torrents_health(self):
+        """
+        Tests whether the health of several torrents is updated at once, except for fresh database records.
+        """
+        now = time.time()
+        payloads = [TorrentHealthPayload('a' * 20, 10, 4, now), TorrentHealthPayload('b' * 20, 1, 4, now),
+                    TorrentHealthPayload('c' * 20, 5, 4, now)]
+        updates = []
+
+        self.content_repository.torrent_db.get_last_tracker_checks = lambda infohashes: \
+            {'a' * 20: now - DEFAULT_FRESHNESS_LIMIT - 1, 'b' * 20: now - 10}
+        self.content_repository.torrent_db.update_torrents_health = updates.extend
+
+        unknown_infohashes = self.content_repository.update_torrents_health(payloads, peer_trust=0)
+
+        self.assertEqual(unknown_infohashes, ['c' * 20])
+        self.assertEqual(updates, [('a' * 20, 10, 4, int(now), u"good"), ('c' * 20, 5, 4, int(now), u"good")])
+
+    def test_pop_contents(self):
+        """
+        Tests whether at most the given number of items is popped from the queue, the most recent item first.
+        """
+        for index in range(5):
+            self.content_repository.add_content(1, index)
+        self.assertEqual(self.content_repository.pop_contents(3), [(1, 4), (1, 3), (1, 2)])
+        self.assertEqual(self.content_repository.count_content(), 2)
+
     def test_update_torrent_with_higher_trust(self):
         """
         Scenario: The database torrent has still fresh last_check_time and you receive a new response from
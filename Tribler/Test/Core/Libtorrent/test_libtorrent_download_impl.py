@@ -1,4 +1,3 @@
-import binascii
 import os
 
 from twisted.internet import reactor
@@ -172,11 +171,7 @@ class TestLibtorrentDownloadImpl(TestAsServer):
             """
             check if resume data is ready
             """
-            basename = binascii.hexlify(tdef.get_infohash()) + '.state'
-            filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
-
-            engine_data = CallbackConfigParser()
-            engine_data.read_file(filename)
+            engine_data = self.session.lm.checkpoint_store.get(tdef.get_infohash())
 
             self.assertEqual(tdef.get_infohash(), engine_data.get('state', 'engineresumedata').get('info-hash'))
 
@@ -206,10 +201,7 @@ class TestLibtorrentDownloadImpl(TestAsServer):
             """
             callback after finishing setup in LibtorrentDownloadImpl
             """
-            basename = binascii.hexlify(tdef.get_infohash()) + '.state'
-            filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
-
-            self.assertFalse(os.path.isfile(filename))
+            self.assertNotIn(tdef.get_infohash(), self.session.lm.checkpoint_store)
 
         # This should not cause a checkpoint
         result_deferred = impl.setup(None, None, 0, checkpoint_disabled=True)
@@ -347,6 +339,16 @@ class TestLibtorrentDownloadImplNoSession(TriblerCoreTest):
         self.assertFalse(self.libtorrent_download_impl.dlconfig_changed_callback(
             'download_defaults', 'super_seeder', 3, 4))
 
+    def test_dlconfig_cb_change_notify(self):
+        """
+        Testing whether a change of the configuration of a download is reported as a change of its state
+        """
+        changed_downloads = []
+        self.libtorrent_download_impl.state_changed_callback = changed_downloads.append
+
+        self.libtorrent_download_impl.dlconfig_changed_callback('download_defaults', 'hops', 2, 1)
+        self.assertEqual(changed_downloads, [self.libtorrent_download_impl])
+
     def test_add_trackers(self):
         """
         Testing whether trackers are added to the libtorrent handler in LibtorrentDownloadImpl
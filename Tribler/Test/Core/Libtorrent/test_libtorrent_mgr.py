@@ -1,4 +1,3 @@
-import binascii
 import os
 import shutil
 import tempfile
@@ -7,10 +6,13 @@ from libtorrent import bencode
 from Tribler.Test.tools import trial_timeout
 from twisted.internet.defer import inlineCallbacks, Deferred
 from twisted.internet import reactor
+from twisted.internet.task import deferLater
 
 from Tribler.Core.CacheDB.Notifier import Notifier
 from Tribler.Core.Libtorrent.LibtorrentDownloadImpl import LibtorrentDownloadImpl
-from Tribler.Core.Libtorrent.LibtorrentMgr import LibtorrentMgr
+from Tribler.Core.Libtorrent.LibtorrentMgr import LibtorrentMgr, METAINFO_PRIORITY_USER, METAINFO_PRIORITY_COLLECT, \
+    METAINFO_PRIORITY_PREFETCH
+from Tribler.Core.Modules.checkpoint_store import CheckpointStore, CHECKPOINT_DB_FILENAME
 from Tribler.Core.exceptions import TorrentFileException
 from Tribler.Test.Core.base_test import MockObject
 from Tribler.Test.test_as_server import AbstractServer
@@ -27,6 +29,7 @@ class TestLibtorrentMgr(AbstractServer):
 
         self.tribler_session = MockObject()
         self.tribler_session.lm = MockObject()
+        self.tribler_session.lm.torrent_store = None
         self.tribler_session.notifier = Notifier()
         self.tribler_session.state_dir = self.session_base_dir
         self.tribler_session.trustchain_keypair = MockObject()
@@ -43,6 +46,7 @@ class TestLibtorrentMgr(AbstractServer):
         self.tribler_session.config.get_libtorrent_max_upload_rate = lambda: 100
         self.tribler_session.config.get_libtorrent_max_download_rate = lambda: 120
         self.tribler_session.config.get_libtorrent_dht_enabled = lambda: False
+        self.tribler_session.config.get_libtorrent_max_metainfo_requests = lambda: 20
         self.tribler_session.config.set_libtorrent_port_runtime = lambda _: None
 
         self.ltmgr = LibtorrentMgr(self.tribler_session)
@@ -130,12 +134,12 @@ class TestLibtorrentMgr(AbstractServer):
         test_deferred = Deferred()
 
         def metainfo_cb(metainfo):
-            self.assertEqual(metainfo, "test")
+            self.assertEqual(metainfo, {'info': {'name': 'test'}})
             test_deferred.callback(None)
 
         self.ltmgr.initialize()
         self.ltmgr.is_dht_ready = lambda: True
-        self.ltmgr.metainfo_cache[("a" * 20).encode('hex')] = {'meta_info': 'test'}
+        self.ltmgr.metainfo_cache.put(("a" * 20).encode('hex'), {'info': {'name': 'test'}})
         self.ltmgr.get_metainfo("a" * 20, metainfo_cb)
 
         return test_deferred
@@ -172,6 +176,85 @@ class TestLibtorrentMgr(AbstractServer):
 
         return test_deferred
 
+    def test_got_metainfo_store(self):
+        """
+        Testing whether metainfo we received is cached and saved in the torrent store, without the swarm information
+        """
+        self.ltmgr.initialize()
+        self.tribler_session.lm.torrent_store = {}
+
+        fake_handle = MockObject()
+        torrent_info = MockObject()
+        torrent_info.metadata = lambda: bencode({'pieces': ['a']})
+        torrent_info.trackers = lambda: []
+        fake_handle.get_peer_info = lambda: []
+        fake_handle.torrent_file = lambda: torrent_info
+
+        self.ltmgr.ltsession_metainfo.remove_torrent = lambda *_: None
+        self.ltmgr.metainfo_requests['a' * 20] = {'handle': fake_handle, 'timeout_callbacks': [],
+                                                  'callbacks': [lambda _: None], 'notify': False}
+        self.ltmgr.got_metainfo("a" * 20)
+
+        self.assertIn('a' * 20, self.ltmgr.metainfo_cache)
+        self.assertEqual(self.tribler_session.lm.torrent_store['a' * 20], bencode({'info': {'pieces': ['a']},
+                                                                                   'nodes': []}))
+
+    def test_get_metainfo_queue(self):
+        """
+        Testing whether metainfo requests are queued by priority once the maximum number of requests is running
+        """
+        self.ltmgr.initialize()
+        self.ltmgr.is_dht_ready = lambda: True
+        self.ltmgr.max_metainfo_requests = 1
+
+        added = []
+
+        def add_torrent(atp):
+            added.append(str(atp['info_hash']))
+            fake_handle = MockObject()
+            fake_handle.is_valid = lambda: True
+            fake_handle.has_metadata = lambda: False
+            return fake_handle
+
+        self.ltmgr.ltsession_metainfo.add_torrent = add_torrent
+        self.ltmgr.ltsession_metainfo.remove_torrent = lambda *_: None
+
+        self.ltmgr.get_metainfo("a" * 20, lambda _: None, priority=METAINFO_PRIORITY_PREFETCH)
+        self.ltmgr.get_metainfo("b" * 20, lambda _: None, priority=METAINFO_PRIORITY_COLLECT)
+        self.ltmgr.get_metainfo("c" * 20, lambda _: None, priority=METAINFO_PRIORITY_COLLECT)
+        # A request for a torrent that is already queued raises the priority of that request
+        self.ltmgr.get_metainfo("c" * 20, lambda _: None, priority=METAINFO_PRIORITY_USER)
+
+        statistics = self.ltmgr.get_metainfo_statistics()
+        self.assertEqual((statistics['running'], statistics['queued'], statistics['coalesced']), (1, 2, 1))
+
+        # Cancelling the running request starts the queued request with the highest priority
+        self.assertTrue(self.ltmgr.cancel_metainfo_request("a" * 20))
+        self.assertEqual(added, [("a" * 20).encode('hex'), ("c" * 20).encode('hex')])
+
+        self.ltmgr.got_metainfo(("c" * 20).encode('hex'), timeout=True)
+        self.assertEqual(added[-1], ("b" * 20).encode('hex'))
+        self.assertEqual(self.ltmgr.get_metainfo_statistics()['timeouts'], 1)
+
+        # Wait for the timeouts of the requests to be scheduled, so they are cancelled when shutting down
+        return deferLater(reactor, 0, lambda: None)
+
+    def test_cancel_metainfo_request_callback(self):
+        """
+        Testing whether a metainfo request is only cancelled when no callbacks are waiting for it anymore
+        """
+        self.ltmgr.initialize()
+        callback1 = lambda _: None
+        callback2 = lambda _: None
+        self.ltmgr.metainfo_requests[('a' * 20).encode('hex')] = {'handle': None, 'callbacks': [callback1, callback2],
+                                                                  'timeout_callbacks': [], 'notify': False}
+
+        self.assertTrue(self.ltmgr.cancel_metainfo_request('a' * 20, callback1))
+        self.assertIn(('a' * 20).encode('hex'), self.ltmgr.metainfo_requests)
+        self.assertTrue(self.ltmgr.cancel_metainfo_request('a' * 20, callback2))
+        self.assertNotIn(('a' * 20).encode('hex'), self.ltmgr.metainfo_requests)
+        self.assertFalse(self.ltmgr.cancel_metainfo_request('a' * 20))
+
     @trial_timeout(20)
     def test_got_metainfo_timeout(self):
         """
@@ -399,11 +482,11 @@ class TestLibtorrentMgr(AbstractServer):
         mock_tdef.get_infohash = lambda: 'a' * 20
 
         self.tribler_session.get_download = lambda _: None
-        self.tribler_session.get_downloads_pstate_dir = lambda: self.ltmgr.metadata_tmpdir
 
         mock_lm = MockObject()
         mock_lm.ltmgr = self.ltmgr
         mock_lm.tunnel_community = None
+        mock_lm.checkpoint_store = CheckpointStore(os.path.join(self.ltmgr.metadata_tmpdir, CHECKPOINT_DB_FILENAME))
         self.tribler_session.lm = mock_lm
 
         def dl_from_tdef(tdef, _):
@@ -415,10 +498,8 @@ class TestLibtorrentMgr(AbstractServer):
 
         download = self.ltmgr.start_download_from_magnet("magnet:?xt=urn:btih:" + ('1'*40))
 
-        basename = binascii.hexlify(download.get_def().get_infohash()) + '.state'
-        filename = os.path.join(download.session.get_downloads_pstate_dir(), basename)
-
-        self.assertTrue(os.path.isfile(filename))
+        self.assertIn(download.get_def().get_infohash(), mock_lm.checkpoint_store)
+        mock_lm.checkpoint_store.close()
 
     @trial_timeout(5)
     def test_callback_on_alert(self):
@@ -438,6 +519,63 @@ class TestLibtorrentMgr(AbstractServer):
         self.ltmgr._task_process_alerts()
         return test_deferred
 
+    def test_process_alerts_budget(self):
+        """
+        Test whether alerts that do not fit in the time budget of an iteration are processed later, in order
+        """
+        processed = []
+        self.ltmgr.initialize()
+        self.ltmgr.process_alert = lambda alert: processed.append(alert)
+        self.ltmgr.get_session(0).pop_alerts = lambda: [1, 2, 3]
+
+        self.ltmgr.alert_processing_budget = -1
+        self.ltmgr._task_process_alerts()
+        self.assertEqual(processed, [1])
+        self.assertEqual(len(self.ltmgr.pending_alerts), 2)
+
+        self.ltmgr.alert_processing_budget = 10
+        self.ltmgr._process_pending_alerts()
+        self.assertEqual(processed, [1, 2, 3])
+
+    def test_process_alerts_no_pop_while_pending(self):
+        """
+        Test whether the sessions are not popped again while alerts of the previous pop are still being processed
+        """
+        processed = []
+        pops = []
+
+        def pop_alerts():
+            pops.append(len(self.ltmgr.pending_alerts))
+            return [1, 2, 3]
+
+        self.ltmgr.initialize()
+        self.ltmgr.process_alert = lambda alert: processed.append(alert)
+        self.ltmgr.get_session(0).pop_alerts = pop_alerts
+
+        self.ltmgr.alert_processing_budget = -1
+        self.ltmgr._task_process_alerts()
+        self.ltmgr._task_process_alerts()
+        self.assertEqual(pops, [0])
+        self.assertEqual(processed, [1, 2])
+
+        self.ltmgr.alert_processing_budget = 10
+        self.ltmgr._process_pending_alerts()
+        self.ltmgr._task_process_alerts()
+        self.assertEqual(pops, [0, 0])
+        self.assertEqual(processed, [1, 2, 3, 1, 2, 3])
+
+    def test_alert_statistics(self):
+        """
+        Test whether the processed alerts are counted per type
+        """
+        class torrent_removed_alert(object):
+            info_hash = '0' * 20
+
+        self.ltmgr.initialize()
+        self.ltmgr.process_alert(torrent_removed_alert())
+        self.ltmgr.process_alert(torrent_removed_alert())
+        self.assertEqual(self.ltmgr.get_alert_statistics()['alerts']['torrent_removed_alert']['count'], 2)
+
     def test_payout_on_disconnect(self):
         """
         Test whether a payout is initialized when a peer disconnects
@@ -0,0 +1,60 @@
+from Tribler.Core.Libtorrent.metainfo_cache import MetainfoCache, get_metainfo_size
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestMetainfoCache(TriblerCoreTest):
+
+    def setUp(self):
+        super(TestMetainfoCache, self).setUp()
+        self.cache = MetainfoCache(max_size=100)
+
+    def test_get_metainfo_size(self):
+        """
+        Test whether the size of metainfo is estimated from the length of its strings
+        """
+        self.assertEqual(get_metainfo_size({'info': {'pieces': 'a' * 40}, 'seeders': 3}), 4 + 6 + 40 + 7 + 8)
+
+    def test_get_shared_info(self):
+        """
+        Test whether the cached metainfo is handed out without copying the info dictionary
+        """
+        metainfo = {'info': {'pieces': 'a' * 20}}
+        self.cache.put('a', metainfo)
+
+        result = self.cache.get('a')
+        result['download_exists'] = True
+        self.assertIs(result['info'], metainfo['info'])
+        self.assertNotIn('download_exists', self.cache.get('a'))
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_size_eviction(self):
+        """
+        Test whether the least recently used metainfo is evicted once the cache is full
+        """
+        self.cache.put('a', {'info': 'a' * 40})
+        self.cache.put('b', {'info': 'b' * 40})
+        self.cache.get('a')
+        self.cache.put('c', {'info': 'c' * 40})
+
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertLessEqual(self.cache.size, 100)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_too_large(self):
+        """
+        Test whether metainfo that is larger than the cache is not stored
+        """
+        self.cache.put('a', {'info': 'a' * 200})
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_expired(self):
+        """
+        Test whether metainfo with outdated swarm information is not returned
+        """
+        self.cache.max_age = -1
+        self.cache.put('a', {'info': 'a'})
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
@@ -107,6 +107,128 @@ class TestCircuitDebugEndpoint(AbstractApiTest):
         self.should_check_equality = False
         return self.do_request('debug/threads', expected_code=200).addCallback(verify_response)
 
+    @trial_timeout(10)
+    def test_get_torrent_checker_no_checker(self):
+        """
+        Test whether the API returns error 404 if the torrent checker is not enabled
+        """
+        self.session.lm.torrent_checker = None
+        return self.do_request('debug/torrent_checker', expected_code=404)
+
+    @trial_timeout(10)
+    def test_get_torrent_checker(self):
+        """
+        Test whether the API returns the statistics of the torrent checker
+        """
+        def verify_response(response):
+            response_json = json.loads(response)
+            self.assertEqual(response_json['torrent_checker']['scrapes_in_flight'], 3)
+            self.session.lm.torrent_checker = None
+
+        self.session.lm.torrent_checker = MockObject()
+        self.session.lm.torrent_checker.get_statistics = lambda: {'scrapes_in_flight': 3}
+        self.should_check_equality = False
+        return self.do_request('debug/torrent_checker', expected_code=200).addCallback(verify_response)
+
+    @trial_timeout(10)
+    def test_get_alerts_no_libtorrent(self):
+        """
+        Test whether the API returns error 404 if libtorrent is not enabled
+        """
+        return self.do_request('debug/alerts', expected_code=404)
+
+    @trial_timeout(10)
+    def test_get_alerts(self):
+        """
+        Test whether the API returns the statistics of the processed libtorrent alerts
+        """
+        def verify_response(response):
+            response_json = json.loads(response)
+            self.assertEqual(response_json['alerts']['state_update_alert']['count'], 2)
+            self.session.lm.ltmgr = None
+
+        self.session.lm.ltmgr = MockObject()
+        self.session.lm.ltmgr.get_alert_statistics = lambda: {
+            'alerts': {'state_update_alert': {'count': 2, 'total_time': 0.1, 'average_time': 0.05}},
+            'pending_alerts': 0}
+        self.should_check_equality = False
+        return self.do_request('debug/alerts', expected_code=200).addCallback(verify_response)
+
+    @trial_timeout(10)
+    def test_get_metainfo_no_libtorrent(self):
+        """
+        Test whether the API returns error 404 if libtorrent is not enabled when requesting metainfo statistics
+        """
+        return self.do_request('debug/metainfo', expected_code=404)
+
+    @trial_timeout(10)
+    def test_get_metainfo(self):
+        """
+        Test whether the API returns the statistics of the metainfo requests
+        """
+        def verify_response(response):
+            response_json = json.loads(response)
+            self.assertEqual(response_json['metainfo']['requests'], 3)
+            self.assertEqual(response_json['metainfo']['running'], 1)
+            self.session.lm.ltmgr = None
+
+        self.session.lm.ltmgr = MockObject()
+        self.session.lm.ltmgr.get_metainfo_statistics = lambda: {
+            'requests': 3, 'coalesced': 0, 'cache_hits': 1, 'received': 2, 'timeouts': 0, 'cancelled': 0,
+            'queued': 0, 'running': 1, 'max_running': 10, 'average_time_to_metainfo': 1.5}
+        self.should_check_equality = False
+        return self.do_request('debug/metainfo', expected_code=200).addCallback(verify_response)
+
+    @trial_timeout(10)
+    def test_get_search_cache_disabled(self):
+        """
+        Test whether the API returns error 404 if there is no search cache
+        """
+        search_cache = self.session.lm.search_cache
+        self.session.lm.search_cache = None
+
+        def restore_search_cache(_):
+            self.session.lm.search_cache = search_cache
+
+        return self.do_request('debug/search_cache', expected_code=404).addCallback(restore_search_cache)
+
+    @trial_timeout(10)
+    def test_get_search_cache(self):
+        """
+        Test whether the API returns the statistics of the search cache
+        """
+        def verify_response(response):
+            response_json = json.loads(response)
+            self.assertEqual(response_json['search_cache']['entries'], 1)
+            self.assertEqual(response_json['search_cache']['misses'], 1)
+
+        self.session.lm.search_cache.search_channels(u"ubuntu")
+        self.should_check_equality = False
+        return self.do_request('debug/search_cache', expected_code=200).addCallback(verify_response)
+
+    @trial_timeout(10)
+    def test_get_reactor_no_monitor(self):
+        """
+        Test whether the API returns error 404 if the reactor lag monitor is not enabled
+        """
+        self.session.lm.reactor_lag_monitor.stop()
+        self.session.lm.reactor_lag_monitor = None
+        return self.do_request('debug/reactor', expected_code=404)
+
+    @trial_timeout(10)
+    def test_get_reactor(self):
+        """
+        Test whether the API returns the lag of the reactor and the sites where it stalled
+        """
+        def verify_response(response):
+            response_json = json.loads(response)
+            self.assertEqual(response_json['reactor']['stalls'], 1)
+            self.assertEqual(len(response_json['reactor']['stall_sites']), 1)
+
+        self.session.lm.reactor_lag_monitor.record_stall_sample(("file.py:1 function",), 1234)
+        self.should_check_equality = False
+        return self.do_request('debug/reactor', expected_code=200).addCallback(verify_response)
+
     @trial_timeout(10)
     def test_get_cpu_history(self):
         """
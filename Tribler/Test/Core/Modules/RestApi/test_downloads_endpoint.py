@@ -72,6 +72,107 @@ class TestDownloadsEndpoint(AbstractApiTest):
         return self.do_request('downloads?get_peers=1&get_pieces=1&&get_files=1',
                                expected_code=200).addCallback(verify_download)
 
+    def start_test_downloads(self):
+        video_tdef, _ = self.create_local_torrent(os.path.join(TESTS_DATA_DIR, 'video.avi'))
+        self.session.start_download_from_tdef(video_tdef, DownloadStartupConfig())
+        self.session.start_download_from_uri("file:" + pathname2url(
+            os.path.join(TESTS_DATA_DIR, "bak_single.torrent")))
+        return video_tdef.get_infohash()
+
+    @trial_timeout(20)
+    def test_get_downloads_fields_filter(self):
+        """
+        Testing whether the API only returns the requested fields of the downloads that match the filter
+        """
+        def verify_download(downloads):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(downloads_json['downloads'],
+                             [{u'infohash': hexlify(video_infohash), u'name': u'video.avi', u'size': 1942100}])
+
+        video_infohash = self.start_test_downloads()
+        self.should_check_equality = False
+        return self.do_request('downloads?fields=name,size&infohash=%s' % hexlify(video_infohash),
+                               expected_code=200).addCallback(verify_download)
+
+    @trial_timeout(20)
+    def test_get_downloads_status_filter(self):
+        """
+        Testing whether the API only returns the downloads with the requested status
+        """
+        self.start_test_downloads()
+        return self.do_request('downloads?status=DLSTATUS_SEEDING', expected_code=200,
+                               expected_json={"downloads": []})
+
+    @trial_timeout(20)
+    def test_get_downloads_pagination(self):
+        """
+        Testing whether the API returns a page of the downloads together with the total number of downloads
+        """
+        def verify_page(downloads, pages):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(downloads_json['total'], 2)
+            self.assertEqual(len(downloads_json['downloads']), 1)
+            pages.append(downloads_json['downloads'][0]['infohash'])
+
+        def verify_pages(pages):
+            self.assertEqual(len(set(pages)), 2)
+
+        self.start_test_downloads()
+        self.should_check_equality = False
+        pages = []
+        return self.do_request('downloads?fields=name&offset=0&limit=1', expected_code=200)\
+            .addCallback(verify_page, pages)\
+            .addCallback(lambda _: self.do_request('downloads?fields=name&offset=1&limit=1', expected_code=200))\
+            .addCallback(verify_page, pages)\
+            .addCallback(lambda _: verify_pages(pages))
+
+    @trial_timeout(20)
+    def test_get_downloads_since(self):
+        """
+        Testing whether the API only returns the downloads that changed after the given revision
+        """
+        def verify_all(downloads):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(len(downloads_json['downloads']), 2)
+            self.assertEqual(downloads_json['removed'], [])
+            return self.do_request('downloads?since=%d' % downloads_json['revision'], expected_code=200)
+
+        def verify_none(downloads):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(downloads_json['downloads'], [])
+            self.assertEqual(downloads_json['revision'], self.session.lm.download_states.revision)
+            self.assertFalse(downloads_json['full_resync'])
+
+        self.start_test_downloads()
+        self.session.lm.download_states.update(self.session.lm.downloads)
+        self.should_check_equality = False
+        return self.do_request('downloads?since=0', expected_code=200).addCallback(verify_all)\
+            .addCallback(verify_none)
+
+    @trial_timeout(20)
+    def test_get_downloads_since_resync(self):
+        """
+        Testing whether the API returns all downloads when the given revision is older than the known removals
+        """
+        def verify_all(downloads):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(len(downloads_json['downloads']), 2)
+            self.assertTrue(downloads_json['full_resync'])
+
+        self.start_test_downloads()
+        self.session.lm.download_states.update(self.session.lm.downloads)
+        self.session.lm.download_states.pruned_revision = self.session.lm.download_states.revision
+        self.should_check_equality = False
+        return self.do_request('downloads?since=0', expected_code=200).addCallback(verify_all)
+
+    @trial_timeout(10)
+    def test_get_downloads_bad_fields(self):
+        """
+        Testing whether an error is returned when unknown fields of the downloads are requested
+        """
+        self.should_check_equality = False
+        return self.do_request('downloads?fields=name,abcd', expected_code=400)
+
     @trial_timeout(10)
     def test_start_download_no_uri(self):
         """
@@ -15,7 +15,9 @@ from Tribler.Core.simpledefs import SIGNAL_CHANNEL, SIGNAL_ON_SEARCH_RESULTS, SI
     NTFY_MARKET_ON_PAYMENT_RECEIVED, NTFY_MARKET_ON_PAYMENT_SENT, SIGNAL_RESOURCE_CHECK, SIGNAL_LOW_SPACE, \
     NTFY_CREDIT_MINING
 import Tribler.Core.Utilities.json_util as json
+from Tribler.Core.Modules.restapi.events_endpoint import EventsClient, MAX_QUEUED_EVENTS
 from Tribler.Core.version import version_id
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.Core.Modules.RestApi.base_api_test import AbstractApiTest
 
 
@@ -25,6 +27,7 @@ class EventDataProtocol(Protocol):
     """
     def __init__(self, messages_to_wait_for, finished, response):
         self.json_buffer = []
+        self.data_buffer = ''
         self._logger = logging.getLogger(self.__class__.__name__)
         self.messages_to_wait_for = messages_to_wait_for + 1  # The first event message is always events_start
         self.finished = finished
@@ -32,10 +35,14 @@ class EventDataProtocol(Protocol):
 
     def dataReceived(self, data):
         self._logger.info("Received data: %s" % data)
-        self.json_buffer.append(json.loads(data))
-        self.messages_to_wait_for -= 1
-        if self.messages_to_wait_for == 0:
-            self.response.loseConnection()
+        # Several events can be written in a single frame
+        events = (self.data_buffer + data).split('\n')
+        self.data_buffer = events.pop()
+        for event in events:
+            self.json_buffer.append(json.loads(event))
+            self.messages_to_wait_for -= 1
+            if self.messages_to_wait_for == 0:
+                self.response.loseConnection()
 
     def connectionLost(self, reason="done"):
         self.finished.callback(self.json_buffer[1:])
@@ -155,3 +162,72 @@ class TestEventsEndpoint(AbstractApiTest):
         self.socket_open_deferred.addCallback(send_searches)
 
         return self.events_deferred
+
+
+class TestEventsClient(TriblerCoreTest):
+    """
+    Test the queue of the events for a client of the events endpoint.
+    """
+
+    def setUp(self):
+        super(TestEventsClient, self).setUp()
+        self.written = []
+        request = MockObject()
+        request.registerProducer = lambda *_: None
+        request.write = self.written.append
+        self.client = EventsClient(request)
+
+    def test_flush(self):
+        """
+        Test whether the queued events are written in a single write
+        """
+        self.client.enqueue("torrent_finished", "a\n")
+        self.client.enqueue("torrent_error", "b\n")
+        self.client.flush()
+        self.assertEqual(self.written, ["a\nb\n"])
+
+        self.client.flush()
+        self.assertEqual(len(self.written), 1)
+
+    def test_paused(self):
+        """
+        Test whether no events are written to a paused client, until it is resumed
+        """
+        self.client.pauseProducing()
+        self.client.enqueue("torrent_finished", "a\n")
+        self.client.flush()
+        self.assertFalse(self.written)
+
+        self.client.resumeProducing()
+        self.assertEqual(self.written, ["a\n"])
+
+    def test_drop(self):
+        """
+        Test whether high-volume events are dropped when the queue is full
+        """
+        self.client.pauseProducing()
+        for _ in xrange(MAX_QUEUED_EVENTS + 1):
+            self.client.enqueue("search_result_torrent", "a\n")
+        self.client.enqueue("torrent_finished", "b\n")
+        self.assertEqual(self.client.dropped, 1)
+        self.assertEqual(len(self.client.queue), MAX_QUEUED_EVENTS + 1)
+
+    def test_burst(self):
+        """
+        Test whether no events are dropped for a client that is not paused, when more events arrive than fit the queue
+        """
+        for _ in xrange(MAX_QUEUED_EVENTS + 1):
+            self.client.enqueue("search_result_torrent", "a\n")
+        self.client.flush()
+        self.assertEqual(self.client.dropped, 0)
+        self.assertEqual(self.written, ["a\n" * MAX_QUEUED_EVENTS, "a\n"])
+
+    def test_merge(self):
+        """
+        Test whether only the most recent event of a merged type is written, after the events queued before it
+        """
+        self.client.enqueue("upgrader_tick", "a\n")
+        self.client.enqueue("torrent_finished", "b\n")
+        self.client.enqueue("upgrader_tick", "c\n")
+        self.client.flush()
+        self.assertEqual(self.written, ["b\nc\n"])
@@ -0,0 +1,86 @@
+import os
+from binascii import hexlify
+
+from Tribler.Core.Modules.checkpoint_store import CheckpointStore, CHECKPOINT_DB_FILENAME
+from Tribler.Core.Utilities.configparser import CallbackConfigParser
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestCheckpointStore(TriblerCoreTest):
+
+    def setUp(self):
+        super(TestCheckpointStore, self).setUp()
+        self.db_path = os.path.join(self.session_base_dir, CHECKPOINT_DB_FILENAME)
+        self.checkpoint_store = CheckpointStore(self.db_path)
+
+    def tearDown(self):
+        self.checkpoint_store.close()
+        super(TestCheckpointStore, self).tearDown()
+
+    @staticmethod
+    def create_pstate(name):
+        pstate = CallbackConfigParser()
+        pstate.add_section('state')
+        pstate.set('state', 'metainfo', {'name': name})
+        return pstate
+
+    def test_put_get(self):
+        """
+        Test whether a checkpoint can be read back before and after it has been written
+        """
+        self.checkpoint_store.put('a' * 20, self.create_pstate(u"test"))
+        self.assertEqual(self.checkpoint_store.get('a' * 20).get('state', 'metainfo'), {'name': u"test"})
+
+        self.checkpoint_store.flush()
+        self.assertIn('a' * 20, self.checkpoint_store)
+        self.assertNotIn('b' * 20, self.checkpoint_store)
+        self.assertEqual(self.checkpoint_store.get('a' * 20).get('state', 'metainfo'), {'name': u"test"})
+
+    def test_persistence(self):
+        """
+        Test whether only the checkpoints that have been flushed survive closing the store
+        """
+        self.checkpoint_store.put('a' * 20, self.create_pstate(u"a"))
+        self.checkpoint_store.put('b' * 20, self.create_pstate(u"b"))
+        self.checkpoint_store.flush()
+        self.checkpoint_store.remove('a' * 20)
+        self.checkpoint_store.close()
+
+        self.checkpoint_store = CheckpointStore(self.db_path)
+        self.assertEqual([infohash for infohash, _ in self.checkpoint_store.get_all()], ['b' * 20])
+        self.assertEqual(len(self.checkpoint_store), 1)
+
+    def test_put_new(self):
+        """
+        Test whether the first checkpoint of a download is written immediately
+        """
+        self.checkpoint_store.put('a' * 20, self.create_pstate(u"a"))
+
+        other_store = CheckpointStore(self.db_path)
+        self.assertIn('a' * 20, other_store)
+        other_store.close()
+
+    def test_closed(self):
+        """
+        Test whether a closed store does not store checkpoints and returns no checkpoints
+        """
+        self.checkpoint_store.close()
+        self.checkpoint_store.put('a' * 20, self.create_pstate(u"a"))
+        self.checkpoint_store.remove('b' * 20)
+
+        self.assertFalse(self.checkpoint_store._pending)
+        self.assertEqual(self.checkpoint_store.get_all(), [])
+        self.assertNotIn('a' * 20, self.checkpoint_store)
+
+    def test_migrate(self):
+        """
+        Test whether the checkpoints in .state files are moved into the store
+        """
+        self.create_pstate(u"a").write_file(os.path.join(self.session_base_dir, hexlify('a' * 20) + '.state'))
+        self.create_pstate(u"old").write_file(os.path.join(self.session_base_dir, hexlify('b' * 20) + '.state'))
+        self.checkpoint_store.put('b' * 20, self.create_pstate(u"new"))
+
+        self.checkpoint_store.migrate(self.session_base_dir)
+        self.assertEqual(self.checkpoint_store.get('a' * 20).get('state', 'metainfo'), {'name': u"a"})
+        self.assertEqual(self.checkpoint_store.get('b' * 20).get('state', 'metainfo'), {'name': u"new"})
+        self.assertFalse([filename for filename in os.listdir(self.session_base_dir) if filename.endswith('.state')])
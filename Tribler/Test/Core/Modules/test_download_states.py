@@ -0,0 +1,154 @@
+from Tribler.Core.DownloadState import DownloadState
+from Tribler.Core.Modules.download_states import DownloadStates, REMOVED_REVISIONS_RETENTION
+from Tribler.Core.simpledefs import DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
+
+
+class TestDownloadStates(TriblerCoreTest):
+
+    def setUp(self):
+        super(TestDownloadStates, self).setUp()
+        self.download_states = DownloadStates()
+        self.downloads = {}
+        self.built_states = []
+
+    def create_download(self, infohash, state=3, upload_rate=10, download_rate=20):
+        lt_status = MockObject()
+        lt_status.state = state
+        lt_status.paused = False
+        lt_status.error = None
+        lt_status.upload_rate = upload_rate
+        lt_status.download_rate = download_rate
+
+        tdef = MockObject()
+        tdef.get_infohash = lambda: infohash
+
+        download = MockObject()
+        download.lt_status = lt_status
+        download.get_def = lambda: tdef
+        download.get_hops = lambda: 0
+
+        def get_state():
+            self.built_states.append(infohash)
+            return DownloadState(download, download.lt_status, None)
+
+        download.get_state = get_state
+        self.downloads[infohash] = download
+        return download
+
+    def test_update_changed(self):
+        """
+        Test whether only the states of the downloads that have changed are rebuilt
+        """
+        download_a = self.create_download('a' * 20)
+        download_b = self.create_download('b' * 20)
+        self.download_states.mark_changed(download_a)
+        self.download_states.mark_changed(download_b)
+        changed, removed = self.download_states.update(self.downloads)
+        self.assertEqual(len(changed), 2)
+        self.assertFalse(removed)
+
+        self.download_states.mark_changed(download_b)
+        changed, _ = self.download_states.update(self.downloads)
+        self.assertEqual([state.get_download() for state in changed], [download_b])
+        self.assertEqual(len(self.built_states), 3)
+        self.assertEqual(len(self.download_states.get_states()), 2)
+
+        changed, _ = self.download_states.update(self.downloads)
+        self.assertFalse(changed)
+
+    def test_remove(self):
+        """
+        Test whether removed downloads are reported once, unless they have been added again
+        """
+        download_a = self.create_download('a' * 20)
+        self.download_states.mark_changed(download_a)
+        self.download_states.update(self.downloads)
+
+        self.download_states.remove('a' * 20)
+        del self.downloads['a' * 20]
+        self.download_states.mark_changed(download_a)
+        self.assertEqual(self.download_states.update(self.downloads), ([], ['a' * 20]))
+        self.assertEqual(self.download_states.update(self.downloads), ([], []))
+
+        self.download_states.mark_changed(self.create_download('a' * 20))
+        self.download_states.update(self.downloads)
+        self.download_states.remove('a' * 20)
+        self.download_states.mark_changed(self.create_download('a' * 20))
+        changed, removed = self.download_states.update(self.downloads)
+        self.assertEqual(len(changed), 1)
+        self.assertFalse(removed)
+
+    def test_summary(self):
+        """
+        Test whether the aggregate view follows the changes of the downloads
+        """
+        download_a = self.create_download('a' * 20)
+        self.download_states.mark_changed(download_a)
+        self.download_states.mark_changed(self.create_download('b' * 20, upload_rate=5, download_rate=0))
+        self.download_states.update(self.downloads)
+
+        summary = self.download_states.get_summary()
+        self.assertEqual(summary["downloads"], 2)
+        self.assertEqual(summary["status"], {DLSTATUS_DOWNLOADING: 2})
+        self.assertEqual(summary["speed_up"], 15)
+        self.assertEqual(summary["speed_down"], 20)
+
+        download_a.lt_status.state = 4
+        download_a.lt_status.download_rate = 0
+        self.download_states.mark_changed(download_a)
+        self.download_states.update(self.downloads)
+        self.download_states.remove('b' * 20)
+
+        summary = self.download_states.get_summary()
+        self.assertEqual(summary["downloads"], 1)
+        self.assertEqual(summary["status"], {DLSTATUS_SEEDING: 1})
+        self.assertEqual(summary["speed_up"], 10)
+        self.assertEqual(summary["speed_down"], 0)
+
+    def test_changes_since(self):
+        """
+        Test whether the changes since a revision contain the downloads that changed or were removed afterwards
+        """
+        download_a = self.create_download('a' * 20)
+        self.download_states.mark_changed(download_a)
+        self.download_states.mark_changed(self.create_download('b' * 20))
+        self.download_states.update(self.downloads)
+        self.assertEqual(self.download_states.revision, 1)
+
+        # Updates without changes do not increment the revision
+        self.download_states.update(self.downloads)
+        self.assertEqual(self.download_states.revision, 1)
+
+        self.download_states.mark_changed(download_a)
+        self.download_states.remove('b' * 20)
+        del self.downloads['b' * 20]
+        self.download_states.update(self.downloads)
+        self.assertEqual(self.download_states.revision, 2)
+
+        changed, removed = self.download_states.get_changes_since(0)
+        self.assertEqual(changed, ['a' * 20])
+        self.assertEqual(removed, ['b' * 20])
+        self.assertEqual(self.download_states.get_changes_since(1), (['a' * 20], ['b' * 20]))
+        self.assertEqual(self.download_states.get_changes_since(2), ([], []))
+
+    def test_removed_revisions_pruned(self):
+        """
+        Test whether removed downloads are forgotten after the retention window, after which a resync is required
+        """
+        download_a = self.create_download('a' * 20)
+        self.download_states.mark_changed(download_a)
+        self.download_states.mark_changed(self.create_download('b' * 20))
+        self.download_states.update(self.downloads)
+        self.download_states.remove('b' * 20)
+        del self.downloads['b' * 20]
+        self.download_states.update(self.downloads)
+        self.assertFalse(self.download_states.is_resync_required(1))
+
+        for _ in xrange(REMOVED_REVISIONS_RETENTION):
+            self.download_states.mark_changed(download_a)
+            self.download_states.update(self.downloads)
+
+        self.assertFalse(self.download_states.removed_revisions)
+        self.assertTrue(self.download_states.is_resync_required(1))
+        self.assertFalse(self.download_states.is_resync_required(2))
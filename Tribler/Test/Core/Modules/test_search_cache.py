@@ -0,0 +1,132 @@
+from Tribler.Core.Modules.search_cache import LocalSearchCache
+from Tribler.Core.simpledefs import NTFY_TORRENTS, NTFY_INSERT, NTFY_UPDATE, NTFY_CHANNELCAST
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
+
+TORRENT_KEYS = ['T.torrent_id', 'infohash', 'T.name']
+
+
+class TestLocalSearchCache(TriblerCoreTest):
+
+    def setUp(self):
+        super(TestLocalSearchCache, self).setUp()
+
+        self.torrent_searches = []
+        self.channel_searches = []
+
+        def search_in_local_torrents_db(query, keys=None, limit=None):
+            self.torrent_searches.append(query)
+            return [[1, 'a' * 20, query], [2, 'b' * 20, query]]
+
+        def search_in_local_channels_db(query):
+            self.channel_searches.append(query)
+            return [[1, 'c' * 20, query]]
+
+        self.search_cache = LocalSearchCache(MockObject(), max_entries=3, max_results=5)
+        self.search_cache.torrent_db = MockObject()
+        self.search_cache.torrent_db.search_in_local_torrents_db = search_in_local_torrents_db
+        self.search_cache.channel_db = MockObject()
+        self.search_cache.channel_db.search_in_local_channels_db = search_in_local_channels_db
+
+    def test_normalize_query(self):
+        """
+        Test whether queries with the same keywords share a cache entry
+        """
+        self.search_cache.search_torrents(u"ubuntu linux", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"Linux  Ubuntu", TORRENT_KEYS)
+        self.assertEqual(len(self.torrent_searches), 1)
+        self.assertEqual(self.search_cache.hits, 1)
+        self.assertEqual(self.search_cache.misses, 1)
+
+    def test_lru_eviction(self):
+        """
+        Test whether the least recently used entries are evicted first
+        """
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"two", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"three", TORRENT_KEYS)
+
+        # The total number of cached results may not exceed 5, so "two" has to go
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"two", TORRENT_KEYS)
+        self.assertEqual(self.torrent_searches, [u"one", u"two", u"three", u"two"])
+        self.assertLessEqual(self.search_cache.get_statistics()["results"], 5)
+
+    def test_expired_entry(self):
+        """
+        Test whether entries older than max_age are not returned
+        """
+        self.search_cache.max_age = -1
+        self.search_cache.search_channels(u"music")
+        self.search_cache.search_channels(u"music")
+        self.assertEqual(len(self.channel_searches), 2)
+
+    def test_update_invalidation(self):
+        """
+        Test whether updating a torrent only invalidates the results it is part of
+        """
+        self.search_cache.get_indexed_terms = lambda _: {u"two"}
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_channels(u"one")
+        self.search_cache.on_torrent_changed(NTFY_TORRENTS, NTFY_UPDATE, 'x' * 20)
+        self.assertEqual(self.search_cache.get_statistics()["entries"], 2)
+
+        self.search_cache.on_torrent_changed(NTFY_TORRENTS, NTFY_UPDATE, 'a' * 20)
+        self.assertEqual(self.search_cache.get_statistics()["entries"], 1)
+        self.assertEqual(self.search_cache.invalidations, 1)
+
+    def test_update_renamed_invalidation(self):
+        """
+        Test whether updating a torrent invalidates the searches for one of the terms it is now indexed with
+        """
+        self.search_cache.get_indexed_terms = lambda _: {u"two"}
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"two", TORRENT_KEYS)
+        self.search_cache.on_torrent_changed(NTFY_TORRENTS, NTFY_UPDATE, 'x' * 20)
+
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"two", TORRENT_KEYS)
+        self.assertEqual(self.torrent_searches, [u"one", u"two", u"two"])
+
+    def test_insert_invalidation(self):
+        """
+        Test whether inserting a torrent only invalidates the searches for one of its indexed terms
+        """
+        self.search_cache.get_indexed_terms = lambda _: {u"two", u"mp4"}
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"two", TORRENT_KEYS)
+        self.search_cache.on_torrent_changed(NTFY_TORRENTS, NTFY_INSERT, 'x' * 20)
+
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_torrents(u"two", TORRENT_KEYS)
+        self.assertEqual(self.torrent_searches, [u"one", u"two", u"two"])
+
+    def test_insert_not_indexed(self):
+        """
+        Test whether all torrent searches are dropped when the terms of an inserted torrent are unknown
+        """
+        self.search_cache.get_indexed_terms = lambda _: None
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_channels(u"one")
+        self.search_cache.on_torrent_changed(NTFY_TORRENTS, NTFY_INSERT, 'x' * 20)
+        self.assertEqual(self.search_cache.get_statistics()["entries"], 1)
+
+    def test_channel_invalidation(self):
+        """
+        Test whether a channel change drops the cached channel results
+        """
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS)
+        self.search_cache.search_channels(u"one")
+        self.search_cache.on_channels_changed(NTFY_CHANNELCAST, NTFY_UPDATE, 1)
+        self.search_cache.search_channels(u"one")
+        self.assertEqual(len(self.channel_searches), 2)
+        self.assertEqual(len(self.torrent_searches), 1)
+
+    def test_get_returns_copy(self):
+        """
+        Test whether changing the returned results does not change the cached results
+        """
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS).append(None)
+        self.search_cache.search_torrents(u"one", TORRENT_KEYS).pop()
+        self.assertEqual(len(self.search_cache.search_torrents(u"one", TORRENT_KEYS)), 2)
+        self.assertEqual(len(self.torrent_searches), 1)
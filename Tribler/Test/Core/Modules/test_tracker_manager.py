@@ -67,11 +67,11 @@ class TestTrackerManager(TriblerCoreTest):
         tracker_info = self.tracker_manager.get_tracker_info("http://test1.com/announce")
         self.assertTrue(tracker_info['is_alive'])
 
-    def test_get_tracker_for_check(self):
+    def test_get_trackers_for_check(self):
         """
-        Test whether the correct tracker is returned when fetching the next eligable tracker for the auto check
+        Test whether the correct trackers are returned when fetching the next eligable trackers for the auto check
         """
-        self.assertFalse(self.tracker_manager.get_next_tracker_for_auto_check())
+        self.assertFalse(self.tracker_manager.get_next_trackers_for_auto_check(1))
 
         self.tracker_manager.add_tracker("http://test1.com:80/announce")
-        self.assertEqual('http://test1.com/announce', self.tracker_manager.get_next_tracker_for_auto_check())
+        self.assertEqual(['http://test1.com/announce'], self.tracker_manager.get_next_trackers_for_auto_check(1))
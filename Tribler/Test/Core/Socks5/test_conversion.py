@@ -1,6 +1,7 @@
 import struct
 
-from Tribler.Core.Socks5.conversion import decode_request, IPV6AddrError
+from Tribler.Core.Socks5.conversion import decode_request, IPV6AddrError, encode_udp_packet, decode_udp_packet, \
+    ADDRESS_TYPE_IPV4, ADDRESS_TYPE_DOMAIN_NAME
 from Tribler.Test.test_as_server import AbstractServer
 
 
@@ -12,3 +13,22 @@ class TestSocks5Conversion(AbstractServer):
         """
         self.assertIsNone(decode_request(0, struct.pack("!BBBB", 5, 0, 0, 5))[1])  # Invalid address type
         self.assertRaises(IPV6AddrError, decode_request, 0, struct.pack("!BBBB", 5, 0, 0, 4))  # IPv6
+
+    def test_udp_packet(self):
+        """
+        Test the encoding and decoding of SOCKS5 UDP packets
+        """
+        for _ in range(2):
+            data = encode_udp_packet(0, 0, ADDRESS_TYPE_IPV4, "1.2.3.4", 1234, 'abc')
+            self.assertEqual(data, struct.pack("!HBB", 0, 0, 1) + "\x01\x02\x03\x04" + struct.pack("!H", 1234) + 'abc')
+
+            request = decode_udp_packet(data)
+            self.assertEqual(request.frag, 0)
+            self.assertEqual(request.address_type, ADDRESS_TYPE_IPV4)
+            self.assertEqual(request.destination, ("1.2.3.4", 1234))
+            self.assertEqual(request.payload, 'abc')
+
+        request = decode_udp_packet(encode_udp_packet(0, 1, ADDRESS_TYPE_DOMAIN_NAME, "tribler.org", 1234, 'abc'))
+        self.assertEqual(request.frag, 1)
+        self.assertEqual(request.destination, ("tribler.org", 1234))
+        self.assertEqual(request.payload, 'abc')
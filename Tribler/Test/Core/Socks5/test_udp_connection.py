@@ -1,6 +1,8 @@
 from twisted.internet.defer import inlineCallbacks
 
+from Tribler.Core.Socks5.conversion import encode_udp_packet, ADDRESS_TYPE_IPV4
 from Tribler.Core.Socks5.udp_connection import SocksUDPConnection
+from Tribler.Test.Core.base_test import MockObject
 from Tribler.Test.test_as_server import AbstractServer
 
 
@@ -33,6 +35,27 @@ class TestSocks5UDPConnection(AbstractServer):
         # Receiving data from somewhere that is not our remote address
         self.assertFalse(self.connection.datagramReceived('aaaaaa', ("1.2.3.4", 1234)))
 
+    def test_datagram_received_batch(self):
+        """
+        Test whether the datagrams received in a reactor iteration are passed on as a single batch
+        """
+        batches = []
+        self.connection.socksconnection = MockObject()
+        self.connection.socksconnection.socksserver = MockObject()
+        self.connection.socksconnection.socksserver.udp_output_stream = MockObject()
+        self.connection.socksconnection.socksserver.udp_output_stream.on_socks5_udp_batch = \
+            lambda _, requests: batches.append(requests)
+
+        for port in [1024, 1025]:
+            data = encode_udp_packet(0, 0, ADDRESS_TYPE_IPV4, "1.2.3.4", port, 'a')
+            self.assertTrue(self.connection.datagramReceived(data, ("1.1.1.1", 1234)))
+        self.assertFalse(batches)
+
+        self.connection.flush_requests()
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([request.destination for request in batches[0]], [("1.2.3.4", 1024), ("1.2.3.4", 1025)])
+        self.assertIsNone(self.connection.flush_call)
+
     def test_send_diagram(self):
         """
         Test sending a diagram over the SOCKS5 UDP connection
@@ -2,7 +2,7 @@ import socket
 import time
 
 from Tribler.Test.tools import trial_timeout
-from twisted.internet.defer import Deferred, inlineCallbacks
+from twisted.internet.defer import Deferred, inlineCallbacks, succeed
 
 from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler
 from Tribler.Core.Category.Category import Category
@@ -119,6 +119,90 @@ class TestTorrentChecker(TestAsServer):
 
         self.assertEqual(len(controlled_session.infohash_list), 1)
 
+    def test_task_select_tracker_concurrent(self):
+        """
+        Test whether several trackers are checked at the same time, up to the maximum number of concurrent scrapes
+        """
+        for index in xrange(3):
+            self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+                chr(ord('a') + index) * 20, 'ubuntu.iso', [['a.test', 1234]],
+                ['http://tracker%d.com/announce' % index], 5)
+
+        sessions = []
+
+        def create_session(tracker_url, timeout=20):
+            session = HttpTrackerSession(tracker_url, None, None, timeout)
+            session.connect_to_tracker = lambda: Deferred()
+            sessions.append(session)
+            return session
+
+        self.torrent_checker._create_session_for_request = create_session
+        self.torrent_checker._max_concurrent_scrapes = 2
+        self.torrent_checker._task_select_tracker()
+
+        self.assertEqual(len(sessions), 2)
+        self.assertNotEqual(sessions[0].tracker_url, sessions[1].tracker_url)
+        self.assertEqual(self.torrent_checker.get_statistics()['scrapes_in_flight'], 2)
+
+        # All slots are taken, so no new trackers should be checked
+        self.torrent_checker._task_select_tracker()
+        self.assertEqual(len(sessions), 2)
+
+    def test_task_select_tracker_result(self):
+        """
+        Test whether the results of an automatic tracker check are stored and counted
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+            'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
+
+        create_session = self.torrent_checker._create_session_for_request
+
+        def create_controlled_session(tracker_url, timeout=20):
+            session = create_session(tracker_url, timeout=timeout)
+            session.connect_to_tracker = lambda: succeed(
+                {tracker_url: [{'infohash': ('a' * 20).encode('hex'), 'seeders': 5, 'leechers': 3}]})
+            return session
+
+        def verify_result(_):
+            torrent = self.torrent_checker._torrent_db.getTorrent('a' * 20, (u'num_seeders', u'num_leechers'), False)
+            self.assertEqual(torrent[u'num_seeders'], 5)
+            self.assertEqual(torrent[u'num_leechers'], 3)
+
+            statistics = self.torrent_checker.get_statistics()
+            self.assertEqual(statistics['scrapes_in_flight'], 0)
+            self.assertEqual(statistics['scrapes_succeeded'], 1)
+            self.assertEqual(statistics['torrents_refreshed'], 1)
+            self.assertGreater(statistics['torrents_refreshed_per_hour'], 0)
+
+        self.torrent_checker._create_session_for_request = create_controlled_session
+        return self.torrent_checker._task_select_tracker().addCallback(verify_result)
+
+    @trial_timeout(10)
+    def test_task_select_tracker_lost_response(self):
+        """
+        Test whether the scrape slot of a tracker check is released when the response of the tracker is lost
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+            'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
+
+        create_session = self.torrent_checker._create_session_for_request
+
+        def create_controlled_session(tracker_url, timeout=20):
+            session = create_session(tracker_url, timeout=timeout)
+            # The tracker never answers
+            session.connect_to_tracker = lambda: Deferred()
+            return session
+
+        def verify_released(_):
+            statistics = self.torrent_checker.get_statistics()
+            self.assertEqual(statistics['scrapes_in_flight'], 0)
+            self.assertEqual(statistics['scrapes_failed'], 1)
+            self.assertFalse(self.torrent_checker._scrape_sessions)
+
+        self.torrent_checker._create_session_for_request = create_controlled_session
+        self.torrent_checker._scrape_watchdog_timeout = 0.1
+        return self.torrent_checker._task_select_tracker().addCallback(verify_released)
+
     @trial_timeout(30)
     def test_tracker_test_error_resolve(self):
         """
@@ -161,23 +245,23 @@ class TestTorrentChecker(TestAsServer):
         self.session.lm.tracker_manager.add_tracker('http://trackertest.com:80/announce')
         return self.torrent_checker._task_select_tracker()
 
-    def test_get_valid_next_tracker_for_auto_check(self):
-        """ Test if only valid tracker url is used for auto check """
+    def test_get_valid_next_trackers_for_auto_check(self):
+        """ Test if only valid tracker urls are used for auto check """
         test_tracker_list = ["http://anno nce.torrentsmd.com:8080/announce",
                              "http://announce.torrentsmd.com:8080/announce"]
 
-        def get_next_tracker_for_auto_check():
-            return test_tracker_list[0] if test_tracker_list else None
+        def get_next_trackers_for_auto_check(limit):
+            return test_tracker_list[:limit]
 
         def remove_tracker(tracker_url):
             test_tracker_list.remove(tracker_url)
 
-        self.torrent_checker.get_next_tracker_for_auto_check = get_next_tracker_for_auto_check
+        self.torrent_checker.get_next_trackers_for_auto_check = get_next_trackers_for_auto_check
         self.torrent_checker.remove_tracker = remove_tracker
 
-        next_tracker_url = self.torrent_checker.get_valid_next_tracker_for_auto_check()
+        next_tracker_urls = self.torrent_checker.get_valid_next_trackers_for_auto_check(2)
         self.assertEqual(len(test_tracker_list), 1)
-        self.assertEqual(next_tracker_url, "http://announce.torrentsmd.com:8080/announce")
+        self.assertEqual(next_tracker_urls, ["http://announce.torrentsmd.com:8080/announce"])
 
     def test_publish_torrent_result(self):
         MSG_ZERO_SEED_TORRENT = "Not publishing zero seeded torrents"
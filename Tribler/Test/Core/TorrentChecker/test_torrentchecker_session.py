@@ -1,3 +1,4 @@
+import random
 import struct
 from libtorrent import bencode
 from twisted.internet.defer import Deferred, inlineCallbacks
@@ -7,20 +8,22 @@ from twisted.python.failure import Failure
 from Tribler.Core.Config.tribler_config import TriblerConfig
 from Tribler.Core.Session import Session
 from Tribler.Core.TorrentChecker.session import FakeDHTSession, DHT_TRACKER_MAX_RETRIES, DHT_TRACKER_RECHECK_INTERVAL, \
-    UdpTrackerSession, HttpTrackerSession
+    UdpTrackerSession, HttpTrackerSession, UdpSocketManager, MAX_TRACKER_MULTI_SCRAPE, TRACKER_ACTION_CONNECT, \
+    TRACKER_ACTION_ERROR, TRACKER_ACTION_SCRAPE
 from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.tools import trial_timeout
 from Tribler.Test.test_as_server import TestAsServer
 
 
-class FakeUdpSocketManager(object):
+class FakeUdpSocketManager(UdpSocketManager):
     transport = 1
 
     def __init__(self):
-        self.tracker_sessions = {}
+        super(FakeUdpSocketManager, self).__init__()
+        self.sent_requests = []
 
-    def send_request(self, *args):
-        pass
+    def send_request(self, data, tracker_session):
+        self.sent_requests.append((data, tracker_session.transaction_id))
 
 
 class TestTorrentCheckerSession(TestAsServer):
@@ -279,6 +282,108 @@ class TestTorrentCheckerSession(TestAsServer):
 
         return session.result_deferred
 
+    def test_udpsession_split_scrape(self):
+        """
+        Test whether the infohashes of a UDP session are split over full scrape packets and the results are merged
+        """
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 0, self.socket_mgr)
+        session._infohash_list = [chr(index % 256) * 20 for index in xrange(MAX_TRACKER_MULTI_SCRAPE + 1)]
+        session.result_deferred = Deferred()
+        session.on_ip_address_resolved("127.0.0.1")
+        session.handle_response(struct.pack("!iiq", TRACKER_ACTION_CONNECT, session.transaction_id, 126))
+
+        scrape_requests = self.socket_mgr.sent_requests[1:]
+        self.assertEqual([len(data) for data, _ in scrape_requests],
+                         [16 + 20 * MAX_TRACKER_MULTI_SCRAPE, 16 + 20])
+
+        # Answer the last packet first
+        for data, transaction_id in reversed(scrape_requests):
+            num_infohashes = (len(data) - 16) / 20
+            session.handle_response(struct.pack("!ii" + "iii" * num_infohashes, TRACKER_ACTION_SCRAPE,
+                                                transaction_id, *([1, 2, 3] * num_infohashes)))
+
+        self.assertTrue(session.is_finished)
+
+        def verify_result(result):
+            self.assertEqual(len(result["localhost"]), MAX_TRACKER_MULTI_SCRAPE + 1)
+
+        return session.result_deferred.addCallback(verify_result)
+
+    def test_udpsession_scrape_timeout(self):
+        """
+        Test whether the timeout of a UDP session covers the scrape packets that are sent after the handshake
+        """
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5, self.socket_mgr)
+        session._infohash_list = ["a" * 20]
+        session.result_deferred = Deferred()
+        session.start_timeout()
+        session.on_ip_address_resolved("127.0.0.1")
+        session.handle_response(struct.pack("!iiq", TRACKER_ACTION_CONNECT, session.transaction_id, 126))
+
+        self.assertTrue(session.timeout_call.active())
+        session.shutdown_task_manager()
+
+    def test_udpsession_unique_transaction_id(self):
+        """
+        Test whether a UDP session does not use the transaction ID of a scrape packet of another session
+        """
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 0, self.socket_mgr)
+        self.socket_mgr.tracker_sessions[1234] = MockObject()
+
+        transaction_ids = [1234, 5678]
+        original_randint = random.randint
+        random.randint = lambda *_: transaction_ids.pop(0)
+        try:
+            session.generate_transaction_id()
+        finally:
+            random.randint = original_randint
+
+        self.assertEqual(session.transaction_id, 5678)
+        session.remove_transaction_id()
+
+    def test_udpsession_reuse_connection_id(self):
+        """
+        Test whether a UDP session skips the connect handshake when a connection ID is known for the tracker
+        """
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 0, self.socket_mgr)
+        session._infohash_list = ["a" * 20]
+        session.on_ip_address_resolved("127.0.0.1")
+        session.handle_response(struct.pack("!iiq", TRACKER_ACTION_CONNECT, session.transaction_id, 126))
+        self.assertEqual(self.socket_mgr.get_connection_id(("127.0.0.1", 4782)), 126)
+
+        self.socket_mgr.sent_requests = []
+        session2 = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 0, self.socket_mgr)
+        session2._infohash_list = ["b" * 20]
+        session2.on_ip_address_resolved("127.0.0.1")
+        self.assertEqual(len(self.socket_mgr.sent_requests), 1)
+        self.assertEqual(struct.unpack_from("!qi", self.socket_mgr.sent_requests[0][0]), (126, TRACKER_ACTION_SCRAPE))
+
+        session2.handle_response(struct.pack("!iiiii", TRACKER_ACTION_SCRAPE, session2.transaction_id, 1, 2, 3))
+        self.assertTrue(session2.is_finished)
+
+    def test_udpsession_connection_id_rejected(self):
+        """
+        Test whether a UDP session performs the handshake when the tracker rejects a reused connection ID
+        """
+        self.socket_mgr.store_connection_id(("127.0.0.1", 4782), 126)
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 0, self.socket_mgr)
+        session._infohash_list = ["a" * 20]
+        session.on_ip_address_resolved("127.0.0.1")
+        session.handle_response(struct.pack("!ii5s", TRACKER_ACTION_ERROR, session.transaction_id, "error"))
+
+        self.assertFalse(session.is_failed)
+        self.assertTrue(session.expect_connection_response)
+        self.assertIsNone(self.socket_mgr.get_connection_id(("127.0.0.1", 4782)))
+        self.assertEqual(struct.unpack_from("!qi", self.socket_mgr.sent_requests[-1][0])[1], TRACKER_ACTION_CONNECT)
+
+    def test_connection_id_expired(self):
+        """
+        Test whether connection IDs are not reused after they expired
+        """
+        self.socket_mgr.store_connection_id(("127.0.0.1", 4782), 126)
+        self.socket_mgr._connection_ids[("127.0.0.1", 4782)] = (126, 0)
+        self.assertIsNone(self.socket_mgr.get_connection_id(("127.0.0.1", 4782)))
+
     def test_http_unprocessed_infohashes(self):
         session = HttpTrackerSession("localhost", ("localhost", 8475), "/announce", 5)
         result_deffered = Deferred()
@@ -0,0 +1,84 @@
+from Tribler.Core.Utilities.term_index import TermIndex, levenshtein_distance, rank_by_distance, trigrams
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestTermIndex(TriblerCoreTest):
+
+    def test_levenshtein_distance(self):
+        self.assertEqual(levenshtein_distance(u"kitten", u"sitting"), 3)
+        self.assertEqual(levenshtein_distance(u"sitting", u"kitten"), 3)
+        self.assertEqual(levenshtein_distance(u"", u"abc"), 3)
+        self.assertEqual(levenshtein_distance(u"abc", u"abc"), 0)
+
+    def test_levenshtein_distance_max(self):
+        self.assertEqual(levenshtein_distance(u"kitten", u"sitting", max_distance=1), 2)
+        self.assertEqual(levenshtein_distance(u"a", u"abcdef", max_distance=2), 3)
+        self.assertEqual(levenshtein_distance(u"kitten", u"sitting", max_distance=3), 3)
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams(u"ab"), {u"  a", u" ab", u"ab "})
+
+    def test_suggestion_lookup(self):
+        index = TermIndex()
+        index.add({u"ubuntu", u"linux"})
+        index.add({u"ubuntu", u"server"})
+        index.add({u"kubuntu"})
+        self.assertEqual(index.lookup(u"ubunto"), [u"ubuntu", u"kubuntu"])
+        self.assertEqual(index.lookup(u"ubunto", limit=1), [u"ubuntu"])
+        self.assertEqual(index.lookup(u"ubunto", max_distance=1), [u"ubuntu"])
+        self.assertEqual(index.lookup(u"zzzz"), [])
+
+    def test_suggestion_remove(self):
+        index = TermIndex()
+        index.add({u"ubuntu", u"linux"})
+        index.add({u"ubuntu"})
+        index.remove({u"ubuntu", u"linux"})
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.lookup(u"linu"), [])
+
+        index.remove({u"ubuntu"})
+        self.assertEqual(len(index), 0)
+        self.assertFalse(index._trigram_terms)
+
+    def test_suggestion_max_terms(self):
+        index = TermIndex(max_terms=2)
+        index.add({u"one", u"two"})
+        index.add({u"three", u"one"})
+        self.assertEqual(len(index), 2)
+        self.assertNotIn(u"three", index)
+        self.assertEqual(index.term_counts[u"one"], 2)
+
+    def test_rank_by_distance(self):
+        rows = [(1, u"ubuntu server"), (2, u"kubuntu desktop"), (3, u"ubuntu desktop"), (4, u"debian")]
+        self.assertEqual(rank_by_distance(rows, [u"ubunto", u"desktop"], 2), [u"ubuntu desktop", u"kubuntu desktop"])
+        self.assertEqual(rank_by_distance(rows, [u"ubuntu"], 2), [u"ubuntu server", u"ubuntu desktop"])
+        self.assertEqual(rank_by_distance([], [u"ubuntu"], 1), [])
+
+    def test_complete(self):
+        index = TermIndex()
+        index.add({u"ubuntu", u"linux"})
+        index.add({u"ubuntu", u"server"})
+        index.add({u"ubiquity", u"unity"})
+        self.assertEqual(index.complete(u"ub"), [u"ubuntu", u"ubiquity"])
+        self.assertEqual(index.complete(u"u", limit=2), [u"ubuntu", u"ubiquity"])
+        self.assertEqual(index.complete(u"ubu"), [u"ubuntu"])
+        self.assertEqual(index.complete(u"x"), [])
+        self.assertEqual(index.complete(u""), [])
+
+    def test_complete_update(self):
+        """
+        Test whether the cached completions of short prefixes follow the changes in the index
+        """
+        index = TermIndex(max_completions=2)
+        index.add({u"ubuntu"})
+        index.add({u"ubiquity"})
+        self.assertEqual(index.complete(u"u", limit=2), [u"ubiquity", u"ubuntu"])
+
+        index.add({u"unity"})
+        index.add({u"unity"})
+        self.assertEqual(index.complete(u"u", limit=2), [u"unity", u"ubiquity"])
+
+        index.remove({u"unity"})
+        index.remove({u"unity"})
+        self.assertEqual(index.complete(u"u", limit=2), [u"ubiquity", u"ubuntu"])
+        self.assertEqual(index.get_sorted_terms(), [u"ubiquity", u"ubuntu"])
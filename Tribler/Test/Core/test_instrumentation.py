@@ -1,6 +1,7 @@
-from threading import Event, Thread
+from threading import Event, Thread, current_thread
+from time import time
 
-from Tribler.Core.Utilities.instrumentation import synchronized, WatchDog
+from Tribler.Core.Utilities.instrumentation import synchronized, WatchDog, ReactorLagMonitor
 from Tribler.Test.Core.base_test import TriblerCoreTest
 
 
@@ -127,3 +128,55 @@ class TriblerCoreTestWatchDog(TriblerCoreTest):
         Test thread names outputted by watchdog
         """
         self.assertEquals("Unknown", self.watchdog.get_thread_name(-1))
+
+
+class TriblerCoreTestReactorLagMonitor(TriblerCoreTest):
+    def setUp(self):
+        self.monitor = ReactorLagMonitor()
+
+    def tearDown(self):
+        self.monitor = None
+
+    def test_record_lag(self):
+        """
+        Test whether the lag of the reactor is added to the right bucket of the histogram
+        """
+        for lag in (0.001, 0.2, 10):
+            self.monitor.record_lag(lag)
+
+        statistics = self.monitor.get_statistics()
+        self.assertEqual(statistics["lag"]["count"], 3)
+        self.assertEqual(statistics["lag"]["max"], 10)
+        self.assertEqual([bucket["count"] for bucket in statistics["lag"]["histogram"]], [1, 0, 0, 1, 0, 0, 0, 0, 1])
+
+    def test_check_stall(self):
+        """
+        Test whether the stack of the reactor thread is only sampled when the reactor stalls
+        """
+        self.monitor.reactor_thread_id = current_thread().ident
+        self.monitor.last_heartbeat = time()
+        self.monitor.check_stall()
+        self.assertEqual(self.monitor.get_statistics()["stalls"], 0)
+
+        self.monitor.last_heartbeat = time() - 10
+        for _ in xrange(3):
+            self.monitor.check_stall()
+
+        statistics = self.monitor.get_statistics()
+        self.assertEqual(statistics["stalls"], 1)
+        self.assertEqual(sum(site["samples"] for site in statistics["stall_sites"]), 3)
+        self.assertIn("check_stall", statistics["stall_sites"][0]["frames"][0])
+
+    def test_stall_sites(self):
+        """
+        Test whether samples are aggregated per stall site
+        """
+        self.monitor.record_stall_sample(("a.py:1 a",), 1)
+        self.monitor.record_stall_sample(("b.py:1 b",), 1)
+        self.monitor.record_stall_sample(("a.py:1 a",), 2)
+
+        statistics = self.monitor.get_statistics()
+        self.assertEqual(statistics["stalls"], 2)
+        self.assertEqual(statistics["stall_sites"][0]["frames"], ["a.py:1 a"])
+        self.assertEqual(statistics["stall_sites"][0]["samples"], 2)
+        self.assertEqual(statistics["stall_sites"][0]["stalls"], 2)
@@ -1,11 +1,13 @@
 import os
+from binascii import hexlify
 
 from nose.tools import raises
 from Tribler.Test.tools import trial_timeout
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import Deferred, inlineCallbacks
 
 from Tribler.Core import NoDispersyRLock
 from Tribler.Core.APIImplementation.LaunchManyCore import TriblerLaunchMany
+from Tribler.Core.Modules.checkpoint_store import CheckpointStore, CHECKPOINT_DB_FILENAME
 from Tribler.Core.Modules.payout_manager import PayoutManager
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.Utilities.configparser import CallbackConfigParser
@@ -39,6 +41,12 @@ class TestLaunchManyCore(TriblerCoreTest):
         mock_notifier.notify = lambda *_: None
         self.lm.session.notifier = mock_notifier
 
+        self.lm.checkpoint_store = CheckpointStore(os.path.join(self.session_base_dir, CHECKPOINT_DB_FILENAME))
+
+    def tearDown(self):
+        self.lm.checkpoint_store.close()
+        return TriblerCoreTest.tearDown(self)
+
     @staticmethod
     def create_fake_download_and_state():
         """
@@ -67,15 +75,6 @@ class TestLaunchManyCore(TriblerCoreTest):
         """
         self.lm.add(TorrentDef(), None)
 
-    def test_load_download_pstate(self):
-        """
-        Testing whether a pstate is successfully loaded
-        """
-        config_file_path = os.path.abspath(os.path.join(self.DATA_DIR, u"config_files", u"config1.conf"))
-        config = self.lm.load_download_pstate(config_file_path)
-        self.assertIsInstance(config, CallbackConfigParser)
-        self.assertEqual(config.get('general', 'version'), 11)
-
     @trial_timeout(10)
     def test_dlstates_cb_error(self):
         """
@@ -130,33 +129,96 @@ class TestLaunchManyCore(TriblerCoreTest):
 
         self.assertTrue(self.lm.payout_manager.tribler_peers)
 
+    def test_dlstates_cb_finished(self):
+        """
+        Test whether a download that changes from downloading to seeding is reported as finished
+        """
+        notifications = []
+        self.lm.session.notifier.notify = lambda *args: notifications.append(args)
+        self.lm.session.checkpoint_downloads = lambda: None
+
+        fake_download, dl_state = TestLaunchManyCore.create_fake_download_and_state()
+        fake_download.get_safe_seeding = lambda: False
+        dl_state.get_status = lambda: DLSTATUS_DOWNLOADING
+        self.lm.sesscb_states_callback([dl_state])
+
+        # Downloads that did not change are not passed again
+        self.lm.sesscb_states_callback([])
+        self.assertIn('aaaa', self.lm.active_downloads)
+
+        dl_state.get_status = lambda: DLSTATUS_SEEDING
+        self.lm.sesscb_states_callback([dl_state])
+        self.assertEqual(len(notifications), 1)
+        self.assertFalse(self.lm.active_downloads)
+
+    def test_dlstates_cb_removed(self):
+        """
+        Test whether a removed download is no longer considered to be active
+        """
+        _, dl_state = TestLaunchManyCore.create_fake_download_and_state()
+        dl_state.get_status = lambda: DLSTATUS_DOWNLOADING
+        self.lm.sesscb_states_callback([dl_state])
+        self.lm.sesscb_states_callback([], ['aaaa'])
+        self.assertFalse(self.lm.active_downloads)
+        self.assertFalse(self.lm.payout_downloads)
+
+    @inlineCallbacks
     def test_load_checkpoint(self):
         """
         Test whether we are resuming downloads after loading checkpoint
         """
-        def mocked_resume_download(filename, setupDelay=3):
-            self.assertTrue(filename.endswith('abcd.state'))
-            self.assertEqual(setupDelay, 0)
+        def mocked_resume_download(infohash, setupDelay=3, checkpoint=None):
+            self.assertEqual(infohash, 'a' * 20)
+            self.assertEqual(setupDelay, 3)
+            self.assertEqual(checkpoint, (None, None, None))
             mocked_resume_download.called = True
 
         mocked_resume_download.called = False
-        self.lm.session.get_downloads_pstate_dir = lambda: self.session_base_dir
-
-        with open(os.path.join(self.lm.session.get_downloads_pstate_dir(), 'abcd.state'), 'wb') as state_file:
-            state_file.write("hi")
+        self.lm.checkpoint_store._pending[hexlify('a' * 20)] = u"hi"
 
         self.lm.initComplete = True
         self.lm.resume_download = mocked_resume_download
-        self.lm.load_checkpoint()
+        yield self.lm.load_checkpoint()
         self.assertTrue(mocked_resume_download.called)
+        self.assertEqual(self.lm.resume_statistics["checkpoints"], 1)
+        self.assertEqual(self.lm.resume_statistics["resumed"], 0)
+
+    @inlineCallbacks
+    def test_resume_downloads_priority(self):
+        """
+        Test whether checkpointed downloads that were downloading are resumed before the others
+        """
+        def create_pstate(user_stopped, resume_data):
+            pstate = CallbackConfigParser()
+            pstate.add_section('download_defaults')
+            pstate.add_section('state')
+            pstate.set('download_defaults', 'user_stopped', user_stopped)
+            pstate.set('state', 'engineresumedata', resume_data)
+            return pstate
+
+        self.lm.checkpoint_store.put('a' * 20, create_pstate(True, None))
+        self.lm.checkpoint_store.put('b' * 20, create_pstate(False, {'finished_time': 10}))
+        self.lm.checkpoint_store.put('c' * 20, create_pstate(False, {'finished_time': 0}))
+        resumed = []
+
+        self.lm.parse_checkpoint = lambda data: (None, None, CheckpointStore.deserialize(data))
+        self.lm.resume_download = lambda infohash, checkpoint: resumed.append(infohash)
+        yield self.lm.resume_downloads()
+        self.assertEqual(resumed, ['c' * 20, 'b' * 20, 'a' * 20])
+
+    @inlineCallbacks
+    def test_wait_for_handles_timeout(self):
+        """
+        Test whether the next batch of checkpointed downloads is added when libtorrent does not add a download
+        """
+        download = MockObject()
+        download.get_handle = lambda: Deferred()
+        yield self.lm.wait_for_handles([download], 0.01)
 
     def test_resume_download(self):
         with open(os.path.join(TESTS_DATA_DIR, "bak_single.torrent"), mode='rb') as torrent_file:
             torrent_data = torrent_file.read()
 
-        def mocked_load_download_pstate(_):
-            raise ValueError()
-
         def mocked_add(tdef, dscfg, pstate, **_):
             self.assertTrue(tdef)
             self.assertTrue(dscfg)
@@ -164,13 +226,12 @@ class TestLaunchManyCore(TriblerCoreTest):
             mocked_add.called = True
         mocked_add.called = False
 
-        self.lm.load_download_pstate = mocked_load_download_pstate
         self.lm.torrent_store = MockObject()
         self.lm.torrent_store.get = lambda _: torrent_data
         self.lm.add = mocked_add
         self.lm.mypref_db = MockObject()
         self.lm.mypref_db.getMyPrefStatsInfohash = lambda _: TESTS_DATA_DIR
-        self.lm.resume_download('%s.state' % ('a' * 20))
+        self.lm.resume_download('a' * 20)
         self.assertTrue(mocked_add.called)
 
 
@@ -1,4 +1,7 @@
-from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords
+from math import log
+from struct import pack
+
+from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords, bm25_score
 from Tribler.Test.Core.base_test import TriblerCoreTest
 
 
@@ -17,3 +20,12 @@ class TriblerCoreTestSearchUtils(TriblerCoreTest):
         result = filter_keywords(["to", "be", "or", "not", "to", "be"])
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), 4)
+
+    def test_bm25_score(self):
+        # one phrase, three columns, ten rows; the phrase occurs twice in the name column, present in four rows
+        matchinfo = pack('I' * 18, 1, 3, 10, 0, 0, 0, 0, 0, 0, 2, 2, 4, 0, 0, 1, 0, 0, 1)
+        score = bm25_score(matchinfo)
+        self.assertAlmostEqual(score, 0.8 * log(6.5 / 4.5, 2) * (2 * 2.2 / 3.2))
+
+        no_match = pack('I' * 18, 1, 3, 10, 0, 0, 0, 0, 0, 0, 0, 2, 4, 0, 0, 1, 0, 0, 1)
+        self.assertEqual(bm25_score(no_match), 0.0)
@@ -3,7 +3,7 @@ import shutil
 import sys
 from unittest import skipIf
 
-from apsw import SQLError, CantOpenError
+from apsw import SQLError, CantOpenError, BusyError
 from nose.tools import raises
 from twisted.internet.defer import inlineCallbacks
 
@@ -232,3 +232,100 @@ class TestSqliteCacheDB(TriblerCoreTest):
         self.sqlite_test.delete("person", lastname=("LIKE", "a"))
         one = self.sqlite_test.fetchone(u"SELECT * FROM person")
         self.assertEqual(one, ('x', 'z'))
+
+    @inlineCallbacks
+    def test_async_without_executor(self):
+        """
+        Test whether the asynchronous calls fall back to the main connection if there is no executor.
+        """
+        self.test_create_db()
+        self.sqlite_test.start_executor()
+        self.assertIsNone(self.sqlite_test.executor)
+
+        changes = yield self.sqlite_test.execute_write_async(u"INSERT INTO person VALUES (?, ?)", ('a', 'b'))
+        self.assertEqual(changes, 1)
+        changes = yield self.sqlite_test.executemany_async(u"INSERT INTO person VALUES (?, ?)",
+                                                          [('c', 'd'), ('e', 'f')])
+        self.assertEqual(changes, 2)
+        one = yield self.sqlite_test.fetchone_async(u"SELECT firstname FROM person WHERE lastname = ?", ('c',))
+        self.assertEqual(one, 'd')
+        rows = yield self.sqlite_test.fetchall_async(u"SELECT * FROM person")
+        self.assertEqual(len(rows), 3)
+
+    @inlineCallbacks
+    def test_async_with_executor(self):
+        """
+        Test whether writes are committed by the writer thread and visible to the read connections.
+        """
+        sqlite_test_2 = SQLiteCacheDB(os.path.join(self.session_base_dir, "test_db.db"), DB_SCRIPT_ABSOLUTE_PATH)
+        sqlite_test_2.initialize()
+        sqlite_test_2.initial_begin()
+        sqlite_test_2.execute_write(u"CREATE TABLE person(lastname, firstname);")
+        sqlite_test_2.commit_now()
+        sqlite_test_2.start_executor()
+        self.assertTrue(sqlite_test_2.executor.running)
+
+        deferreds = [sqlite_test_2.execute_write_async(u"INSERT INTO person VALUES (?, ?)", (str(i), str(i ** 2)))
+                     for i in xrange(100)]
+        changes = yield sqlite_test_2.executemany_async(u"INSERT INTO person VALUES (?, ?)", [('a', 'b'), ('c', 'd')])
+        self.assertEqual(changes, 2)
+        for deferred in deferreds:
+            changes = yield deferred
+            self.assertEqual(changes, 1)
+
+        one = yield sqlite_test_2.fetchone_async(u"SELECT firstname FROM person WHERE lastname = ?", ('9',))
+        self.assertEqual(one, '81')
+        rows = yield sqlite_test_2.fetchall_async(u"SELECT * FROM person")
+        self.assertEqual(len(rows), 102)
+        self.assertEqual(sqlite_test_2.executor.statistics['writes'], 101)
+        self.assertLessEqual(sqlite_test_2.executor.statistics['transactions'], 101)
+
+        sqlite_test_2.close()
+
+    @inlineCallbacks
+    def test_async_write_failure(self):
+        """
+        Test whether a failing asynchronous write does not roll back the other writes in its transaction.
+        """
+        sqlite_test_2 = SQLiteCacheDB(os.path.join(self.session_base_dir, "test_db.db"), DB_SCRIPT_ABSOLUTE_PATH)
+        sqlite_test_2.initialize()
+        sqlite_test_2.initial_begin()
+        sqlite_test_2.execute_write(u"CREATE TABLE person(lastname PRIMARY KEY, firstname);")
+        sqlite_test_2.commit_now()
+        sqlite_test_2.start_executor()
+
+        first = sqlite_test_2.execute_write_async(u"INSERT INTO person VALUES (?, ?)", ('a', 'b'))
+        second = sqlite_test_2.execute_write_async(u"INSERT INTO person VALUES (?, ?)", ('a', 'c'))
+        yield first
+        yield self.assertFailure(second, Exception)
+
+        rows = yield sqlite_test_2.fetchall_async(u"SELECT * FROM person")
+        self.assertEqual(rows, [('a', 'b')])
+
+        sqlite_test_2.close()
+
+    @inlineCallbacks
+    def test_async_write_locked(self):
+        """
+        Test whether an asynchronous write fails when the main connection does not release the write lock in time.
+        """
+        sqlite_test_2 = SQLiteCacheDB(os.path.join(self.session_base_dir, "test_db.db"), DB_SCRIPT_ABSOLUTE_PATH,
+                                      busytimeout=10)
+        sqlite_test_2.initialize()
+        sqlite_test_2.initial_begin()
+        sqlite_test_2.execute_write(u"CREATE TABLE person(lastname, firstname);")
+        sqlite_test_2.commit_now()
+        sqlite_test_2.start_executor()
+        sqlite_test_2.executor.write_lock_timeout = 0.2
+
+        # The main connection keeps its transaction, and therefore the write lock, open
+        sqlite_test_2.execute_write(u"INSERT INTO person VALUES (?, ?)", ('a', 'b'))
+        yield self.assertFailure(sqlite_test_2.execute_write_async(u"INSERT INTO person VALUES (?, ?)", ('c', 'd')),
+                                 BusyError)
+
+        # Closing commits the main connection, after which the pending writes are flushed
+        sqlite_test_2.executor.write_lock_timeout = 10
+        last = sqlite_test_2.execute_write_async(u"INSERT INTO person VALUES (?, ?)", ('e', 'f'))
+        sqlite_test_2.close()
+        changes = yield last
+        self.assertEqual(changes, 1)
@@ -114,6 +114,19 @@ class TestChannelDBHandler(AbstractDB):
         self.cdb.on_remove_torrent_from_dispersy(1, 3, False)
         self.assertIsNone(self.cdb.getTorrentFromChannelTorrentId(1, ['ChannelTorrents.dispersy_id']))
 
+    def test_queue_torrents_from_dispersy(self):
+        """
+        Testing whether queued channel torrents are deduplicated and written before they are looked up
+        """
+        infohash = str2bin('AA8cTG7ZuPsyblbRE7CyxsrKUCg=')
+        torrent = (3, 1234, None, infohash, 1337, u"test torrent", [(u"file1", 42)], [])
+        self.cdb.queue_torrents_from_dispersy([torrent])
+        self.cdb.queue_torrents_from_dispersy([torrent])
+        self.assertEqual(len(self.cdb._pending_torrents), 1)
+
+        self.assertTrue(self.cdb.get_channel_torrent_id(3, infohash))
+        self.assertFalse(self.cdb._pending_torrents)
+
     def test_search_local_channels(self):
         """
         Testing whether the right results are returned when searching in the local database for channels
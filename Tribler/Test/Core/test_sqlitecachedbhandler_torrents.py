@@ -9,6 +9,7 @@ from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler, MyPrefer
 from Tribler.Core.CacheDB.sqlitecachedb import str2bin
 from Tribler.Core.Category.Category import Category
 from Tribler.Core.TorrentDef import TorrentDef
+from Tribler.Core.Utilities.term_index import TermIndex
 from Tribler.Core.leveldbstore import LevelDbStore
 from Tribler.Test.Core.test_sqlitecachedbhandler import AbstractDB
 from Tribler.Test.common import TESTS_DATA_DIR
@@ -216,6 +217,33 @@ class TestTorrentDBHandler(AbstractDB):
                                          [], 1234)
         self.assertFalse(self.tdb.getTorrentID(infohash))
 
+    def test_queue_external_torrent_no_def(self):
+        """
+        Test whether queued torrents are only written to the database when the queue is flushed
+        """
+        infohash = unhexlify('51865489ac16e2f34ea0cd3043cfd970cc24ec09')
+        self.tdb.queue_external_torrent_no_def(infohash, "test torrent", [("file1", 42)], [], 1234)
+        self.tdb.queue_external_torrent_no_def(infohash, "test torrent", [("file1", 42)], [], 1234)
+        self.assertEqual(self.tdb.ingest_queue_size, 1)
+        self.assertFalse(self.tdb.getTorrentID(infohash))
+
+        self.tdb.flush_ingest_queue()
+        self.assertEqual(self.tdb.ingest_queue_size, 0)
+        self.assertTrue(self.tdb.hasTorrent(infohash))
+
+    def test_queue_dedupe_across_sources(self):
+        """
+        Test whether a queued infohash is written once, using the most complete information we received
+        """
+        infohash = unhexlify('52865489ac16e2f34ea0cd3043cfd970cc24ec09')
+        self.tdb.queue_torrent_collect_response([infohash])
+        self.tdb.queue_search_response([(infohash, u"search result", 42, 1, [u"other"], 1234)])
+        self.assertEqual(self.tdb.ingest_queue_size, 2)
+
+        self.tdb.flush_ingest_queue()
+        torrent_id = self.tdb.getTorrentID(infohash)
+        self.assertEqual(self.tdb.getOne('name', torrent_id=torrent_id), u"search result")
+
     def test_add_get_torrent_id(self):
         infohash = str2bin('AA8cTG7ZuPsyblbRE7CyxsrKUCg=')
         self.assertEqual(self.tdb.addOrGetTorrentID(infohash), 1)
@@ -247,11 +275,46 @@ class TestTorrentDBHandler(AbstractDB):
         self.assertEqual(res, old_res-20)
 
     def test_get_search_suggestions(self):
+        self.tdb._complete_term_index()
         self.assertEqual(self.tdb.getSearchSuggestion(["content", "cont"]), ["content 1"])
 
+    def test_get_search_suggestions_partial_index(self):
+        """
+        Test whether search suggestions do not wait for the term index to be rebuilt
+        """
+        # Start over, as if the rebuild has not run yet
+        self.tdb.term_index = TermIndex()
+        self.tdb._term_index_rowid = 0
+        self.tdb._term_index_complete = False
+
+        self.assertEqual(self.tdb.getSearchSuggestion(["content", "cont"]), [])
+        self.assertFalse(self.tdb._term_index_complete)
+
+    def test_get_search_suggestions_typo(self):
+        """
+        Test whether torrents indexed after the term index has been built are suggested for misspelled keywords
+        """
+        self.tdb._complete_term_index()
+        self.addTorrent()
+        self.assertIn(u"tribler", self.tdb.term_index)
+        self.assertEqual(self.tdb.getSearchSuggestion(["triblr"]), [u"tribler 4 1 7 src"])
+        self.assertEqual(self.tdb.getSearchSuggestion(["abc"]), [])
+
     def test_get_autocomplete_terms(self):
         self.assertEqual(len(self.tdb.getAutoCompleteTerms("content", 100)), 0)
 
+    def test_get_autocomplete_terms_prefix(self):
+        """
+        Test whether the last word of a query is completed with the terms in the term index
+        """
+        self.tdb._complete_term_index()
+        self.assertEqual(self.tdb.getAutoCompleteTerms("cont", 5), ["content"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("my cont", 5), ["my content"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("cont ", 5), [])
+
+        self.addTorrent()
+        self.assertEqual(self.tdb.getAutoCompleteTerms("trib", 5), ["tribler"])
+
     def test_get_recently_randomly_collected_torrents(self):
         self.assertEqual(len(self.tdb.getRecentlyCollectedTorrents(limit=10)), 10)
         self.assertEqual(len(self.tdb.getRandomlyCollectedTorrents(100000000, limit=10)), 3)
@@ -259,6 +322,16 @@ class TestTorrentDBHandler(AbstractDB):
     def test_get_recently_checked_torrents(self):
         self.assertEqual(len(self.tdb.getRecentlyCheckedTorrents(limit=5)), 5)
 
+    def test_update_torrents_health(self):
+        infohashes = [infohash for infohash, _, _, _ in self.tdb.getRecentlyCheckedTorrents(limit=2)]
+        self.tdb.update_torrents_health([(infohashes[0], 42, 7, 1234, u"good"),
+                                         (infohashes[1], 0, 0, 5678, u"unknown")])
+        self.assertEqual(self.tdb.get_last_tracker_checks(infohashes + ['a' * 20]),
+                         {infohashes[0]: 1234, infohashes[1]: 5678})
+        torrent = self.tdb.getTorrent(infohashes[0], keys=['num_seeders', 'num_leechers', 'status'],
+                                      include_mypref=False)
+        self.assertEqual((torrent['num_seeders'], torrent['num_leechers'], torrent['status']), (42, 7, u"good"))
+
     def test_select_torrents_to_collect(self):
         infohash = str2bin('AA8cTG7ZuPsyblbRE7CyxsrKUCg=')
         self.assertEqual(len(self.tdb.select_torrents_to_collect(infohash)), 0)
@@ -288,6 +361,17 @@ class TestTorrentDBHandler(AbstractDB):
         self.assertEqual(len(results), 4849)
         self.assertEqual(results[0][3], 493785)
 
+    def test_search_names_relevance(self):
+        """
+        Test whether SQLite ranks the torrents by relevance and only returns the best ones when a limit is given
+        """
+        columns = ['T.torrent_id', 'infohash', 'status', 'num_seeders']
+        self.tdb.channelcast_db = ChannelCastDBHandler(self.session)
+        results = self.tdb.searchNames(['content'], keys=columns, doSort=False, limit=5)
+        self.assertEqual(len(results), 5)
+        relevances = [result[len(columns) + 1] for result in results]
+        self.assertEqual(relevances, sorted(relevances, reverse=True))
+
     def test_search_local_torrents(self):
         """
         Test the search procedure in the local database when searching for torrents
@@ -298,6 +382,15 @@ class TestTorrentDBHandler(AbstractDB):
         results = self.tdb.search_in_local_torrents_db('fdsafasfds', ['infohash'])
         self.assertEqual(len(results), 0)
 
+    def test_search_local_torrents_limit(self):
+        """
+        Test whether only the best ranked torrents are returned when searching with a limit
+        """
+        results = self.tdb.search_in_local_torrents_db('content', ['infohash', 'num_seeders'], limit=10)
+        self.assertEqual(len(results), 10)
+        scores = [result[-1] for result in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
     def test_rel_score_remote_torrent(self):
         self.tdb.latest_matchinfo_torrent = struct.pack("I" * 12, *([1] * 12)), "torrent"
         self.assertNotEqual(self.tdb.relevance_score_remote_torrent("my-torrent.iso"), 0.0)
@@ -421,7 +421,7 @@ class ChannelCommunity(Community):
                                                       "trackers": message.payload.trackers,
                                                       "dispersy_cid": self._cid.encode("hex")})
 
-            self._channelcast_db.on_torrents_from_dispersy(torrentlist)
+            self._channelcast_db.queue_torrents_from_dispersy(torrentlist)
         else:
             for message in messages:
                 self._channelcast_db.newTorrent(message)
@@ -1183,6 +1183,9 @@ class ChannelCommunity(Community):
     def _get_torrent_id_from_message(self, dispersy_id):
         assert isinstance(dispersy_id, (int, long)), "dispersy_id type is '%s'" % type(dispersy_id)
 
+        # torrents are written to the database in groups, make sure the one we are looking for has been stored
+        self._channelcast_db.flush_ingest_queue()
+
         return self._channelcast_db._db.fetchone(u"SELECT id FROM _ChannelTorrents WHERE dispersy_id = ?", (dispersy_id,))
 
     def _get_latest_modification_from_channel_id(self, type_name):
@@ -1,5 +1,6 @@
 import random
 from base64 import b64decode
+from collections import OrderedDict
 
 from Tribler.Core.Modules.wallet.tc_wallet import TrustchainWallet
 from Tribler.Core.simpledefs import NTFY_MARKET_ON_ASK, NTFY_MARKET_ON_BID, NTFY_MARKET_ON_TRANSACTION_COMPLETE, \
@@ -32,7 +33,6 @@ from Tribler.community.market.reputation.temporal_pagerank_manager import Tempor
 from Tribler.pyipv8.ipv8.attestation.trustchain.community import synchronized
 from Tribler.pyipv8.ipv8.attestation.trustchain.listener import BlockListener
 from Tribler.pyipv8.ipv8.attestation.trustchain.payload import HalfBlockPairPayload
-from Tribler.pyipv8.ipv8.deprecated.bloomfilter import BloomFilter
 from Tribler.pyipv8.ipv8.deprecated.community import Community, lazy_wrapper
 from Tribler.pyipv8.ipv8.deprecated.payload import IntroductionRequestPayload, IntroductionResponsePayload
 from Tribler.pyipv8.ipv8.deprecated.payload_headers import BinMemberAuthenticationPayload
@@ -40,7 +40,8 @@ from Tribler.pyipv8.ipv8.deprecated.payload_headers import GlobalTimeDistributio
 from Tribler.pyipv8.ipv8.peer import Peer
 from Tribler.pyipv8.ipv8.requestcache import NumberCache, RandomNumberCache, RequestCache
 from twisted.internet import reactor
-from twisted.internet.defer import inlineCallbacks, succeed, Deferred, returnValue
+from twisted.internet.defer import inlineCallbacks, succeed, Deferred, returnValue, CancelledError
+from twisted.internet.threads import deferToThread
 
 
 # Message definitions
@@ -60,6 +61,12 @@ MSG_PING = 20
 MSG_PONG = 21
 MSG_MATCH_DONE = 22
 
+# The maximum number of orders sent in response to an order book synchronization
+MAX_ORDERS_PER_SYNC = 50
+
+# The maximum number of peers for which we remember where their next order book synchronization page starts
+MAX_SYNC_OFFSETS = 1000
+
 
 class ProposedTradeRequestCache(NumberCache):
     """
@@ -152,6 +159,8 @@ class MarketCommunity(Community, BlockListener):
         self.incoming_match_messages = {}  # Map of TraderId -> Message (we save all incoming matches)
         self.transaction_manager = None
         self.reputation_dict = {}
+        self.reputation_manager = TemporalPagerankReputationManager()
+        self.reputation_rowid = 0  # The rowid of the last block that has been added to the reputation manager
         self.use_local_address = False
         self.matching_enabled = True
         self.use_incremental_payments = False
@@ -159,6 +168,8 @@ class MarketCommunity(Community, BlockListener):
         self.pending_matchmaker_deferreds = []
         self.request_cache = RequestCache()
         self.cancelled_orders = set()  # Keep track of cancelled orders so we don't add them again to the orderbook.
+        # Map: peer mid -> index in the sorted order ids at which the next sync page starts, least recent sync first
+        self.sync_offsets = OrderedDict()
         self.broadcast_block = False
 
         if use_database:
@@ -318,11 +329,7 @@ class MarketCommunity(Community, BlockListener):
         self.endpoint.send(peer.address, packet)
 
     def get_orders_bloomfilter(self):
-        order_ids = [str(order_id) for order_id in self.order_book.get_order_ids()]
-        orders_bloom_filter = BloomFilter(0.005, max(len(order_ids), 1), prefix=' ')
-        if order_ids:
-            orders_bloom_filter.add_keys(order_ids)
-        return orders_bloom_filter
+        return self.order_book.get_bloom_filter()
 
     @inlineCallbacks
     def unload(self):
@@ -494,17 +501,45 @@ class MarketCommunity(Community, BlockListener):
         if not self.is_matchmaker:
             return
 
-        for order_id in self.order_book.get_order_ids():
-            if str(order_id) not in payload.bloomfilter:
-                is_ask = self.order_book.ask_exists(order_id)
-                entry = self.order_book.get_ask(order_id) if is_ask else self.order_book.get_bid(order_id)
+        self.send_orderbook_page(peer, payload.bloomfilter)
+
+    def send_orderbook_page(self, peer, bloomfilter):
+        """
+        Send the block pairs of at most MAX_ORDERS_PER_SYNC orders that are not in the bloom filter of a peer. The peer
+        includes the orders it accepts in the bloom filter of its next synchronization. Every page starts after the
+        last order that was considered for the previous page of the same peer, so orders that the peer keeps
+        rejecting do not prevent the rest of the book from being synchronized. Only the offsets of the
+        MAX_SYNC_OFFSETS peers that synchronized most recently are kept.
+        """
+        order_ids = self.order_book.get_order_ids()
+        if not order_ids:
+            return
 
-                # Send the block pair associated with this tick
-                tick_block = self.trustchain.persistence.get_block_with_hash(entry.tick.block_hash)
-                if tick_block:
-                    other_tick_block = self.trustchain.persistence.get_linked(tick_block)
-                    if other_tick_block:
-                        self.trustchain.send_block_pair(tick_block, other_tick_block, address=peer.address)
+        start = self.sync_offsets.pop(peer.mid, 0) % len(order_ids)
+        sent = 0
+        examined = 0
+        for order_id in order_ids[start:] + order_ids[:start]:
+            if sent >= MAX_ORDERS_PER_SYNC:
+                break
+            examined += 1
+            if str(order_id) in bloomfilter:
+                continue
+
+            is_ask = self.order_book.ask_exists(order_id)
+            entry = self.order_book.get_ask(order_id) if is_ask else self.order_book.get_bid(order_id)
+
+            # Send the block pair associated with this tick
+            tick_block = self.trustchain.persistence.get_block_with_hash(entry.tick.block_hash)
+            if tick_block:
+                other_tick_block = self.trustchain.persistence.get_linked(tick_block)
+                if other_tick_block:
+                    self.trustchain.send_block_pair(tick_block, other_tick_block, address=peer.address)
+                    sent += 1
+
+        self.sync_offsets[peer.mid] = (start + examined) % len(order_ids)
+        # A peer that is forgotten simply starts at the first order again
+        while len(self.sync_offsets) > MAX_SYNC_OFFSETS:
+            self.sync_offsets.popitem(last=False)
 
     def ping_peer(self, peer):
         """
@@ -1611,12 +1646,33 @@ class MarketCommunity(Community, BlockListener):
         if tick_entry_sender:
             self.match(tick_entry_sender.tick)
 
+    def get_new_tx_done_blocks(self):
+        """
+        Returns the tx_done blocks that have been added to the TrustChain database since the previous call.
+        """
+        persistence = self.trustchain.persistence
+        last_rowid = list(persistence.execute(u"SELECT MAX(rowid) FROM blocks"))[0][0] or 0
+        blocks = persistence._getall(u"WHERE type = ? AND rowid > ? AND rowid <= ?",
+                                     (u"tx_done", self.reputation_rowid, last_rowid))
+        self.reputation_rowid = last_rowid
+        return blocks
+
     def compute_reputation(self):
         """
-        Compute the reputation of peers in the community
+        Compute the reputation of peers in the community. Only the blocks that are new since the previous computation
+        are read from the database, after which the reputation is computed in the thread pool.
         """
-        rep_manager = TemporalPagerankReputationManager(self.trustchain.persistence.get_all_blocks())
-        self.reputation_dict = rep_manager.compute(self.my_peer.public_key.key_to_bin())
+        self.reputation_manager.add_blocks(self.get_new_tx_done_blocks())
+
+        def on_reputation(reputation_dict):
+            self.reputation_dict = reputation_dict
+            return reputation_dict
+
+        # A computation that is still running is superseded by this one
+        self.cancel_pending_task("compute_reputation")
+        deferred = deferToThread(self.reputation_manager.compute, self.my_peer.public_key.key_to_bin())
+        deferred.addCallback(on_reputation).addErrback(lambda failure: failure.trap(CancelledError))
+        return self.register_task("compute_reputation", deferred)
 
 
 class MarketTestnetCommunity(MarketCommunity):
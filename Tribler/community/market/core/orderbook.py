@@ -14,8 +14,14 @@ from Tribler.community.market.core.side import Side
 from Tribler.community.market.core.tick import Tick, Ask, Bid
 from Tribler.community.market.core.timeout import Timeout
 from Tribler.community.market.core.timestamp import Timestamp
+from Tribler.pyipv8.ipv8.deprecated.bloomfilter import BloomFilter
 from Tribler.pyipv8.ipv8.taskmanager import TaskManager
 
+# The false positive rate of the bloom filter with the order ids in the order book
+BLOOM_FILTER_ERROR_RATE = 0.005
+# The minimum number of order ids for which the bloom filter is created
+MIN_BLOOM_FILTER_CAPACITY = 64
+
 
 class OrderBook(TaskManager):
     """
@@ -31,6 +37,10 @@ class OrderBook(TaskManager):
         self._asks = Side()
         self.completed_orders = set()
 
+        self._bloom_filter = None
+        self._bloom_filter_capacity = 0
+        self._bloom_filter_keys = 0  # The number of order ids added since the bloom filter was created
+
     def timeout_ask(self, order_id):
         ask = self.get_ask(order_id).tick
         self.remove_tick(order_id)
@@ -53,6 +63,7 @@ class OrderBook(TaskManager):
         """
         if not self._asks.tick_exists(ask.order_id) and ask.order_id not in self.completed_orders and ask.is_valid():
             self._asks.insert_tick(ask)
+            self._add_to_bloom_filter(ask.order_id)
             timeout_delay = float(ask.timestamp) + int(ask.timeout) - time.time()
             task = deferLater(reactor, timeout_delay, self.timeout_ask, ask.order_id)
             self.register_task("ask_%s_timeout" % ask.order_id, task)
@@ -73,6 +84,7 @@ class OrderBook(TaskManager):
         """
         if not self._bids.tick_exists(bid.order_id) and bid.order_id not in self.completed_orders and bid.is_valid():
             self._bids.insert_tick(bid)
+            self._add_to_bloom_filter(bid.order_id)
             timeout_delay = float(bid.timestamp) + int(bid.timeout) - time.time()
             task = deferLater(reactor, timeout_delay, self.timeout_bid, bid.order_id)
             self.register_task("bid_%s_timeout" % bid.order_id, task)
@@ -312,6 +324,37 @@ class OrderBook(TaskManager):
         """
         return self._asks.get_min_price_list(price_wallet_id, quantity_wallet_id)
 
+    def _add_to_bloom_filter(self, order_id):
+        if self._bloom_filter is None:
+            return
+
+        if self._bloom_filter_keys >= self._bloom_filter_capacity:
+            # Adding more order ids would exceed the false positive rate, so the filter is created again when needed
+            self._bloom_filter = None
+        else:
+            self._bloom_filter.add(str(order_id))
+            self._bloom_filter_keys += 1
+
+    def get_bloom_filter(self):
+        """
+        Return a bloom filter with the ids of the orders in the order book.
+
+        The filter is updated when ticks are inserted, and only created again when it is full. Order ids of ticks that
+        have been removed remain in the filter until then, which is harmless for the order book synchronization: a
+        peer does not send us an order that we already had.
+
+        :rtype: BloomFilter
+        """
+        if self._bloom_filter is None:
+            order_ids = [str(order_id) for order_id in self.get_order_ids()]
+            # Leave room for as many new orders as there are orders in the book
+            self._bloom_filter_capacity = max(2 * len(order_ids), MIN_BLOOM_FILTER_CAPACITY)
+            self._bloom_filter = BloomFilter(BLOOM_FILTER_ERROR_RATE, self._bloom_filter_capacity, prefix=' ')
+            if order_ids:
+                self._bloom_filter.add_keys(order_ids)
+            self._bloom_filter_keys = len(order_ids)
+        return self._bloom_filter
+
     def get_order_ids(self):
         """
         Return all IDs of the orders in the orderbook, both asks and bids. The returned list is sorted.
@@ -1,31 +1,62 @@
+from bisect import bisect_left
+
 from Tribler.community.market.core.pricelevel import PriceLevel
 
 
 class PriceLevelList(object):
     """
     Sorted doubly linked dictionary implementation.
+
+    The prices are kept in a sorted list, in which a price is found or inserted with a binary search. Every price is
+    also linked to its predecessor and successor, so the matching engine walks from one price level to the next in
+    constant time.
     """
 
     def __init__(self):
         super(PriceLevelList, self).__init__()
         self._price_list = []
         self._price_level_dictionary = {}
+        self._prev_price = {}  # Map: Price -> preceding Price (or None)
+        self._succ_price = {}  # Map: Price -> succeeding Price (or None)
+
+    def __len__(self):
+        return len(self._price_list)
 
     def insert(self, price_level):
         """
         :type price_level: PriceLevel
         """
-        self._price_list.append(price_level.price)
-        self._price_list.sort()
-        self._price_level_dictionary[price_level.price] = price_level
+        price = price_level.price
+        index = bisect_left(self._price_list, price)
+        self._price_list.insert(index, price)
+        self._price_level_dictionary[price] = price_level
+
+        prev_price = self._price_list[index - 1] if index > 0 else None
+        succ_price = self._price_list[index + 1] if index + 1 < len(self._price_list) else None
+        self._prev_price[price] = prev_price
+        self._succ_price[price] = succ_price
+        if prev_price is not None:
+            self._succ_price[prev_price] = price
+        if succ_price is not None:
+            self._prev_price[succ_price] = price
 
     def remove(self, price):
         """
         :type price: Price
         """
-        self._price_list.remove(price)
+        if price not in self._price_level_dictionary:
+            raise ValueError("Price level %s not in list" % price)
+
+        del self._price_list[bisect_left(self._price_list, price)]
         del self._price_level_dictionary[price]
 
+        prev_price = self._prev_price.pop(price)
+        succ_price = self._succ_price.pop(price)
+        if prev_price is not None:
+            self._succ_price[prev_price] = succ_price
+        if succ_price is not None:
+            self._prev_price[succ_price] = prev_price
+
     def succ_item(self, price):
         """
         Returns the price level where price_level.price is successor to given price
@@ -33,10 +64,9 @@ class PriceLevelList(object):
         :type price: Price
         :rtype: PriceLevel
         """
-        index = self._price_list.index(price) + 1
-        if index >= len(self._price_list):
+        succ_price = self._succ_price[price]
+        if succ_price is None:
             raise IndexError
-        succ_price = self._price_list[index]
         return self._price_level_dictionary[succ_price]
 
     def prev_item(self, price):
@@ -46,10 +76,9 @@ class PriceLevelList(object):
         :type price: Price
         :rtype: PriceLevel
         """
-        index = self._price_list.index(price) - 1
-        if index < 0:
+        prev_price = self._prev_price[price]
+        if prev_price is None:
             raise IndexError
-        prev_price = self._price_list[index]
         return self._price_level_dictionary[prev_price]
 
     def min_key(self):
@@ -76,13 +105,8 @@ class PriceLevelList(object):
         :type reverse: bool
         :rtype: List[(Price, PriceLevel)]
         """
-        items = []
-        for price in self._price_list:
-            if reverse:
-                items.insert(0, self._price_level_dictionary[price])
-            else:
-                items.append(self._price_level_dictionary[price])
-        return items
+        prices = reversed(self._price_list) if reverse else self._price_list
+        return [self._price_level_dictionary[price] for price in prices]
 
     def get_ticks_list(self):
         """
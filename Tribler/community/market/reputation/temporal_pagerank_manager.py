@@ -1,64 +1,147 @@
-import networkx as nx
+from threading import RLock
+
+import numpy as np
+import scipy.sparse
 
 from Tribler.community.market.reputation.reputation_manager import ReputationManager
 from Tribler.pyipv8.ipv8.attestation.trustchain.block import UNKNOWN_SEQ
 
+# The damping factor of the PageRank computation
+ALPHA = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1.0e-6
 
-class TemporalPagerankReputationManager(ReputationManager):
 
-    def compute(self, own_public_key):
+class TemporalPagerankReputationManager(ReputationManager):
+    """
+    Computes the reputation with the Temporal PageRank algorithm.
+
+    The interaction graph is built incrementally: add_blocks only adds the interactions of blocks that have not been
+    added before, and the weighted adjacency matrix is kept as a sparse matrix. Every computation starts the power
+    iteration from the scores of the previous computation, so it converges in a few iterations when the graph has
+    only changed a little. The computation can run in another thread while blocks are added.
+    """
+
+    def __init__(self, blocks=()):
+        super(TemporalPagerankReputationManager, self).__init__(blocks)
+        self.lock = RLock()
+
+        self.block_ids = set()  # Set of (public key, sequence number) of the blocks that have been added
+        self.node_index = {}  # Map: (public key, sequence number) -> index of the node in the adjacency matrix
+        self.nodes = []  # The (public key, sequence number) of every node, in the order of the adjacency matrix
+        self.contributions = {}  # Map: (index of source, index of target) -> contribution of the edge
+        self.matrix = None  # The adjacency matrix, or None if it has to be rebuilt
+        self.scores = {}  # Map: (public key, sequence number) -> score in the previous computation
+
+        self.add_blocks(blocks)
+
+    def _get_node(self, node):
+        index = self.node_index.get(node)
+        if index is None:
+            index = self.node_index[node] = len(self.nodes)
+            self.nodes.append(node)
+        return index
+
+    def _add_edge(self, source, target, contribution):
+        self.contributions[(self._get_node(source), self._get_node(target))] = contribution
+
+    def add_blocks(self, blocks):
         """
-        Compute the reputation based on the data in the TrustChain database using the Temporal PageRank algorithm.
+        Add the interactions in the given blocks to the interaction graph.
+        :return: the number of interactions that have been added
         """
+        added = 0
+        with self.lock:
+            for block in blocks:
+                if block.link_sequence_number == UNKNOWN_SEQ or block.type != 'tx_done' \
+                        or 'tx' not in block.transaction:
+                    continue  # Don't consider half interactions
 
-        nodes = set()
-        G = nx.DiGraph()
+                block_id = (block.public_key, block.sequence_number)
+                if block_id in self.block_ids:
+                    continue
+                self.block_ids.add(block_id)
 
-        for block in self.blocks:
-            if block.link_sequence_number == UNKNOWN_SEQ or block.type != 'tx_done' \
-                    or 'tx' not in block.transaction:
-                continue  # Don't consider half interactions
+                pubkey_requester = block.link_public_key
+                pubkey_responder = block.public_key
 
-            pubkey_requester = block.link_public_key
-            pubkey_responder = block.public_key
+                sequence_number_requester = block.link_sequence_number
+                sequence_number_responder = block.sequence_number
 
-            sequence_number_requester = block.link_sequence_number
-            sequence_number_responder = block.sequence_number
+                # In our market, we consider the amount of Bitcoin that have been transferred from A -> B.
+                # For now, we assume that the value from B -> A is of equal worth.
 
-            # In our market, we consider the amount of Bitcoin that have been transferred from A -> B.
-            # For now, we assume that the value from B -> A is of equal worth.
+                value_exchange = block.transaction["tx"]["transferred"]["first"]["amount"]
 
-            value_exchange = block.transaction["tx"]["transferred"]["first"]["amount"]
+                self._add_edge((pubkey_requester, sequence_number_requester),
+                               (pubkey_requester, sequence_number_requester + 1), value_exchange)
+                self._add_edge((pubkey_requester, sequence_number_requester),
+                               (pubkey_responder, sequence_number_responder + 1), value_exchange)
 
-            G.add_edge((pubkey_requester, sequence_number_requester), (pubkey_requester, sequence_number_requester + 1),
-                       contribution=value_exchange)
-            G.add_edge((pubkey_requester, sequence_number_requester), (pubkey_responder, sequence_number_responder + 1),
-                       contribution=value_exchange)
+                self._add_edge((pubkey_responder, sequence_number_responder),
+                               (pubkey_responder, sequence_number_responder + 1), value_exchange)
+                self._add_edge((pubkey_responder, sequence_number_responder),
+                               (pubkey_requester, sequence_number_requester + 1), value_exchange)
+                added += 1
 
-            G.add_edge((pubkey_responder, sequence_number_responder), (pubkey_responder, sequence_number_responder + 1),
-                       contribution=value_exchange)
-            G.add_edge((pubkey_responder, sequence_number_responder), (pubkey_requester, sequence_number_requester + 1),
-                       contribution=value_exchange)
+            if added:
+                self.matrix = None
+        return added
 
-            nodes.add(pubkey_requester)
-            nodes.add(pubkey_responder)
+    def _get_matrix(self):
+        """
+        Returns the adjacency matrix, with every row normalized to sum to one, and a mask of the dangling nodes.
+        """
+        if self.matrix is None:
+            num_nodes = len(self.nodes)
+            rows, columns = zip(*self.contributions.keys())
+            matrix = scipy.sparse.csr_matrix((np.array(self.contributions.values(), dtype=float), (rows, columns)),
+                                             shape=(num_nodes, num_nodes))
+            out_weights = np.asarray(matrix.sum(axis=1)).flatten()
+            is_dangling = out_weights == 0
+            out_weights[is_dangling] = 1.0
+            self.matrix = (scipy.sparse.spdiags(1.0 / out_weights, 0, num_nodes, num_nodes) * matrix, is_dangling)
+        return self.matrix
 
-        personal_nodes = [node1 for node1 in G.nodes() if node1[0] == own_public_key]
-        number_of_nodes = len(personal_nodes)
-        if number_of_nodes == 0:
+    def compute(self, own_public_key):
+        """
+        Compute the reputation based on the data in the TrustChain database using the Temporal PageRank algorithm.
+        """
+        with self.lock:
+            personal_nodes = [index for index, node in enumerate(self.nodes) if node[0] == own_public_key]
+            if not personal_nodes:
+                return {}
+            matrix, is_dangling = self._get_matrix()
+            nodes = list(self.nodes)
+            previous_scores = self.scores
+
+        num_nodes = len(nodes)
+        personalisation = np.zeros(num_nodes)
+        personalisation[personal_nodes] = 1.0 / len(personal_nodes)
+
+        # Warm start from the scores of the previous computation, in which the nodes that have been added since had no
+        # score yet
+        scores = np.array([previous_scores.get(node, 0.0) for node in nodes])
+        if scores.sum() > 0:
+            scores /= scores.sum()
+        else:
+            scores = personalisation.copy()
+
+        for _ in xrange(MAX_ITERATIONS):
+            last_scores = scores
+            scores = ALPHA * (scores * matrix + scores[is_dangling].sum() * personalisation) + \
+                     (1 - ALPHA) * personalisation
+            if np.absolute(scores - last_scores).sum() < num_nodes * TOLERANCE:
+                break
+        else:
+            self._logger.info("Temporal PageRank did not converge, returning empty scores")
             return {}
-        personalisation = {node_name: 1.0 / number_of_nodes if node_name in personal_nodes else 0
-                           for node_name in G.nodes()}
 
-        try:
-            result = nx.pagerank_scipy(G, personalization=personalisation, weight='contribution')
-        except nx.NetworkXException:
-            self._logger.info("Empty Temporal PageRank, returning empty scores")
-            return {}
+        with self.lock:
+            self.scores = dict(zip(nodes, scores))
 
         sums = {}
-
-        for interaction in result.keys():
-            sums[interaction[0]] = sums.get(interaction[0], 0) + result[interaction]
+        for node, score in zip(nodes, scores):
+            sums[node[0]] = sums.get(node[0], 0) + float(score)
 
         return sums
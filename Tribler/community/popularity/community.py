@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from twisted.internet.defer import inlineCallbacks
 
 from Tribler.Core.simpledefs import SIGNAL_SEARCH_COMMUNITY, SIGNAL_ON_SEARCH_RESULTS
@@ -5,10 +7,12 @@ from Tribler.community.popularity.constants import MSG_TORRENT_HEALTH_RESPONSE,
     MSG_TORRENT_INFO_REQUEST, MSG_TORRENT_INFO_RESPONSE, \
     ERROR_UNKNOWN_RESPONSE, MAX_PACKET_PAYLOAD_SIZE, ERROR_UNKNOWN_PEER, ERROR_NO_CONTENT, \
     MSG_CONTENT_INFO_REQUEST, \
-    SEARCH_TORRENT_REQUEST, MSG_CONTENT_INFO_RESPONSE, SEARCH_TORRENT_RESPONSE
+    SEARCH_TORRENT_REQUEST, MSG_CONTENT_INFO_RESPONSE, SEARCH_TORRENT_RESPONSE, MSG_TORRENT_HEALTH_BATCH_RESPONSE, \
+    MAX_HEALTH_PAYLOAD_SIZE, PUBLISH_BUDGET, MSG_TORRENT_HEALTH_BATCH_SUPPORT
 from Tribler.community.popularity.payload import TorrentHealthPayload, ContentSubscription, TorrentInfoRequestPayload, \
     TorrentInfoResponsePayload, SearchResponseItemPayload, \
-    ContentInfoRequest, Pagination, ContentInfoResponse, decode_values
+    ContentInfoRequest, Pagination, ContentInfoResponse, decode_values, TorrentHealthBatchPayload, \
+    TorrentHealthBatchSupportPayload
 from Tribler.community.popularity.pubsub import PubSubCommunity
 from Tribler.community.popularity.repository import ContentRepository, TYPE_TORRENT_HEALTH
 from Tribler.community.popularity.request import ContentRequest
@@ -35,9 +39,14 @@ class PopularityCommunity(PubSubCommunity):
         super(PopularityCommunity, self).__init__(*args, **kwargs)
 
         self.content_repository = ContentRepository(self.torrent_db, self.channel_db)
+        # Peers that announced that they receive the health of torrents in batches. Other peers run an older version
+        # and are sent a torrent health response per torrent.
+        self.batch_subscribers = set()
 
         self.decode_map.update({
             chr(MSG_TORRENT_HEALTH_RESPONSE): self.on_torrent_health_response,
+            chr(MSG_TORRENT_HEALTH_BATCH_RESPONSE): self.on_torrent_health_batch_response,
+            chr(MSG_TORRENT_HEALTH_BATCH_SUPPORT): self.on_torrent_health_batch_support,
             chr(MSG_CHANNEL_HEALTH_RESPONSE): self.on_channel_health_response,
             chr(MSG_TORRENT_INFO_REQUEST): self.on_torrent_info_request,
             chr(MSG_TORRENT_INFO_RESPONSE): self.on_torrent_info_response,
@@ -61,6 +70,19 @@ class PopularityCommunity(PubSubCommunity):
         # Publish the latest torrents to the subscriber
         if subscribed:
             self.publish_latest_torrents(peer=peer)
+        else:
+            self.batch_subscribers.discard(peer)
+
+    def subscribe(self, peer, subscribe=True):
+        # Announce the support for batches before subscribing, so the first torrents are already published in batches
+        if subscribe:
+            self.send_torrent_health_batch_support(peer)
+        super(PopularityCommunity, self).subscribe(peer, subscribe=subscribe)
+
+    def refresh_peer_list(self):
+        super(PopularityCommunity, self).refresh_peer_list()
+        peers = self.get_peers()
+        self.batch_subscribers = set([peer for peer in self.batch_subscribers if peer in peers])
 
     def on_torrent_health_response(self, source_address, data):
         """
@@ -84,6 +106,43 @@ class PopularityCommunity(PubSubCommunity):
         peer_trust = self.trustchain.get_trust(peer) if self.trustchain else 0
         self.content_repository.update_torrent_health(payload, peer_trust)
 
+    def on_torrent_health_batch_response(self, source_address, data):
+        """
+        Message handler for the health of several torrents, which is received from a publisher like a torrent health
+        response. The health of all torrents is updated in the database at once, and the information of the torrents
+        that are not in the database is requested.
+        """
+        self.logger.debug("Got torrent health batch response from %s", source_address)
+        auth, _, payload = self._ez_unpack_auth(TorrentHealthBatchPayload, data)
+        peer = self.get_peer_from_auth(auth, source_address)
+
+        if peer not in self.publishers:
+            self.logger.error(ERROR_UNKNOWN_RESPONSE)
+            return
+
+        health_list, _ = self.serializer.unpack_multiple_as_list(TorrentHealthPayload.format_list, payload.health)
+        health_payloads = [TorrentHealthPayload.from_unpack_list(*health) for health in health_list]
+
+        peer_trust = self.trustchain.get_trust(peer) if self.trustchain else 0
+        for infohash in self.content_repository.update_torrents_health(health_payloads, peer_trust):
+            self.send_torrent_info_request(infohash, peer=peer)
+
+    def on_torrent_health_batch_support(self, source_address, data):
+        """
+        Message handler for the announcement of a peer that it receives the health of torrents in batches.
+        """
+        auth, _, payload = self._ez_unpack_auth(TorrentHealthBatchSupportPayload, data)
+        peer = self.get_peer_from_auth(auth, source_address)
+
+        if peer not in self.get_peers():
+            self.logger.error(ERROR_UNKNOWN_PEER)
+            return
+
+        if payload.supported:
+            self.batch_subscribers.add(peer)
+        else:
+            self.batch_subscribers.discard(peer)
+
     def on_channel_health_response(self, source_address, data):
         """
         Message handler for channel health response. Currently, not sure how to handle it.
@@ -172,6 +231,44 @@ class PopularityCommunity(PubSubCommunity):
         packet = self.create_message_packet(MSG_TORRENT_HEALTH_RESPONSE, payload)
         self.broadcast_message(packet, peer=peer)
 
+    def send_torrent_health_batch(self, health_payloads, peer=None):
+        """
+        Method to send the health of several torrents, packed in as few messages as fit in the MTU. These messages are
+        sent to all the subscribers by default but if a peer is specified then only that peer receives them.
+        Peers that did not announce that they support batches receive a torrent health response per torrent instead.
+        """
+        if peer and peer not in self.get_peers():
+            self.logger.error(ERROR_UNKNOWN_PEER)
+            return
+
+        receivers = [peer] if peer else list(self.subscribers)
+        batch_receivers = [receiver for receiver in receivers if receiver in self.batch_subscribers]
+        single_receivers = [receiver for receiver in receivers if receiver not in self.batch_subscribers]
+
+        current_index = 0
+        while batch_receivers and current_index < len(health_payloads):
+            serialized_health, current_index, _ = self.pack_sized(health_payloads, MAX_HEALTH_PAYLOAD_SIZE,
+                                                                  start_index=current_index)
+            if not serialized_health:
+                break
+            packet = self.create_message_packet(MSG_TORRENT_HEALTH_BATCH_RESPONSE,
+                                                TorrentHealthBatchPayload(serialized_health))
+            for receiver in batch_receivers:
+                self.broadcast_message(packet, peer=receiver)
+
+        if single_receivers:
+            for payload in health_payloads:
+                packet = self.create_message_packet(MSG_TORRENT_HEALTH_RESPONSE, payload)
+                for receiver in single_receivers:
+                    self.broadcast_message(packet, peer=receiver)
+
+    def send_torrent_health_batch_support(self, peer):
+        """
+        Method to announce to a publisher that the health of torrents can be sent to us in batches.
+        """
+        packet = self.create_message_packet(MSG_TORRENT_HEALTH_BATCH_SUPPORT, TorrentHealthBatchSupportPayload(True))
+        self.broadcast_message(packet, peer=peer)
+
     def send_channel_health_response(self, payload, peer=None):
         """
         Method to send channel health response. This message is sent to all the subscribers by default but if a
@@ -274,25 +371,29 @@ class PopularityCommunity(PubSubCommunity):
 
     def publish_next_content(self):
         """
-        Publishes the next content from the queue to the subscribers.
+        Publishes the next content from the queue to the subscribers, up to the publishing budget per cycle.
         Does nothing if there are none subscribers.
-        Only Torrent health response is published at the moment.
+        Only Torrent health response is published at the moment, in as few messages as possible.
         """
         self.logger.info("Content to publish: %d", self.content_repository.count_content())
         if not self.subscribers:
             self.logger.info("No subscribers found. Not publishing anything")
             return
 
-        content_type, content = self.content_repository.pop_content()
-        if content_type is None:
+        contents = self.content_repository.pop_contents(PUBLISH_BUDGET)
+        if not contents:
             self.logger.error(ERROR_NO_CONTENT)
             return
 
-        self.logger.info("Publishing content[type:%d]", content_type)
-        if content_type == TYPE_TORRENT_HEALTH:
-            infohash, seeders, leechers, timestamp = content
-            payload = TorrentHealthPayload(infohash, seeders, leechers, timestamp)
-            self.send_torrent_health_response(payload)
+        self.logger.info("Publishing %d content items", len(contents))
+        health_payloads = OrderedDict()
+        for content_type, content in contents:
+            if content_type == TYPE_TORRENT_HEALTH:
+                infohash, seeders, leechers, timestamp = content
+                # The most recent health of a torrent is popped first
+                if infohash not in health_payloads:
+                    health_payloads[infohash] = TorrentHealthPayload(infohash, seeders, leechers, timestamp)
+        self.send_torrent_health_batch(health_payloads.values())
 
     def publish_latest_torrents(self, peer):
         """
@@ -300,10 +401,8 @@ class PopularityCommunity(PubSubCommunity):
         """
         torrents = self.content_repository.get_top_torrents()
         self.logger.info("Publishing %d torrents to peer %s", len(torrents), peer)
-        for torrent in torrents:
-            infohash, seeders, leechers, timestamp = torrent[:4]
-            payload = TorrentHealthPayload(infohash, seeders, leechers, timestamp)
-            self.send_torrent_health_response(payload, peer=peer)
+        health_payloads = [TorrentHealthPayload(*torrent[:4]) for torrent in torrents]
+        self.send_torrent_health_batch(health_payloads, peer=peer)
 
     def queue_content(self, content_type, content):
         """
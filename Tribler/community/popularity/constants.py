@@ -9,10 +9,14 @@ MSG_SEARCH_REQUEST = 7
 MSG_SEARCH_RESPONSE = 8
 MSG_CONTENT_INFO_REQUEST = 9
 MSG_CONTENT_INFO_RESPONSE = 10
+MSG_TORRENT_HEALTH_BATCH_RESPONSE = 11
+MSG_TORRENT_HEALTH_BATCH_SUPPORT = 12
 
 MAX_SUBSCRIBERS = 10
 MAX_PUBLISHERS = 10
 PUBLISH_INTERVAL = 5
+# Maximum number of torrent health records published per publishing cycle
+PUBLISH_BUDGET = 100
 
 TORRENT_SEARCH_RESPONSE_TYPE = 0
 CHANNEL_SEARCH_RESPONSE_TYPE = 1
@@ -29,6 +33,8 @@ SEARCH_CHANNEL_RESPONSE = 14
 
 # Maximum packet payload size in bytes
 MAX_PACKET_PAYLOAD_SIZE = 500
+# Maximum size in bytes of the torrent health records in a message, so the packet fits in the MTU of 1500 bytes
+MAX_HEALTH_PAYLOAD_SIZE = 1200
 
 # Error definitions
 ERROR_UNKNOWN_PEER = "Unknown peer! No response sent"
@@ -64,6 +64,46 @@ class TorrentHealthPayload(Payload):
         return TorrentHealthPayload(infohash, num_seeders, num_leechers, timestamp)
 
 
+class TorrentHealthBatchPayload(Payload):
+    """
+    Payload for the health of several torrents, as a concatenation of serialized TorrentHealthPayloads.
+    """
+
+    format_list = ['varlenH']
+
+    def __init__(self, health):
+        super(TorrentHealthBatchPayload, self).__init__()
+        self.health = health
+
+    def to_pack_list(self):
+        return [('varlenH', self.health)]
+
+    @classmethod
+    def from_unpack_list(cls, *args):
+        (health,) = args
+        return TorrentHealthBatchPayload(health)
+
+
+class TorrentHealthBatchSupportPayload(Payload):
+    """
+    Payload for announcing to a publisher whether the health of torrents can be received in batches.
+    """
+
+    format_list = ['?']
+
+    def __init__(self, supported):
+        super(TorrentHealthBatchSupportPayload, self).__init__()
+        self.supported = supported
+
+    def to_pack_list(self):
+        return [('?', self.supported)]
+
+    @classmethod
+    def from_unpack_list(cls, *args):
+        (supported,) = args
+        return TorrentHealthBatchSupportPayload(supported)
+
+
 class ChannelHealthPayload(Payload):
     """
     Payload for a channel popularity message in the popularity community.
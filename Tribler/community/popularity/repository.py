@@ -42,6 +42,15 @@ class ContentRepository(object):
     def pop_content(self):
         return self.queue.pop() if self.queue else (None, None)
 
+    def pop_contents(self, limit):
+        """
+        Pops up to limit items from the queue, the most recently added item first.
+        """
+        contents = []
+        while self.queue and len(contents) < limit:
+            contents.append(self.queue.pop())
+        return contents
+
     def get_top_torrents(self, limit=DEFAULT_TORRENT_LIMIT):
         return self.torrent_db.getRecentlyCheckedTorrents(limit)
 
@@ -58,8 +67,8 @@ class ContentRepository(object):
             return
 
         infohash = torrent_health_payload.infohash
-        if self.has_torrent(infohash):
-            db_torrent = self.get_torrent(infohash)
+        db_torrent = self.get_torrent(infohash)
+        if db_torrent is not None:
             is_fresh = time.time() - db_torrent['last_tracker_check'] < DEFAULT_FRESHNESS_LIMIT
             if is_fresh and peer_trust < 2:
                 self.logger.info("Database record is already fresh and the sending peer trust "
@@ -69,6 +78,30 @@ class ContentRepository(object):
         # Update the torrent health anyway. A torrent info request should be sent separately to request additional info.
         update_torrent(self.torrent_db, torrent_health_payload)
 
+    def update_torrents_health(self, torrent_health_payloads, peer_trust=0):
+        """
+        Updates the health of several torrents with a single read and a single write of the database. Like in
+        update_torrent_health, fresh database records are only updated by peers with a high trust score.
+        :return: the infohashes of the torrents that are not in the database.
+        """
+        if not self.torrent_db:
+            self.logger.error("Torrent DB is not available. Skipping torrent health update.")
+            return []
+
+        last_checks = self.torrent_db.get_last_tracker_checks([payload.infohash for payload in torrent_health_payloads])
+        now = time.time()
+        updates = []
+        for payload in torrent_health_payloads:
+            last_check = last_checks.get(payload.infohash)
+            if last_check is not None and now - last_check < DEFAULT_FRESHNESS_LIMIT and peer_trust < 2:
+                continue
+            updates.append((payload.infohash, payload.num_seeders, payload.num_leechers, int(payload.timestamp),
+                            u"good" if payload.num_seeders > 1 else u"unknown"))
+
+        if updates:
+            self.torrent_db.update_torrents_health(updates)
+        return [payload.infohash for payload in torrent_health_payloads if payload.infohash not in last_checks]
+
     def update_torrent_info(self, torrent_info_response):
         infohash = torrent_info_response.infohash
         if self.has_torrent(infohash):
@@ -4,9 +4,11 @@ Peer to peer search functionality and discovering new torrents.
 Author(s): Niels Zeilemaker
 """
 from binascii import hexlify
+from collections import OrderedDict, deque
 from random import shuffle
 from time import time
 from traceback import print_exc
+from twisted.internet import reactor
 from twisted.internet.task import LoopingCall
 
 from Tribler.Core.CacheDB.sqlitecachedb import bin2str
@@ -34,6 +36,47 @@ DEBUG = False
 SWIFT_INFOHASHES = 0
 CREATE_TORRENT_COLLECT_INTERVAL = 5
 
+# The results of remote search requests are cached for a short time, so a burst of the same query costs one query
+REMOTE_SEARCH_CACHE_TTL = 30
+REMOTE_SEARCH_CACHE_SIZE = 256
+# The sustained number of remote search requests per second and the size of a burst, for every candidate and for all
+# candidates together. The global limit only applies to the requests that are not answered from the cache.
+CANDIDATE_SEARCH_RATE = 0.5
+CANDIDATE_SEARCH_BURST = 5
+GLOBAL_SEARCH_RATE = 10
+GLOBAL_SEARCH_BURST = 30
+# The number of remote search requests that can wait for a database query, later requests are dropped
+MAX_PENDING_SEARCHES = 50
+# The number of candidates for which the rate of requests is tracked
+MAX_SEARCH_RATE_LIMITERS = 1000
+
+
+class SearchRateLimiter(object):
+    """
+    Token bucket that admits a sustained number of requests per second, and bursts up to a maximum size.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.timestamp = time()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+    def admit(self, now):
+        self.refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self, now):
+        self.refill(now)
+        return self.tokens >= self.burst
+
 
 class SearchCommunity(Community):
 
@@ -76,6 +119,13 @@ class SearchCommunity(Community):
 
         self.torrent_cache = None
 
+        # Admission control of remote search requests
+        self.search_results_cache = OrderedDict()  # normalized keywords -> (timestamp, results)
+        self.search_rate_limiters = {}  # sock_addr -> SearchRateLimiter
+        self.global_search_rate_limiter = SearchRateLimiter(GLOBAL_SEARCH_RATE, GLOBAL_SEARCH_BURST)
+        self.pending_searches = deque()
+        self.search_statistics = {"served": 0, "cached": 0, "dropped_rate_limit": 0, "dropped_queue_full": 0}
+
     def initialize(self, tribler_session=None, log_incoming_searches=False):
         self.tribler_session = tribler_session
         self.integrate_with_tribler = tribler_session is not None
@@ -330,7 +380,44 @@ class SearchCommunity(Community):
 
         return len(candidates)
 
+    @staticmethod
+    def normalize_keywords(keywords):
+        return tuple(sorted(set(keyword.lower() for keyword in keywords)))
+
+    def get_cached_search_results(self, key, now):
+        entry = self.search_results_cache.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] > REMOTE_SEARCH_CACHE_TTL:
+            del self.search_results_cache[key]
+            return None
+        return entry[1]
+
+    def admit_search(self, candidate, now):
+        """
+        Returns whether the rate of search requests from a candidate is within the limit.
+        """
+        rate_limiter = self.search_rate_limiters.get(candidate.sock_addr)
+        if rate_limiter is None:
+            if len(self.search_rate_limiters) >= MAX_SEARCH_RATE_LIMITERS:
+                # Candidates that have not searched for a while are at the limit of a new candidate
+                for sock_addr, old_rate_limiter in self.search_rate_limiters.items():
+                    if old_rate_limiter.is_full(now):
+                        del self.search_rate_limiters[sock_addr]
+                if len(self.search_rate_limiters) >= MAX_SEARCH_RATE_LIMITERS:
+                    return False
+            rate_limiter = self.search_rate_limiters[candidate.sock_addr] = \
+                SearchRateLimiter(CANDIDATE_SEARCH_RATE, CANDIDATE_SEARCH_BURST)
+        return rate_limiter.admit(now)
+
     def on_search(self, messages):
+        """
+        Answer remote search requests. Requests from candidates that search too often are dropped, and requests for
+        keywords that have been searched for recently are answered from the cache. The other requests are queued and
+        answered one per reactor iteration, so a burst of requests does not block the reactor. When too many requests
+        are waiting, or the global rate of database queries is exceeded, requests are dropped.
+        """
+        now = time()
         for message in messages:
             keywords = message.payload.keywords
 
@@ -340,30 +427,89 @@ class SearchCommunity(Community):
             if self.log_incoming_searches:
                 self.log_incoming_searches(message.candidate.sock_addr, keywords)
 
-            results = []
-            dbresults = self._torrent_db.searchNames(keywords, local=False, keys=['infohash', 'T.name', 'T.length', 'T.num_files', 'T.category', 'T.creation_date', 'T.num_seeders', 'T.num_leechers'])
-            if len(dbresults) > 0:
-                for dbresult in dbresults:
-                    channel_details = dbresult[-10:]
+            if not self.admit_search(message.candidate, now):
+                self.search_statistics["dropped_rate_limit"] += 1
+                continue
 
-                    dbresult = list(dbresult[:8])
-                    dbresult[2] = long(dbresult[2])  # length
-                    dbresult[3] = int(dbresult[3])  # num_files
-                    dbresult[4] = [dbresult[4]]  # category
-                    dbresult[5] = long(dbresult[5])  # creation_date
-                    dbresult[6] = int(dbresult[6] or 0)  # num_seeders
-                    dbresult[7] = int(dbresult[7] or 0)  # num_leechers
+            results = self.get_cached_search_results(self.normalize_keywords(keywords), now)
+            if results is not None:
+                self.search_statistics["cached"] += 1
+                self._create_search_response(message.payload.identifier, results, message.candidate)
+                continue
 
-                    # cid
-                    if channel_details[1]:
-                        channel_details[1] = str(channel_details[1])
-                    dbresult.append(channel_details[1])
+            if len(self.pending_searches) >= MAX_PENDING_SEARCHES:
+                self.search_statistics["dropped_queue_full"] += 1
+                continue
 
-                    results.append(tuple(dbresult))
-            elif DEBUG:
-                self._logger.debug(u"no results")
+            if not self.global_search_rate_limiter.admit(now):
+                self.search_statistics["dropped_rate_limit"] += 1
+                continue
 
-            self._create_search_response(message.payload.identifier, results, message.candidate)
+            self.pending_searches.append(message)
+
+        self.schedule_pending_searches()
+
+    def schedule_pending_searches(self):
+        if self.pending_searches and not self.is_pending_task_active(u"process pending searches"):
+            self.register_task(u"process pending searches", reactor.callLater(0, self.process_pending_search))
+
+    def process_pending_search(self):
+        """
+        Answer the oldest queued search request, from the cache if another request has filled it in the meantime.
+        """
+        if not self.pending_searches:
+            return
+
+        message = self.pending_searches.popleft()
+        key = self.normalize_keywords(message.payload.keywords)
+        now = time()
+        results = self.get_cached_search_results(key, now)
+        if results is None:
+            results = self.search_torrents(message.payload.keywords)
+            self.search_results_cache[key] = (now, results)
+            while len(self.search_results_cache) > REMOTE_SEARCH_CACHE_SIZE:
+                self.search_results_cache.popitem(last=False)
+            self.search_statistics["served"] += 1
+        else:
+            self.search_statistics["cached"] += 1
+
+        self._create_search_response(message.payload.identifier, results, message.candidate)
+
+        self.schedule_pending_searches()
+
+    def search_torrents(self, keywords):
+        results = []
+        dbresults = self._torrent_db.searchNames(keywords, local=False, keys=['infohash', 'T.name', 'T.length', 'T.num_files', 'T.category', 'T.creation_date', 'T.num_seeders', 'T.num_leechers'])
+        if len(dbresults) > 0:
+            for dbresult in dbresults:
+                channel_details = dbresult[-10:]
+
+                dbresult = list(dbresult[:8])
+                dbresult[2] = long(dbresult[2])  # length
+                dbresult[3] = int(dbresult[3])  # num_files
+                dbresult[4] = [dbresult[4]]  # category
+                dbresult[5] = long(dbresult[5])  # creation_date
+                dbresult[6] = int(dbresult[6] or 0)  # num_seeders
+                dbresult[7] = int(dbresult[7] or 0)  # num_leechers
+
+                # cid
+                if channel_details[1]:
+                    channel_details[1] = str(channel_details[1])
+                dbresult.append(channel_details[1])
+
+                results.append(tuple(dbresult))
+        elif DEBUG:
+            self._logger.debug(u"no results")
+        return results
+
+    def get_search_statistics(self):
+        """
+        Returns the number of remote search requests that have been answered with a database query, answered from
+        the cache and dropped, and the number of requests that are waiting.
+        """
+        statistics = dict(self.search_statistics)
+        statistics["pending"] = len(self.pending_searches)
+        return statistics
 
     def _create_search_response(self, identifier, results, candidate):
         # create search-response message
@@ -387,7 +533,7 @@ class SearchCommunity(Community):
                                            search_request.keywords, len(message.payload.results), message.candidate)
 
                     if len(message.payload.results) > 0:
-                        self._torrent_db.on_search_response(message.payload.results)
+                        self._torrent_db.queue_search_response(message.payload.results)
 
                     # emit signal of search results
                     if self.tribler_session is not None:
@@ -509,9 +655,7 @@ class SearchCommunity(Community):
                     to_collect_dict.setdefault(infohash, []).append(message.candidate)
 
         if len(to_insert_list) > 0:
-            while to_insert_list:
-                self._torrent_db.on_torrent_collect_response(to_insert_list[:50])
-                to_insert_list = to_insert_list[50:]
+            self._torrent_db.queue_torrent_collect_response(to_insert_list)
 
         infohashes_to_collect = [infohash for infohash in to_collect_dict
                                  if infohash and self.tribler_session.has_collected_torrent(infohash)]
@@ -614,7 +758,7 @@ class SearchCommunity(Community):
 
     def on_torrent(self, messages):
         for message in messages:
-            self._torrent_db.addExternalTorrentNoDef(message.payload.infohash, message.payload.name, message.payload.files, message.payload.trackers, message.payload.timestamp, {'dispersy_id': message.packet_id})
+            self._torrent_db.queue_external_torrent_no_def(message.payload.infohash, message.payload.name, message.payload.files, message.payload.trackers, message.payload.timestamp, {'dispersy_id': message.packet_id})
 
     def _get_channel_id(self, cid):
         assert isinstance(cid, str)
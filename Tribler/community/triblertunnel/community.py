@@ -57,6 +57,9 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         self.bittorrent_peers = {}
         self.dispatcher = TunnelDispatcher(self)
         self.download_states = {}
+        # Real infohash -> infohash used for looking up introduction points, and lookup infohash -> download
+        self.lookup_info_hashes = {}
+        self.lookup_downloads = {}
         self.competing_slots = [(0, None)] * num_competing_slots  # 1st tuple item = token balance, 2nd = circuit id
         self.random_slots = [None] * num_random_slots
 
@@ -69,6 +72,10 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
 
         self.dispatcher.set_socks_servers(self.socks_servers)
 
+        if self.tribler_session:
+            for download in self.tribler_session.get_downloads():
+                self.on_download_added(download)
+
         self.decode_map.update({
             chr(23): self.on_payout_block,
         })
@@ -281,11 +288,33 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
                                u"balance-response",
                                BalanceResponsePayload.from_half_block(block, cache.to_circuit_id))
 
+    def get_cached_lookup_info_hash(self, info_hash):
+        """
+        Returns the infohash used for looking up the introduction points of a download, without hashing the real
+        infohash again for every call.
+        """
+        lookup_info_hash = self.lookup_info_hashes.get(info_hash)
+        if lookup_info_hash is None:
+            lookup_info_hash = self.lookup_info_hashes[info_hash] = self.get_lookup_info_hash(info_hash)
+        return lookup_info_hash
+
+    def on_download_added(self, download):
+        """
+        This method is called when a download is added (which includes a download that is added again with another
+        number of hops). We add the download to the index used by the hidden services to find it.
+        """
+        self.lookup_downloads[self.get_cached_lookup_info_hash(download.get_def().get_infohash())] = download
+
     def on_download_removed(self, download):
         """
         This method is called when a download is removed. We check here whether we can stop building circuits for a
         specific number of hops in case it hasn't been finished yet.
         """
+        info_hash = download.get_def().get_infohash()
+        lookup_info_hash = self.lookup_info_hashes.pop(info_hash, None)
+        if lookup_info_hash is not None and self.lookup_downloads.get(lookup_info_hash) is download:
+            del self.lookup_downloads[lookup_info_hash]
+
         if download.get_hops() > 0:
             self.num_hops_by_downloads[download.get_hops()] -= 1
             if self.num_hops_by_downloads[download.get_hops()] == 0:
@@ -455,7 +484,7 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
             if download.get_hops() > 0:
                 # Convert the real infohash to the infohash used for looking up introduction points
                 real_info_hash = download.get_def().get_infohash()
-                info_hash = self.get_lookup_info_hash(real_info_hash)
+                info_hash = self.get_cached_lookup_info_hash(real_info_hash)
                 hops[info_hash] = download.get_hops()
                 self.service_callbacks[info_hash] = download.add_peer
                 new_states[info_hash] = ds.get_status()
@@ -514,9 +543,7 @@ class TriblerTunnelCommunity(HiddenTunnelCommunity):
         if not self.tribler_session:
             return None
 
-        for download in self.tribler_session.get_downloads():
-            if lookup_info_hash == self.get_lookup_info_hash(download.get_def().get_infohash()):
-                return download
+        return self.lookup_downloads.get(lookup_info_hash)
 
     def create_introduction_point(self, info_hash, amount=1):
         download = self.get_download(info_hash)
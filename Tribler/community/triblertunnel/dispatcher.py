@@ -19,12 +19,36 @@ class TunnelDispatcher(object):
         # Map to keep track of the circuits associated with each destination.
         self.destinations = {}
 
+        # Reverse of the destinations map, to keep track of the destinations associated with each circuit.
+        self.circuit_destinations = {}
+
         # Map to keep track of the circuit id to UDP connection.
         self.circuit_id_to_connection = {}
 
     def set_socks_servers(self, socks_servers):
         self.socks_servers = socks_servers
         self.destinations = {(ind + 1): {} for ind, _ in enumerate(self.socks_servers)}
+        self.circuit_destinations = {(ind + 1): {} for ind, _ in enumerate(self.socks_servers)}
+
+    def set_destination(self, hops, destination, circuit):
+        """
+        Associate a destination with a circuit, replacing the circuit it was associated with before.
+        """
+        old_circuit = self.destinations[hops].get(destination)
+        if old_circuit is circuit:
+            return
+        if old_circuit is not None:
+            self.remove_destination(hops, destination)
+
+        self.destinations[hops][destination] = circuit
+        self.circuit_destinations[hops].setdefault(circuit, set()).add(destination)
+
+    def remove_destination(self, hops, destination):
+        circuit = self.destinations[hops].pop(destination)
+        circuit_destinations = self.circuit_destinations[hops][circuit]
+        circuit_destinations.discard(destination)
+        if not circuit_destinations:
+            del self.circuit_destinations[hops][circuit]
 
     def on_incoming_from_tunnel(self, community, circuit, origin, data, force=False):
         """
@@ -40,9 +64,8 @@ class TunnelDispatcher(object):
 
         sock_server = self.socks_servers[session_hops - 1]
 
-        destinations = self.destinations[session_hops]
-        if circuit in destinations.values() or force:
-            destinations[origin] = circuit
+        if circuit in self.circuit_destinations[session_hops] or force:
+            self.set_destination(session_hops, origin, circuit)
 
             sessions = [self.circuit_id_to_connection[circuit.circuit_id]] \
                 if circuit.circuit_id in self.circuit_id_to_connection else sock_server.sessions
@@ -61,14 +84,29 @@ class TunnelDispatcher(object):
         send this data over to the final destination.
         """
         hops = self.socks_servers.index(udp_connection.socksconnection.socksserver) + 1
+        return self.send_over_circuit(hops, udp_connection, request)
+
+    def on_socks5_udp_batch(self, udp_connection, requests):
+        """
+        We received a burst of data from the SOCKS5 server within a single reactor iteration. The socks server is
+        looked up once, after which each request is sent like in on_socks5_udp_data.
+        :return: the number of requests that have been sent
+        """
+        hops = self.socks_servers.index(udp_connection.socksconnection.socksserver) + 1
+        return sum(1 for request in requests if self.send_over_circuit(hops, udp_connection, request))
 
+    def send_over_circuit(self, hops, udp_connection, request):
+        """
+        Send the data of a SOCKS5 UDP request over the circuit associated with its destination, selecting a circuit
+        if there is none yet.
+        """
         destination = request.destination
         if destination not in self.destinations[hops]:
             selected_circuit = self.tunnel_community.selection_strategy.select(destination, hops)
             if not selected_circuit:
                 return False
 
-            self.destinations[hops][destination] = selected_circuit
+            self.set_destination(hops, destination, selected_circuit)
             self._logger.debug("SELECT circuit %d for %s", self.destinations[hops][destination].circuit_id,
                                destination)
         circuit = self.destinations[hops][destination]
@@ -90,13 +128,11 @@ class TunnelDispatcher(object):
         """
         counter = 0
         affected_destinations = set()
-        for hops, destinations in self.destinations.iteritems():
-            new_affected_destinations = set(destination for destination, tunnel_circuit in destinations.iteritems()
-                                            if tunnel_circuit == broken_circuit)
+        for hops, circuit_destinations in self.circuit_destinations.iteritems():
+            new_affected_destinations = circuit_destinations.pop(broken_circuit, set())
             for destination in new_affected_destinations:
-                if destination in self.destinations[hops]:
-                    del self.destinations[hops][destination]
-                    counter += 1
+                del self.destinations[hops][destination]
+                counter += 1
 
             affected_destinations.update(new_affected_destinations)
 